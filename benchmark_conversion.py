@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Slide Rasterization Benchmark for Quiz System
+Renders the same deck serially and split by page range across the
+conversion process pool, and prints both timings.
+
+Usage:
+    python benchmark_conversion.py deck.pptx [--workers N]
+    python benchmark_conversion.py deck.pdf [--workers N]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark serial vs parallel slide rasterization")
+    parser.add_argument("deck", help="PPT/PPTX (exported with LibreOffice first) or PDF file")
+    parser.add_argument("--workers", type=int, default=0, help="Worker processes (default: one per CPU)")
+    args = parser.parse_args()
+
+    # Render into a scratch directory; spawned workers inherit these settings
+    scratch = tempfile.mkdtemp(prefix="slide-benchmark-")
+    os.environ["SLIDES_DIR"] = os.path.join(scratch, "slides")
+    os.environ["THUMBS_DIR"] = os.path.join(scratch, "thumbs")
+    os.environ["CONVERSION_WORKERS"] = str(args.workers)
+
+    from pdf2image import pdfinfo_from_path
+    from services.media_service import media_service
+
+    deck_key = "benchmark"
+    source = str(Path(args.deck).resolve())
+    if source.lower().endswith(".pdf"):
+        pdf_path = source
+        page_count = int(pdfinfo_from_path(pdf_path)["Pages"])
+    else:
+        print("Exporting PDF with LibreOffice...")
+        pdf_path, page_count = media_service.export_pdf(source, deck_key)
+
+    print(f"Pages:   {page_count}")
+    print(f"Workers: {media_service.worker_count}")
+    print(f"Output:  {scratch}")
+    print()
+
+    start = time.perf_counter()
+    media_service.rasterize_pages(pdf_path, deck_key, 1, page_count)
+    serial = time.perf_counter() - start
+    print(f"Serial:   {serial:.2f}s ({serial / page_count * 1000:.0f} ms/page)")
+
+    # Start the worker processes outside the timed run
+    pool = media_service._get_pool()
+    for future in [pool.submit(os.getpid) for _ in range(media_service.worker_count)]:
+        future.result()
+
+    start = time.perf_counter()
+    asyncio.run(media_service.rasterize_parallel(pdf_path, deck_key, page_count))
+    parallel = time.perf_counter() - start
+    print(f"Parallel: {parallel:.2f}s ({parallel / page_count * 1000:.0f} ms/page)")
+    print(f"Speedup:  {serial / parallel:.2f}x")
+
+    media_service.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -25,9 +25,23 @@ class Settings(BaseSettings):
     upload_dir: str = Field(default="./media/uploads", alias="UPLOAD_DIR")
     slides_dir: str = Field(default="./media/slides", alias="SLIDES_DIR")
     thumbs_dir: str = Field(default="./media/thumbs", alias="THUMBS_DIR")
+    max_upload_mb: int = Field(default=500, alias="MAX_UPLOAD_MB")  # per deck file
+    static_cache_mb: int = Field(default=64, alias="STATIC_CACHE_MB")  # in-memory LRU for /static, /media and slides
+    static_cache_max_file_kb: int = Field(default=2048, alias="STATIC_CACHE_MAX_FILE_KB")  # larger files stream from disk
 
     # PPT Conversion
     libreoffice_path: Optional[str] = Field(default=None, alias="LIBREOFFICE_PATH")
+    conversion_workers: int = Field(default=0, alias="CONVERSION_WORKERS")  # deck conversion processes, 0 = one per CPU
+    office_workers: int = Field(default=2, alias="OFFICE_WORKERS")  # warm LibreOffice instances, 0 = cold soffice per deck
+    unoserver_path: str = Field(default="unoserver", alias="UNOSERVER_PATH")
+    office_base_port: int = Field(default=2003, alias="OFFICE_BASE_PORT")  # worker i uses base+2i and base+2i+1
+    office_convert_timeout_seconds: int = Field(default=120, alias="OFFICE_CONVERT_TIMEOUT_SECONDS")
+    office_startup_timeout_seconds: int = Field(default=30, alias="OFFICE_STARTUP_TIMEOUT_SECONDS")
+    conversion_window_pages: int = Field(default=4, alias="CONVERSION_WINDOW_PAGES")  # pages held in memory per worker
+    slide_rendition_heights: str = Field(default="720,1080,2160", alias="SLIDE_RENDITION_HEIGHTS")  # WebP sizes, comma-separated
+    slide_webp_quality: int = Field(default=80, alias="SLIDE_WEBP_QUALITY")
+    slide_prefetch_count: int = Field(default=3, alias="SLIDE_PREFETCH_COUNT")  # upcoming slides hinted in slide.update
+    sprite_slides_per_sheet: int = Field(default=50, alias="SPRITE_SLIDES_PER_SHEET")  # thumbnails per sprite sheet
 
     # Admin Default
     admin_username: str = Field(default="admin", alias="ADMIN_USERNAME")
@@ -40,6 +54,36 @@ class Settings(BaseSettings):
     livekit_token_ttl_seconds: int = Field(default=3600, alias="LIVEKIT_TOKEN_TTL_SECONDS")
     livekit_room_prefix: str = Field(default="quiz", alias="LIVEKIT_ROOM_PREFIX")
 
+    # Buzzer analytics
+    buzz_tie_window_ms: int = Field(default=30, alias="BUZZ_TIE_WINDOW_MS")
+    buzz_analytics_max_rounds: int = Field(default=10000, alias="BUZZ_ANALYTICS_MAX_ROUNDS")
+
+    # Buzz rate limiting (token buckets, checked before Redis)
+    buzz_device_burst: float = Field(default=3, alias="BUZZ_DEVICE_BURST")
+    buzz_device_refill_per_second: float = Field(default=1, alias="BUZZ_DEVICE_REFILL_PER_SECOND")
+    buzz_team_burst: float = Field(default=6, alias="BUZZ_TEAM_BURST")
+    buzz_team_refill_per_second: float = Field(default=2, alias="BUZZ_TEAM_REFILL_PER_SECOND")
+
+    # Score ledger (Redis first, write-behind to SQL)
+    score_flush_interval_ms: int = Field(default=500, alias="SCORE_FLUSH_INTERVAL_MS")
+    score_flush_batch_size: int = Field(default=500, alias="SCORE_FLUSH_BATCH_SIZE")
+    score_snapshot_interval: int = Field(default=200, alias="SCORE_SNAPSHOT_INTERVAL")  # events between snapshots
+    score_undo_depth: int = Field(default=50, alias="SCORE_UNDO_DEPTH")  # undoable adjustments kept per team
+
+    # Idempotency-Key handling for QM mutations
+    idempotency_ttl_seconds: int = Field(default=600, alias="IDEMPOTENCY_TTL_SECONDS")
+
+    # Server-Sent Events stream for read-only screens
+    sse_buffer_size: int = Field(default=256, alias="SSE_BUFFER_SIZE")  # frames kept for Last-Event-ID resume
+    sse_queue_size: int = Field(default=100, alias="SSE_QUEUE_SIZE")  # per-subscriber backlog before it is dropped
+    sse_keepalive_seconds: float = Field(default=15, alias="SSE_KEEPALIVE_SECONDS")
+
+    # Spectator (audience phone) fan-out
+    spectator_interval_ms: int = Field(default=1000, alias="SPECTATOR_INTERVAL_MS")  # max one frame per interval
+    spectator_top_k: int = Field(default=10, alias="SPECTATOR_TOP_K")
+    spectator_max_per_session: int = Field(default=5000, alias="SPECTATOR_MAX_PER_SESSION")
+    spectator_send_timeout_seconds: float = Field(default=5, alias="SPECTATOR_SEND_TIMEOUT_SECONDS")
+
     # Bandwidth monitoring (VPS)
     bandwidth_monitor_enabled: bool = Field(default=True, alias="BANDWIDTH_MONITOR_ENABLED")
     bandwidth_interface: str = Field(default="eth0", alias="BANDWIDTH_INTERFACE")
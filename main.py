@@ -2,7 +2,6 @@ import os
 import asyncio
 from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI, Request
-from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
@@ -16,6 +15,11 @@ from auth import create_admin_user
 from routers import auth_router, admin_router, qm_router, team_router, display_router
 from routers import ws_router, media_router
 from services.bandwidth_monitor import run_bandwidth_monitor
+from services.score_ledger import score_ledger, run_score_writer
+from services.job_registry import job_registry
+from services.media_service import media_service
+from services.office_pool import office_pool
+from services.static_files import CachedStaticFiles, static_url
 
 
 @asynccontextmanager
@@ -38,14 +42,36 @@ async def lifespan(app: FastAPI):
         await create_admin_user(db)
         break
 
+    # Flush leftover score events and realign Redis totals with SQL
+    try:
+        await score_ledger.reconcile()
+    except Exception as e:
+        print(f"Warning: score ledger not reconciled (is Redis running?): {e}")
+    score_writer_task = asyncio.create_task(run_score_writer())
+
     if settings.bandwidth_monitor_enabled:
         bandwidth_task = asyncio.create_task(run_bandwidth_monitor())
 
+    # Warm LibreOffice workers start in the background; uploads wait for one if needed
+    office_pool.start()
+
     print(f"Server starting on {settings.host}:{settings.port}")
 
     yield
 
     # Shutdown
+    await job_registry.shutdown()
+    media_service.shutdown()
+    await office_pool.shutdown()
+    score_writer_task.cancel()
+    with suppress(asyncio.CancelledError):
+        await score_writer_task
+    try:
+        await score_ledger.flush()
+    except Exception as e:
+        print(f"Warning: pending score events not flushed: {e}")
+    await score_ledger.close()
+
     if bandwidth_task:
         bandwidth_task.cancel()
         with suppress(asyncio.CancelledError):
@@ -105,11 +131,12 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 # Mount static files
 os.makedirs("static", exist_ok=True)
 os.makedirs("templates", exist_ok=True)
-app.mount("/static", StaticFiles(directory="static"), name="static")
-app.mount("/media", StaticFiles(directory="media"), name="media")
+app.mount("/static", CachedStaticFiles(directory="static"), name="static")
+app.mount("/media", CachedStaticFiles(directory="media"), name="media")
 
 # Templates
 templates = Jinja2Templates(directory="templates")
+templates.env.globals["static_url"] = static_url
 
 # Include routers
 app.include_router(auth_router.router, prefix="/api/auth", tags=["Authentication"])
@@ -211,6 +238,15 @@ async def display_page(request: Request):
     })
 
 
+@app.get("/spectator")
+async def spectator_page(request: Request):
+    """Audience phone view (scores, timer, current slide)"""
+    return templates.TemplateResponse("spectator.html", {
+        "request": request,
+        "settings": settings
+    })
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
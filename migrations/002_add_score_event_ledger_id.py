@@ -0,0 +1,50 @@
+"""
+Migration: Add ledger_id to score_events
+Created: 2026-10-19
+
+This migration:
+1. Adds the nullable score_events.ledger_id column used by the score ledger
+   write-behind to skip events that were already persisted
+2. Creates a unique index on it
+"""
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path so we can import modules
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(parent_dir))
+
+import asyncio
+from sqlalchemy import inspect, text
+from database import engine, init_db
+
+
+def _column_names(sync_conn, table: str):
+    return [column["name"] for column in inspect(sync_conn).get_columns(table)]
+
+
+async def run_migration():
+    """Run migration to add score_events.ledger_id"""
+
+    print("Creating tables...")
+    await init_db()
+
+    async with engine.begin() as conn:
+        columns = await conn.run_sync(_column_names, "score_events")
+
+        if "ledger_id" in columns:
+            print("score_events.ledger_id already exists. Skipping.")
+            return
+
+        print("Adding score_events.ledger_id...")
+        await conn.execute(text("ALTER TABLE score_events ADD COLUMN ledger_id VARCHAR"))
+        await conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ix_score_events_ledger_id ON score_events (ledger_id)"
+        ))
+
+
+if __name__ == "__main__":
+    print("Running migration: 002_add_score_event_ledger_id")
+    asyncio.run(run_migration())
+    print("Migration completed successfully!")
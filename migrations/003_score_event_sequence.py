@@ -0,0 +1,80 @@
+"""
+Migration: Event-sourced score history
+Created: 2026-10-19
+
+This migration:
+1. Adds session_id, seq, kind and target_seq to score_events
+2. Backfills session_id from team_sessions and numbers existing events per
+   session in (created_at, id) order
+3. Creates the (session_id, seq) unique index and the (team_session_id, seq) index
+4. Creates the score_snapshots table
+"""
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path so we can import modules
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(parent_dir))
+
+import asyncio
+from sqlalchemy import inspect, text
+from database import engine, init_db
+
+
+def _column_names(sync_conn, table: str):
+    return [column["name"] for column in inspect(sync_conn).get_columns(table)]
+
+
+async def run_migration():
+    """Run migration to add score event sequence numbers"""
+
+    print("Creating tables...")
+    await init_db()
+
+    async with engine.begin() as conn:
+        columns = await conn.run_sync(_column_names, "score_events")
+
+        if "seq" in columns:
+            print("score_events.seq already exists. Skipping.")
+            return
+
+        print("Adding score_events.session_id, seq, kind, target_seq...")
+        await conn.execute(text(
+            "ALTER TABLE score_events ADD COLUMN session_id INTEGER REFERENCES sessions(id) ON DELETE CASCADE"
+        ))
+        await conn.execute(text("ALTER TABLE score_events ADD COLUMN seq INTEGER"))
+        await conn.execute(text("ALTER TABLE score_events ADD COLUMN kind VARCHAR NOT NULL DEFAULT 'adjust'"))
+        await conn.execute(text("ALTER TABLE score_events ADD COLUMN target_seq INTEGER"))
+
+        print("Backfilling session_id and seq...")
+        await conn.execute(text("""
+            UPDATE score_events SET session_id = (
+                SELECT team_sessions.session_id FROM team_sessions
+                WHERE team_sessions.id = score_events.team_session_id
+            )
+        """))
+        result = await conn.execute(text(
+            "SELECT id, session_id FROM score_events ORDER BY session_id, created_at, id"
+        ))
+        next_seq = {}
+        for event_id, session_id in result.all():
+            next_seq[session_id] = next_seq.get(session_id, 0) + 1
+            await conn.execute(
+                text("UPDATE score_events SET seq = :seq WHERE id = :id"),
+                {"seq": next_seq[session_id], "id": event_id}
+            )
+        print(f"Numbered events in {len(next_seq)} sessions")
+
+        await conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uix_score_event_seq ON score_events (session_id, seq)"
+        ))
+        await conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_score_events_team_session_seq ON score_events (team_session_id, seq)"
+        ))
+
+
+if __name__ == "__main__":
+    print("Running migration: 003_score_event_sequence")
+    asyncio.run(run_migration())
+    print("Migration completed successfully!")
@@ -0,0 +1,47 @@
+"""
+Migration: Per-round score totals
+Created: 2026-10-19
+
+This migration:
+1. Creates the round_scores table
+2. Backfills it from score_events grouped by (team_session_id, round_id)
+"""
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path so we can import modules
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(parent_dir))
+
+import asyncio
+from sqlalchemy import text
+from database import engine, init_db
+
+
+async def run_migration():
+    """Run migration to create and backfill round_scores"""
+
+    print("Creating tables...")
+    await init_db()
+
+    async with engine.begin() as conn:
+        existing = (await conn.execute(text("SELECT COUNT(*) FROM round_scores"))).scalar()
+        if existing:
+            print("round_scores already populated. Skipping.")
+            return
+
+        print("Backfilling round_scores from score_events...")
+        result = await conn.execute(text("""
+            INSERT INTO round_scores (team_session_id, round_id, total)
+            SELECT team_session_id, round_id, SUM(delta)
+            FROM score_events
+            GROUP BY team_session_id, round_id
+        """))
+        print(f"Inserted {result.rowcount} round totals")
+
+
+if __name__ == "__main__":
+    print("Running migration: 004_add_round_scores")
+    asyncio.run(run_migration())
+    print("Migration completed successfully!")
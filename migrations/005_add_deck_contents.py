@@ -0,0 +1,52 @@
+"""
+Migration: Content-addressed deck storage
+Created: 2026-10-19
+
+This migration:
+1. Creates the deck_contents table (one row per uploaded file hash)
+2. Adds the nullable decks.content_id column; existing decks keep their
+   own per-deck files and leave it NULL
+"""
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path so we can import modules
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(parent_dir))
+
+import asyncio
+from sqlalchemy import inspect, text
+from database import engine, init_db
+
+
+def _column_names(sync_conn, table: str):
+    return [column["name"] for column in inspect(sync_conn).get_columns(table)]
+
+
+async def run_migration():
+    """Run migration to add deck_contents and decks.content_id"""
+
+    print("Creating tables...")
+    await init_db()
+
+    async with engine.begin() as conn:
+        columns = await conn.run_sync(_column_names, "decks")
+
+        if "content_id" in columns:
+            print("decks.content_id already exists. Skipping.")
+            return
+
+        print("Adding decks.content_id...")
+        await conn.execute(text(
+            "ALTER TABLE decks ADD COLUMN content_id INTEGER REFERENCES deck_contents(id)"
+        ))
+        await conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_decks_content_id ON decks (content_id)"
+        ))
+
+
+if __name__ == "__main__":
+    print("Running migration: 005_add_deck_contents")
+    asyncio.run(run_migration())
+    print("Migration completed successfully!")
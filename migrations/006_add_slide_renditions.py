@@ -0,0 +1,46 @@
+"""
+Migration: Add renditions to slides
+Created: 2026-10-19
+
+This migration:
+1. Adds the nullable slides.renditions JSON column ({height: webp_path});
+   slides converted earlier keep NULL and are served as PNG
+"""
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path so we can import modules
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(parent_dir))
+
+import asyncio
+from sqlalchemy import inspect, text
+from database import engine, init_db
+
+
+def _column_names(sync_conn, table: str):
+    return [column["name"] for column in inspect(sync_conn).get_columns(table)]
+
+
+async def run_migration():
+    """Run migration to add slides.renditions"""
+
+    print("Creating tables...")
+    await init_db()
+
+    async with engine.begin() as conn:
+        columns = await conn.run_sync(_column_names, "slides")
+
+        if "renditions" in columns:
+            print("slides.renditions already exists. Skipping.")
+            return
+
+        print("Adding slides.renditions...")
+        await conn.execute(text("ALTER TABLE slides ADD COLUMN renditions JSON"))
+
+
+if __name__ == "__main__":
+    print("Running migration: 006_add_slide_renditions")
+    asyncio.run(run_migration())
+    print("Migration completed successfully!")
@@ -0,0 +1,46 @@
+"""
+Migration: Add image_hash to slides
+Created: 2026-10-19
+
+This migration:
+1. Adds the nullable slides.image_hash column (content hash of the PNG);
+   slides converted earlier keep NULL and get unversioned URLs
+"""
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path so we can import modules
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(parent_dir))
+
+import asyncio
+from sqlalchemy import inspect, text
+from database import engine, init_db
+
+
+def _column_names(sync_conn, table: str):
+    return [column["name"] for column in inspect(sync_conn).get_columns(table)]
+
+
+async def run_migration():
+    """Run migration to add slides.image_hash"""
+
+    print("Creating tables...")
+    await init_db()
+
+    async with engine.begin() as conn:
+        columns = await conn.run_sync(_column_names, "slides")
+
+        if "image_hash" in columns:
+            print("slides.image_hash already exists. Skipping.")
+            return
+
+        print("Adding slides.image_hash...")
+        await conn.execute(text("ALTER TABLE slides ADD COLUMN image_hash VARCHAR"))
+
+
+if __name__ == "__main__":
+    print("Running migration: 007_add_slide_image_hash")
+    asyncio.run(run_migration())
+    print("Migration completed successfully!")
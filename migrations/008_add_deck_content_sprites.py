@@ -0,0 +1,47 @@
+"""
+Migration: Add sprites to deck_contents
+Created: 2026-10-19
+
+This migration:
+1. Adds the nullable deck_contents.sprites column (thumbnail sprite sheets
+   and per-slide coordinates); decks converted earlier keep NULL and are
+   browsed with per-slide thumbnails
+"""
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path so we can import modules
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(parent_dir))
+
+import asyncio
+from sqlalchemy import inspect, text
+from database import engine, init_db
+
+
+def _column_names(sync_conn, table: str):
+    return [column["name"] for column in inspect(sync_conn).get_columns(table)]
+
+
+async def run_migration():
+    """Run migration to add deck_contents.sprites"""
+
+    print("Creating tables...")
+    await init_db()
+
+    async with engine.begin() as conn:
+        columns = await conn.run_sync(_column_names, "deck_contents")
+
+        if "sprites" in columns:
+            print("deck_contents.sprites already exists. Skipping.")
+            return
+
+        print("Adding deck_contents.sprites...")
+        await conn.execute(text("ALTER TABLE deck_contents ADD COLUMN sprites JSON"))
+
+
+if __name__ == "__main__":
+    print("Running migration: 008_add_deck_content_sprites")
+    asyncio.run(run_migration())
+    print("Migration completed successfully!")
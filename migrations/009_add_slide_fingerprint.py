@@ -0,0 +1,47 @@
+"""
+Migration: Add fingerprint to slides
+Created: 2026-10-19
+
+This migration:
+1. Adds the nullable slides.fingerprint column (hash of the slide XML,
+   media and layouts it renders from); slides converted earlier keep NULL
+   and are matched by position when their deck is re-uploaded
+"""
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path so we can import modules
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(parent_dir))
+
+import asyncio
+from sqlalchemy import inspect, text
+from database import engine, init_db
+
+
+def _column_names(sync_conn, table: str):
+    return [column["name"] for column in inspect(sync_conn).get_columns(table)]
+
+
+async def run_migration():
+    """Run migration to add slides.fingerprint"""
+
+    print("Creating tables...")
+    await init_db()
+
+    async with engine.begin() as conn:
+        columns = await conn.run_sync(_column_names, "slides")
+
+        if "fingerprint" in columns:
+            print("slides.fingerprint already exists. Skipping.")
+            return
+
+        print("Adding slides.fingerprint...")
+        await conn.execute(text("ALTER TABLE slides ADD COLUMN fingerprint VARCHAR"))
+
+
+if __name__ == "__main__":
+    print("Running migration: 009_add_slide_fingerprint")
+    asyncio.run(run_migration())
+    print("Migration completed successfully!")
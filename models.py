@@ -1,5 +1,5 @@
 from sqlalchemy import (
-    Column, Integer, String, Boolean, DateTime, ForeignKey, Text, JSON, UniqueConstraint
+    Column, Integer, String, Boolean, DateTime, ForeignKey, Text, JSON, UniqueConstraint, Index
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -75,10 +75,35 @@ class Deck(Base):
     deck_type = Column(String, nullable=False)  # 'question' or 'answer'
     ppt_path = Column(String, nullable=False)
     native_required = Column(Boolean, default=False)
+    # Shared converted content (NULL for decks uploaded before content addressing)
+    content_id = Column(Integer, ForeignKey("deck_contents.id"), nullable=True, index=True)
 
     # Relationships
     session = relationship("Session", back_populates="decks")
     slides = relationship("Slide", back_populates="deck")
+    content = relationship("DeckContent", back_populates="decks")
+
+    @property
+    def sprites(self):
+        # Decks uploaded before content addressing have no sprite sheets
+        return self.content.sprites if self.content is not None else None
+
+
+class DeckContent(Base):
+    """One uploaded file by SHA-256, converted once and shared by every deck that uploads it"""
+    __tablename__ = "deck_contents"
+
+    id = Column(Integer, primary_key=True, index=True)
+    sha256 = Column(String, unique=True, nullable=False, index=True)
+    ppt_path = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="converting")  # 'converting' or 'ready'
+    slide_count = Column(Integer, nullable=True)
+    ref_count = Column(Integer, nullable=False, default=0)  # Decks using these files
+    sprites = Column(JSON, nullable=True)  # Thumbnail sprite sheets and per-slide coordinates
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Relationships
+    decks = relationship("Deck", back_populates="content")
 
 
 class Slide(Base):
@@ -89,6 +114,9 @@ class Slide(Base):
     slide_index = Column(Integer, nullable=False)
     png_path = Column(String, nullable=False)
     thumb_path = Column(String, nullable=False)
+    renditions = Column(JSON, nullable=True)  # {height: webp_path}; NULL for PNG-only slides
+    image_hash = Column(String, nullable=True)  # Content hash of the PNG; versions the image URL
+    fingerprint = Column(String, nullable=True)  # Hash of the slide's source parts; unchanged slides survive re-uploads
     default_timer_ms = Column(Integer, nullable=True)
 
     __table_args__ = (UniqueConstraint('deck_id', 'slide_index', name='uix_deck_slide'),)
@@ -156,13 +184,22 @@ class Score(Base):
 
 class ScoreEvent(Base):
     __tablename__ = "score_events"
+    __table_args__ = (
+        UniqueConstraint('session_id', 'seq', name='uix_score_event_seq'),
+        Index('ix_score_events_team_session_seq', 'team_session_id', 'seq'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
+    session_id = Column(Integer, ForeignKey("sessions.id", ondelete="CASCADE"), nullable=True)
+    seq = Column(Integer, nullable=True)  # Per-session monotonic sequence number
+    kind = Column(String, nullable=False, default="adjust")  # 'adjust', 'undo', or 'redo'
+    target_seq = Column(Integer, nullable=True)  # Event reverted/re-applied by an undo/redo
     team_session_id = Column(Integer, ForeignKey("team_sessions.id", ondelete="CASCADE"), nullable=False)
     round_id = Column(Integer, ForeignKey("rounds.id"), nullable=False)
     actor_user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     delta = Column(Integer, nullable=False)
     reason = Column(Text, nullable=True)
+    ledger_id = Column(String, unique=True, nullable=True, index=True)  # Score ledger event id (dedupes replays)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relationships
@@ -170,6 +207,27 @@ class ScoreEvent(Base):
     round = relationship("Round", back_populates="score_events")
 
 
+class RoundScore(Base):
+    __tablename__ = "round_scores"
+    __table_args__ = (UniqueConstraint('team_session_id', 'round_id', name='uix_round_score'),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    team_session_id = Column(Integer, ForeignKey("team_sessions.id", ondelete="CASCADE"), nullable=False)
+    round_id = Column(Integer, ForeignKey("rounds.id", ondelete="CASCADE"), nullable=False, index=True)
+    total = Column(Integer, nullable=False, default=0)  # Sum of the round's score event deltas
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class ScoreSnapshot(Base):
+    __tablename__ = "score_snapshots"
+
+    id = Column(Integer, primary_key=True, index=True)
+    session_id = Column(Integer, ForeignKey("sessions.id", ondelete="CASCADE"), nullable=False, index=True)
+    seq = Column(Integer, nullable=False)  # Last event included in the snapshot
+    totals = Column(JSON, nullable=False)  # {team_session_id: total}
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
 class BuzzerEvent(Base):
     __tablename__ = "buzzer_events"
 
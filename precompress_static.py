@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Static Asset Precompression for Quiz System
+Writes .gz (and .br when the brotli package is installed) next to each
+compressible file under static/ and media/, for the /static and /media
+mounts to serve to clients that accept them.
+
+Run after deploying new assets:
+    python precompress_static.py [directory ...]
+"""
+
+import gzip
+import os
+import sys
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Images, audio and video are already compressed; only text-like assets are worth it
+COMPRESSIBLE = {".js", ".css", ".html", ".svg", ".json", ".map", ".txt", ".wav"}
+
+# Below this, compression overhead outweighs the saving
+MIN_SIZE = 1024
+
+
+def _write_variant(source: Path, suffix: str, data: bytes) -> bool:
+    """Write a variant if it is smaller; stamp it with the source mtime"""
+    target = source.with_name(source.name + suffix)
+    if len(data) >= source.stat().st_size:
+        target.unlink(missing_ok=True)
+        return False
+    target.write_bytes(data)
+    stat = source.stat()
+    os.utime(target, (stat.st_atime, stat.st_mtime))
+    return True
+
+
+def precompress(directory: Path) -> int:
+    written = 0
+    for source in sorted(directory.rglob("*")):
+        if not source.is_file() or source.suffix.lower() not in COMPRESSIBLE:
+            continue
+        if source.stat().st_size < MIN_SIZE:
+            continue
+
+        content = source.read_bytes()
+        if _write_variant(source, ".gz", gzip.compress(content, compresslevel=9, mtime=0)):
+            written += 1
+            print(f"✓ {source}.gz")
+        if brotli is not None and _write_variant(source, ".br", brotli.compress(content, quality=11)):
+            written += 1
+            print(f"✓ {source}.br")
+    return written
+
+
+def main():
+    directories = [Path(arg) for arg in sys.argv[1:]] or [Path("static"), Path("media")]
+    if brotli is None:
+        print("brotli not installed; writing gzip variants only (pip install brotli)")
+
+    written = sum(precompress(directory) for directory in directories if directory.is_dir())
+    print(f"\n{written} precompressed variants written")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
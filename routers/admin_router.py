@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from typing import List
+from typing import List, Optional
 
 from database import get_db
 from auth import (
@@ -28,8 +28,17 @@ from schemas import (
 )
 from config import settings
 from services.bandwidth_monitor import get_bandwidth_status
+from services.buzz_analytics import get_session_analytics
+from services.rate_limiter import buzz_rate_limiter
+from services.static_files import file_cache
+from services.office_pool import office_pool
 from services.display_registry import approve_display, count_protected, list_displays
 from services.livekit_tokens import create_livekit_token
+from services.roster_cache import roster_cache
+from services.score_ledger import score_ledger
+from services.snapshot_cache import snapshot_cache
+from services.score_integrity import verify_scores
+from services.job_registry import job_registry
 from routers.ws_router import manager
 
 router = APIRouter()
@@ -95,6 +104,13 @@ async def update_team(
 
     await db.commit()
     await db.refresh(team)
+
+    # Names/seats/active flags are cached per session; seat order breaks leaderboard ties
+    roster_cache.invalidate_team(team_id)
+    snapshot_cache.invalidate()
+    if team_update.seat_order is not None:
+        score_ledger.invalidate()
+
     return team
 
 
@@ -182,6 +198,7 @@ async def update_session(
 
     await db.commit()
     await db.refresh(session)
+    snapshot_cache.invalidate(session_id)
     return session
 
 
@@ -287,6 +304,10 @@ async def assign_teams_to_session(
 
     await db.commit()
 
+    roster_cache.invalidate(session_id)
+    score_ledger.invalidate(session_id)
+    snapshot_cache.invalidate(session_id)
+
     return {"message": f"Assigned {len(teams)} teams to session"}
 
 
@@ -482,6 +503,94 @@ async def get_bandwidth_status_admin(
     return await get_bandwidth_status()
 
 
+# ============ Buzzer Analytics ============
+
+@router.get("/sessions/{session_id}/buzz-analytics")
+async def get_buzz_analytics(
+    session_id: int,
+    current_user: User = Depends(get_current_quiz_master)
+):
+    """Per-team and per-question buzz statistics (admin or quiz master)"""
+    return await get_session_analytics(session_id)
+
+
+@router.get("/metrics/buzz-rate-limit")
+async def get_buzz_rate_limit_metrics(
+    current_user: User = Depends(get_current_quiz_master)
+):
+    """Counters for buzz frames accepted/throttled by the token-bucket limiter"""
+    return buzz_rate_limiter.get_metrics()
+
+
+@router.get("/metrics/static-cache")
+async def get_static_cache_metrics(
+    current_user: User = Depends(get_current_admin)
+):
+    """Hit/miss counters and memory use of the static/media file cache"""
+    return file_cache.get_metrics()
+
+
+@router.get("/metrics/office-workers")
+async def get_office_worker_status(
+    current_user: User = Depends(get_current_admin)
+):
+    """Warm LibreOffice workers: whether each is running and how often it was restarted"""
+    return {"enabled": office_pool.enabled, "workers": office_pool.get_status()}
+
+
+# ============ Score History ============
+
+@router.post("/sessions/{session_id}/scores/rebuild")
+async def rebuild_session_scores(
+    session_id: int,
+    current_user: User = Depends(get_current_admin)
+):
+    """Recompute score totals from the latest snapshot plus the score event log"""
+    totals = await score_ledger.rebuild_projection(session_id)
+    snapshot_cache.invalidate(session_id)
+    return {
+        "message": f"Rebuilt scores for {len(totals)} teams",
+        "totals": {str(team_session_id): total for team_session_id, total in totals.items()}
+    }
+
+
+@router.get("/scores/dead-letters")
+async def get_score_dead_letters(
+    limit: int = 100,
+    current_user: User = Depends(get_current_admin)
+):
+    """Score events the writer could not persist, with the error for each"""
+    return await score_ledger.get_dead_letters(limit)
+
+
+@router.post("/scores/verify")
+async def start_score_verification(
+    session_id: Optional[int] = None,
+    fix: bool = False,
+    current_user: User = Depends(get_current_admin)
+):
+    """Check scores.total against starting_score + score event deltas in the
+    background (one session, or all when session_id is omitted); fix=true
+    rewrites mismatched totals"""
+    job = job_registry.create("score_verify", {"session_id": session_id, "fix": fix})
+    job_registry.start(job, lambda _job: verify_scores(session_id, fix))
+    return {"job_id": job["id"], "status": job["status"]}
+
+
+# ============ Background Jobs ============
+
+@router.get("/jobs/{job_id}")
+async def get_job(
+    job_id: str,
+    current_user: User = Depends(get_current_admin)
+):
+    """Status and result of a background job"""
+    job = job_registry.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
 # ============ Admin Settings Management ============
 
 @router.get("/settings")
@@ -1,13 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException
+import hashlib
+import json
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from typing import List, Optional
 
-from database import get_db
-from models import Session, Slide, Round, TeamSession, Score, Team, AdminSettings
+from database import get_db, get_async_session_maker
+from models import Session, Deck, Slide, SlideMapping, Round, AdminSettings
 from schemas import DisplaySnapshot, SlideResponse, RoundResponse, ScoreResponse
 import redis.asyncio as redis
 from config import settings
+from services.media_service import pick_rendition, slide_image_url
+from services.roster_cache import roster_cache
+from services.score_ledger import score_ledger
+from services.snapshot_cache import snapshot_cache
+from services.static_files import serve_file
+from services.sse_hub import sse_hub
+from routers.ws_router import manager
 
 router = APIRouter()
 
@@ -19,78 +30,101 @@ async def get_redis():
 @router.get("/sessions/{session_id}/snapshot")
 async def get_display_snapshot(
     session_id: int,
-    db: AsyncSession = Depends(get_db)
+    request: Request
 ):
-    """Get complete snapshot for main display screen"""
-    # Get session
-    result = await db.execute(select(Session).where(Session.id == session_id))
-    session = result.scalar_one_or_none()
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
+    """Get complete snapshot for main display screen.
 
-    # Get current slide
-    current_slide = None
-    if session.current_slide_id:
-        result = await db.execute(select(Slide).where(Slide.id == session.current_slide_id))
-        current_slide = result.scalar_one_or_none()
+    The snapshot is cached per session and tagged with a weak ETag that
+    changes whenever the session's state does; clients revalidating with
+    If-None-Match get 304 Not Modified. timer_state is read live and is not
+    part of the ETag (displays follow the timer via timer.tick).
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and snapshot_cache.etag(session_id) in _parse_etags(if_none_match):
+        return Response(status_code=304, headers=_cache_headers(snapshot_cache.etag(session_id)))
 
-    # Get current round
-    current_round = None
-    if session.current_round_id:
-        result = await db.execute(select(Round).where(Round.id == session.current_round_id))
-        current_round = result.scalar_one_or_none()
+    etag, snapshot = await snapshot_cache.get(session_id, _build_snapshot)
 
-    # Get scores
-    result = await db.execute(
-        select(TeamSession, Team, Score)
-        .join(Team, TeamSession.team_id == Team.id)
-        .outerjoin(Score, Score.team_session_id == TeamSession.id)
-        .where(TeamSession.session_id == session_id)
-        .order_by(Team.seat_order, Team.name)
+    return JSONResponse(
+        {**snapshot, "timer_state": await _get_timer_state(session_id)},
+        headers=_cache_headers(etag)
     )
 
+
+def _parse_etags(header: str) -> List[str]:
+    return [tag.strip() for tag in header.split(",")]
+
+
+def _cache_headers(etag: str) -> dict:
+    # no-cache: browsers keep the body but revalidate every time
+    return {"ETag": etag, "Cache-Control": "no-cache"}
+
+
+async def _get_timer_state(session_id: int) -> Optional[dict]:
+    r = await get_redis()
+    timer_data = await r.hgetall(f"timer:{session_id}")
+    if not timer_data:
+        return None
+    return {
+        "state": timer_data.get("state"),
+        "remaining_ms": int(timer_data.get("remaining_ms", 0)),
+        "duration_ms": int(timer_data.get("duration_ms", 0))
+    }
+
+
+async def _build_snapshot(session_id: int) -> dict:
+    """Assemble the cacheable part of the display snapshot"""
+    async_session = get_async_session_maker()
+    async with async_session() as db:
+        # Get session
+        result = await db.execute(select(Session).where(Session.id == session_id))
+        session = result.scalar_one_or_none()
+        if not session:
+            raise HTTPException(status_code=404, detail="Session not found")
+
+        # Get current slide
+        current_slide = None
+        if session.current_slide_id:
+            result = await db.execute(select(Slide).where(Slide.id == session.current_slide_id))
+            current_slide = result.scalar_one_or_none()
+
+        # Get current round
+        current_round = None
+        if session.current_round_id:
+            result = await db.execute(select(Round).where(Round.id == session.current_round_id))
+            current_round = result.scalar_one_or_none()
+
+    # Get scores (seat order, live totals and ranks from the leaderboard)
+    board = {entry["team_id"]: entry for entry in await score_ledger.get_leaderboard(session_id)}
     scores = []
-    for team_session, team, score in result:
+    for entry in await roster_cache.ordered(session_id):
+        standing = board.get(entry["team_id"], {})
         scores.append({
-            "team_id": team.id,
-            "team_name": team.name,
-            "total": score.total if score else 0,
-            "updated_at": score.updated_at if score else None
+            "team_id": entry["team_id"],
+            "team_name": entry["team_name"],
+            "total": standing.get("total", 0),
+            "rank": standing.get("rank")
         })
 
-    # Get timer state from Redis
-    r = await get_redis()
-    timer_key = f"timer:{session_id}"
-    timer_data = await r.hgetall(timer_key)
-    timer_state = None
-    if timer_data:
-        timer_state = {
-            "state": timer_data.get("state"),
-            "remaining_ms": int(timer_data.get("remaining_ms", 0)),
-            "duration_ms": int(timer_data.get("duration_ms", 0))
-        }
-
     # Get buzzer queue from Redis
+    r = await get_redis()
     buzzer_key = f"buzzer:{session_id}"
     buzzer_members = await r.zrange(buzzer_key, 0, -1, withscores=True)
     buzzer_queue = []
 
-    for member, timestamp in buzzer_members:
-        team_id, device_id = member.split(":", 1)
-        # Get team name
-        result = await db.execute(select(Team).where(Team.id == int(team_id)))
-        team = result.scalar_one_or_none()
-
-        if team:
-            placement = await r.zrank(buzzer_key, member)
+    # Team names come from the roster cache (no per-buzzer query)
+    team_names = await roster_cache.team_names(session_id) if buzzer_members else {}
+    for index, (member, timestamp) in enumerate(buzzer_members):
+        team_id = int(member.split(":", 1)[0])
+        if team_id in team_names:
             buzzer_queue.append({
-                "team_id": team.id,
-                "team_name": team.name,
-                "placement": placement + 1 if placement is not None else 0,
+                "team_id": team_id,
+                "team_name": team_names[team_id],
+                "placement": index + 1,
                 "timestamp": timestamp
             })
 
-    return {
+    return jsonable_encoder({
         "session_id": session.id,
         "session_name": session.name,
         "banner_text": session.banner_text,
@@ -98,8 +132,161 @@ async def get_display_snapshot(
         "current_round": RoundResponse.from_orm(current_round) if current_round else None,
         "mode": session.mode,
         "scores": scores,
-        "timer_state": timer_state,
         "buzzer_queue": buzzer_queue
+    })
+
+
+@router.get("/sessions/{session_id}/slides/{slide_id}/image")
+async def get_slide_image(
+    session_id: int,
+    slide_id: int,
+    request: Request,
+    h: Optional[int] = None,
+    v: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Slide image sized for the requesting display.
+
+    `h` is the display's height bucket (720, 1080 or 2160, computed by the
+    client), so the response depends only on the URL and the Accept header:
+    WebP when the browser allows it, the original PNG otherwise. URLs
+    carrying the slide's current image hash (`v`) are cacheable forever.
+    """
+    result = await db.execute(
+        select(Slide)
+        .join(Deck, Deck.id == Slide.deck_id)
+        .where(Slide.id == slide_id, Deck.session_id == session_id)
+    )
+    slide = result.scalar_one_or_none()
+    if not slide:
+        raise HTTPException(status_code=404, detail="Slide not found")
+
+    path, media_type = pick_rendition(
+        slide.png_path,
+        slide.renditions,
+        h,
+        "image/webp" in request.headers.get("accept", "")
+    )
+    if v and v == slide.image_hash:
+        cache_control = "public, max-age=31536000, immutable"
+    else:
+        cache_control = "public, max-age=60"
+    return await serve_file(
+        path,
+        request.headers,
+        media_type=media_type,
+        cache_control=cache_control,
+        vary="Accept",
+        head=request.method == "HEAD"
+    )
+
+
+@router.get("/sessions/{session_id}/manifest")
+async def get_media_manifest(
+    session_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_db)
+):
+    """Every question/answer slide of the session with its content-hashed URL,
+    so displays can prefetch. Revalidate with If-None-Match."""
+    result = await db.execute(select(Session.id).where(Session.id == session_id))
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    result = await db.execute(
+        select(Slide, Deck.deck_type)
+        .join(Deck, Deck.id == Slide.deck_id)
+        .where(Deck.session_id == session_id)
+        .order_by(Deck.deck_type.desc(), Deck.id, Slide.slide_index)
+    )
+    rows = result.all()
+
+    slide_ids = [slide.id for slide, _ in rows]
+    answers = {}
+    if slide_ids:
+        result = await db.execute(
+            select(SlideMapping.question_slide_id, SlideMapping.answer_slide_id)
+            .where(SlideMapping.question_slide_id.in_(slide_ids))
+        )
+        answers = dict(result.all())
+
+    slides = [
+        {
+            "id": slide.id,
+            "deck_id": slide.deck_id,
+            "deck_type": deck_type,
+            "slide_index": slide.slide_index,
+            "image_hash": slide.image_hash,
+            "url": slide_image_url(session_id, slide.id, slide.image_hash),
+            "answer_slide_id": answers.get(slide.id)
+        }
+        for slide, deck_type in rows
+    ]
+
+    etag = 'W/"manifest-' + hashlib.sha256(
+        json.dumps(slides, separators=(",", ":")).encode()
+    ).hexdigest()[:16] + '"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in _parse_etags(request.headers.get("if-none-match", "")):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse({"session_id": session_id, "slides": slides}, headers=headers)
+
+
+@router.get("/sessions/{session_id}/events")
+async def stream_session_events(
+    session_id: int,
+    request: Request
+):
+    """Server-Sent Events stream of slide, timer, buzzer and score events.
+
+    Read-only alternative to the display WebSocket. Reconnecting clients
+    send Last-Event-ID (EventSource does this automatically) to resume; a
+    stream.resync event means frames were missed and the snapshot should be
+    refetched.
+    """
+    async_session = get_async_session_maker()
+    async with async_session() as db:
+        result = await db.execute(select(Session.id).where(Session.id == session_id))
+        if result.scalar_one_or_none() is None:
+            raise HTTPException(status_code=404, detail="Session not found")
+
+    last_event_id = request.headers.get("last-event-id") or request.query_params.get("last_event_id")
+
+    async def frames():
+        # Keeps timer ticks and heartbeats running even with no WebSocket clients
+        manager.add_stream_listener(session_id)
+        try:
+            yield b"retry: 3000\n\n"
+            async for frame in sse_hub.subscribe(session_id, last_event_id):
+                yield frame
+        finally:
+            manager.remove_stream_listener(session_id)
+
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/sessions/{session_id}/rounds/{round_id}/standings")
+async def get_round_standings(
+    session_id: int,
+    round_id: int,
+    db: AsyncSession = Depends(get_db)
+):
+    """Standings for a single round (precomputed per-round totals)"""
+    result = await db.execute(
+        select(Round).where(Round.id == round_id, Round.session_id == session_id)
+    )
+    round_obj = result.scalar_one_or_none()
+    if not round_obj:
+        raise HTTPException(status_code=404, detail="Round not found")
+
+    return {
+        "round_id": round_obj.id,
+        "round_name": round_obj.name,
+        "standings": await score_ledger.get_round_standings(session_id, round_id)
     }
 
 
@@ -1,19 +1,32 @@
+import asyncio
+
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import delete, or_, select, update
 from sqlalchemy.orm import selectinload
-from typing import List
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
 
-from database import get_db
+from database import get_db, get_async_session_maker
 from auth import get_current_admin
-from models import User, Session, Deck, Slide, SlideMapping
+from models import User, Session, Deck, DeckContent, Slide, SlideMapping
 from schemas import DeckResponse, SlideMappingCreate
 from services.media_service import media_service
+from services.job_registry import job_registry
+from services.snapshot_cache import snapshot_cache
+from routers.ws_router import manager
 
 router = APIRouter()
 
 
-@router.post("/sessions/{session_id}/decks", response_model=DeckResponse)
+# In-flight conversions by content hash; duplicate uploads await the same result
+_conversions: Dict[str, asyncio.Future] = {}
+# Serializes content lookup/registration so concurrent duplicates share one row
+_content_lock = asyncio.Lock()
+# Decks whose new version is being converted
+_replacing: Set[int] = set()
+
+
+@router.post("/sessions/{session_id}/decks", status_code=202)
 async def upload_deck(
     session_id: int,
     deck_type: str,
@@ -21,7 +34,13 @@ async def upload_deck(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_admin)
 ):
-    """Upload PPT deck and convert to images"""
+    """Upload PPT deck and queue its conversion to images.
+
+    Returns a job id right away; progress is pushed to the session's admin
+    WebSocket as deck.conversion events and the job is also visible at
+    GET /api/admin/jobs/{job_id}. Files are stored by content hash: a file
+    that was already converted is linked to the existing images instead.
+    """
     # Verify session exists
     result = await db.execute(select(Session).where(Session.id == session_id))
     session = result.scalar_one_or_none()
@@ -37,47 +56,520 @@ async def upload_deck(
         raise HTTPException(status_code=400, detail="Only PPT/PPTX files allowed")
 
     # Save PPT file
-    ppt_path = await media_service.save_ppt(file)
-
-    # Create deck record
-    deck = Deck(
-        session_id=session_id,
-        deck_type=deck_type,
-        ppt_path=ppt_path,
-        native_required=False
+    upload_path, content_hash = await media_service.save_ppt(file)
+
+    async with _content_lock:
+        content = await _claim_content(db, upload_path, content_hash)
+        deck = Deck(
+            session_id=session_id,
+            deck_type=deck_type,
+            ppt_path=content.ppt_path,
+            native_required=False,
+            content=content
+        )
+        db.add(deck)
+        await db.flush()
+
+        # Ready content whose slides no deck holds any more is simply converted again
+        slide_count = await _link_slides(db, deck.id, content.id) if content.status == "ready" else None
+        if slide_count is not None:
+            await db.commit()
+            return {
+                "job_id": None,
+                "deck_id": deck.id,
+                "sha256": content_hash,
+                "status": "completed",
+                "deduplicated": True,
+                "slide_count": slide_count
+            }
+
+        # Committed so the conversion job can see it
+        await db.commit()
+        convert = _claim_conversion(content_hash)
+
+    job = job_registry.create("deck_conversion", {
+        "session_id": session_id,
+        "deck_id": deck.id,
+        "deck_type": deck_type,
+        "sha256": content_hash
+    })
+    job_registry.start(
+        job,
+        lambda job: _run_deck_conversion(job, session_id, deck.id, content.id, content_hash, content.ppt_path, convert)
     )
-    db.add(deck)
-    await db.flush()
 
-    # Convert to images
+    return {
+        "job_id": job["id"],
+        "deck_id": deck.id,
+        "sha256": content_hash,
+        "status": job["status"],
+        "deduplicated": not convert
+    }
+
+
+@router.put("/sessions/{session_id}/decks/{deck_id}", status_code=202)
+async def replace_deck(
+    session_id: int,
+    deck_id: int,
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_admin)
+):
+    """Upload an edited version of a deck.
+
+    Only slides whose fingerprint changed are rendered again. Unchanged
+    slides keep their Slide ids (and so their mappings and timers), even if
+    they moved; an edited slide keeps the id of the slide it replaces at the
+    same position. Progress is reported like an upload.
+    """
+    deck = await db.get(Deck, deck_id)
+    if not deck or deck.session_id != session_id:
+        raise HTTPException(status_code=404, detail="Deck not found")
+
+    if not file.filename.endswith(('.ppt', '.pptx')):
+        raise HTTPException(status_code=400, detail="Only PPT/PPTX files allowed")
+
+    old_content = await db.get(DeckContent, deck.content_id) if deck.content_id is not None else None
+    if deck_id in _replacing or (old_content and old_content.status != "ready" and old_content.sha256 in _conversions):
+        raise HTTPException(status_code=409, detail="Deck is still converting")
+
+    # Held from here until the conversion job finishes
+    _replacing.add(deck_id)
     try:
-        slides_data = media_service.convert_ppt_to_images(ppt_path, deck.id)
-
-        # Create slide records
-        for slide_data in slides_data:
-            slide = Slide(
-                deck_id=deck.id,
-                slide_index=slide_data["slide_index"],
-                png_path=slide_data["png_path"],
-                thumb_path=slide_data["thumb_path"]
-            )
-            db.add(slide)
+        upload_path, content_hash = await media_service.save_ppt(file)
+        if old_content and old_content.sha256 == content_hash:
+            await media_service.discard_upload(upload_path)
+            _replacing.discard(deck_id)
+            return {"job_id": None, "deck_id": deck_id, "sha256": content_hash, "status": "unchanged"}
+
+        async with _content_lock:
+            content = await _claim_content(db, upload_path, content_hash)
+            await db.commit()
+            content_status = content.status
+            convert = content_status != "ready" and _claim_conversion(content_hash)
+    except BaseException:
+        _replacing.discard(deck_id)
+        raise
+
+    job = job_registry.create("deck_conversion", {
+        "session_id": session_id,
+        "deck_id": deck_id,
+        "deck_type": deck.deck_type,
+        "sha256": content_hash,
+        "replaces": old_content.sha256 if old_content else None
+    })
+    job_registry.start(
+        job,
+        lambda job: _run_deck_replacement(
+            job, session_id, deck_id, content.id, content_hash, content.ppt_path, content_status, convert
+        )
+    )
 
-        await db.commit()
+    return {
+        "job_id": job["id"],
+        "deck_id": deck_id,
+        "sha256": content_hash,
+        "status": job["status"],
+        "deduplicated": not convert
+    }
 
-        # Refresh deck with eager-loaded slides to avoid lazy loading issues
-        result = await db.execute(
-            select(Deck)
-            .where(Deck.id == deck.id)
-            .options(selectinload(Deck.slides))
+
+@router.delete("/sessions/{session_id}/decks/{deck_id}")
+async def delete_deck(
+    session_id: int,
+    deck_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_admin)
+):
+    """Delete a deck, its slides and mappings; shared images go with the last deck using them"""
+    deck = await db.get(Deck, deck_id)
+    if not deck or deck.session_id != session_id:
+        raise HTTPException(status_code=404, detail="Deck not found")
+
+    if deck_id in _replacing:
+        raise HTTPException(status_code=409, detail="Deck is still converting")
+    if deck.content_id is not None:
+        content = await db.get(DeckContent, deck.content_id)
+        if content.status != "ready" and content.sha256 in _conversions:
+            raise HTTPException(status_code=409, detail="Deck is still converting")
+
+    unused_files = await _delete_deck(db, deck)
+    await db.commit()
+    snapshot_cache.invalidate(session_id)
+
+    if unused_files:
+        await media_service.remove_deck_files(*unused_files)
+
+    return {"message": "Deck deleted", "files_removed": unused_files is not None}
+
+
+async def _claim_content(db: AsyncSession, upload_path: str, content_hash: str) -> DeckContent:
+    """Find or register the DeckContent for an upload and take a reference to it.
+
+    Call under _content_lock so concurrent duplicates share one row.
+    """
+    result = await db.execute(select(DeckContent).where(DeckContent.sha256 == content_hash))
+    content = result.scalar_one_or_none()
+
+    if content is None:
+        ppt_path = await media_service.store_upload(upload_path, content_hash)
+        content = DeckContent(sha256=content_hash, ppt_path=ppt_path, status="converting", ref_count=0)
+        db.add(content)
+    else:
+        # Same bytes are already stored
+        await media_service.discard_upload(upload_path)
+
+    content.ref_count += 1
+    return content
+
+
+def _claim_conversion(content_hash: str) -> bool:
+    """Register a conversion of this content unless another upload is already
+    converting it (a 'converting' row with no live future was interrupted by
+    a restart). Call under _content_lock."""
+    if content_hash in _conversions:
+        return False
+    future = asyncio.get_running_loop().create_future()
+    # Mark the outcome as retrieved even when no duplicate is waiting
+    future.add_done_callback(lambda f: f.cancelled() or f.exception())
+    _conversions[content_hash] = future
+    return True
+
+
+def _slide_fields(slide_data: dict) -> dict:
+    return {
+        "slide_index": slide_data["slide_index"],
+        "png_path": slide_data["png_path"],
+        "thumb_path": slide_data["thumb_path"],
+        "renditions": slide_data.get("renditions"),
+        "image_hash": slide_data.get("image_hash"),
+        "fingerprint": slide_data.get("fingerprint")
+    }
+
+
+async def _content_slide_data(
+    db: AsyncSession,
+    content_id: int,
+    exclude_deck_id: Optional[int] = None
+) -> Optional[List[dict]]:
+    """Slide data of converted content, taken from a deck that already has
+    its Slide rows; None if no deck has them (yet)"""
+    query = select(Slide.deck_id).join(Deck, Deck.id == Slide.deck_id).where(Deck.content_id == content_id)
+    if exclude_deck_id is not None:
+        query = query.where(Deck.id != exclude_deck_id)
+    result = await db.execute(query.order_by(Slide.deck_id).limit(1))
+    source_deck_id = result.scalar_one_or_none()
+    if source_deck_id is None:
+        return None
+
+    result = await db.execute(
+        select(Slide).where(Slide.deck_id == source_deck_id).order_by(Slide.slide_index)
+    )
+    return [_slide_data(slide) for slide in result.scalars().all()]
+
+
+def _slide_data(slide: Slide) -> dict:
+    return {
+        "slide_index": slide.slide_index,
+        "png_path": slide.png_path,
+        "thumb_path": slide.thumb_path,
+        "renditions": slide.renditions,
+        "image_hash": slide.image_hash,
+        "fingerprint": slide.fingerprint
+    }
+
+
+async def _link_slides(db: AsyncSession, deck_id: int, content_id: int) -> Optional[int]:
+    """Give a deck Slide rows pointing at images another deck already
+    converted; None (nothing linked) if no deck has them"""
+    slides_data = await _content_slide_data(db, content_id, exclude_deck_id=deck_id)
+    if slides_data is None:
+        return None
+    db.add_all([Slide(deck_id=deck_id, **_slide_fields(slide_data)) for slide_data in slides_data])
+    return len(slides_data)
+
+
+async def _detach_slides(db: AsyncSession, slide_ids):
+    """Clear references to slides that are about to be deleted"""
+    await db.execute(
+        update(Session).where(Session.current_slide_id.in_(slide_ids)).values(current_slide_id=None)
+    )
+    await db.execute(
+        delete(SlideMapping).where(
+            or_(SlideMapping.question_slide_id.in_(slide_ids), SlideMapping.answer_slide_id.in_(slide_ids))
         )
-        deck = result.scalar_one()
+    )
+
+
+async def _delete_deck(db: AsyncSession, deck: Deck) -> Optional[Tuple[str, Optional[str]]]:
+    """Delete a deck's rows and release its content.
+
+    Returns (deck_key, ppt_path) when no deck uses those files any more, so
+    the caller can remove them after committing.
+    """
+    await _detach_slides(db, select(Slide.id).where(Slide.deck_id == deck.id))
+    await db.execute(delete(Slide).where(Slide.deck_id == deck.id))
+    await db.execute(delete(Deck).where(Deck.id == deck.id))
+
+    if deck.content_id is None:
+        # Uploaded before content addressing: files are per deck
+        return str(deck.id), deck.ppt_path
+    return await _release_content(db, deck.content_id)
+
+
+async def _release_content(db: AsyncSession, content_id: int) -> Optional[Tuple[str, Optional[str]]]:
+    """Drop one reference to a DeckContent; returns its files once unused"""
+    content = await db.get(DeckContent, content_id)
+    content.ref_count -= 1
+    if content.ref_count > 0:
+        return None
+    await db.execute(delete(DeckContent).where(DeckContent.id == content.id))
+    return content.sha256, content.ppt_path
+
+
+async def _report_conversion(job: dict, session_id: int, status: str, progress: int, **extra):
+    job["progress"] = progress
+    await manager.broadcast_to_session(
+        session_id,
+        {
+            "event": "deck.conversion",
+            "job_id": job["id"],
+            "deck_id": job["params"]["deck_id"],
+            "deck_type": job["params"]["deck_type"],
+            "status": status,
+            "progress": progress,
+            **extra
+        },
+        role="admin"
+    )
+
+
+async def _run_deck_conversion(
+    job: dict,
+    session_id: int,
+    deck_id: int,
+    content_id: int,
+    content_hash: str,
+    ppt_path: str,
+    convert: bool
+) -> dict:
+    """Convert in a worker process (or wait for the upload already converting
+    the same file), then create the deck's Slide rows"""
+    async_session = get_async_session_maker()
+
+    async def save(db: AsyncSession, slides_data: List[dict]):
+        db.add_all([Slide(deck_id=deck_id, **_slide_fields(slide_data)) for slide_data in slides_data])
+
+    try:
+        if convert:
+            await _report_conversion(job, session_id, "converting", 10)
+            slides_data, _ = await _convert_content(job, session_id, content_id, content_hash, ppt_path, save)
+        else:
+            await _report_conversion(job, session_id, "waiting", 10)
+            slides_data = await asyncio.shield(_conversions[content_hash])
+            await _report_conversion(job, session_id, "saving", 90)
+            async with async_session() as db:
+                await save(db, slides_data)
+                await db.commit()
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        # Don't leave an empty deck behind (the old inline upload rolled it back)
+        async with async_session() as db:
+            deck = await db.get(Deck, deck_id)
+            unused_files = await _delete_deck(db, deck) if deck else None
+            await db.commit()
+        if unused_files:
+            await media_service.remove_deck_files(*unused_files)
+        await _report_conversion(job, session_id, "failed", 100, error=str(e))
+        raise
+
+    await _report_conversion(job, session_id, "completed", 100, slide_count=len(slides_data))
+    return {"deck_id": deck_id, "slide_count": len(slides_data), "deduplicated": not convert}
+
+
+async def _run_deck_replacement(
+    job: dict,
+    session_id: int,
+    deck_id: int,
+    content_id: int,
+    content_hash: str,
+    ppt_path: str,
+    content_status: str,
+    convert: bool
+) -> dict:
+    """Convert the new version of a deck, rendering only changed slides, then
+    move the deck's Slide rows over to it and release the old version"""
+    async_session = get_async_session_maker()
+
+    async def save(db: AsyncSession, slides_data: List[dict]):
+        deck = await db.get(Deck, deck_id)
+        if deck is None:
+            raise RuntimeError("Deck was deleted during conversion")
+        kept = await _apply_slides(db, deck_id, slides_data)
+        old_content_id, old_ppt_path = deck.content_id, deck.ppt_path
+        deck.content_id = content_id
+        deck.ppt_path = ppt_path
+        if old_content_id is None:
+            # Uploaded before content addressing: files are per deck
+            return kept, (str(deck_id), old_ppt_path)
+        return kept, await _release_content(db, old_content_id)
+
+    try:
+        async with async_session() as db:
+            result = await db.execute(select(Slide).where(Slide.deck_id == deck_id))
+            previous = {slide.fingerprint: _slide_data(slide) for slide in result.scalars() if slide.fingerprint}
+
+        if convert:
+            await _report_conversion(job, session_id, "converting", 10)
+            slides_data, (kept, unused_files) = await _convert_content(
+                job, session_id, content_id, content_hash, ppt_path, save, reuse=previous
+            )
+        else:
+            if content_status == "ready":
+                async with async_session() as db:
+                    slides_data = await _content_slide_data(db, content_id)
+                if slides_data is None:
+                    raise RuntimeError("No converted slides found for this file; upload it again")
+            else:
+                await _report_conversion(job, session_id, "waiting", 10)
+                slides_data = await asyncio.shield(_conversions[content_hash])
+            await _report_conversion(job, session_id, "saving", 90)
+            async with async_session() as db:
+                kept, unused_files = await save(db, slides_data)
+                await db.commit()
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        # The deck keeps its current slides; give back the new version
+        async with async_session() as db:
+            unused_files = await _release_content(db, content_id)
+            await db.commit()
+        if unused_files:
+            await media_service.remove_deck_files(*unused_files)
+        await _report_conversion(job, session_id, "failed", 100, error=str(e))
+        raise
+    finally:
+        _replacing.discard(deck_id)
+
+    snapshot_cache.invalidate(session_id)
+    if unused_files:
+        await media_service.remove_deck_files(*unused_files)
+
+    rendered = sum(1 for slide_data in slides_data if not slide_data.get("reused"))
+    await _report_conversion(
+        job, session_id, "completed", 100, slide_count=len(slides_data), slides_kept=kept, slides_rendered=rendered
+    )
+    return {"deck_id": deck_id, "slide_count": len(slides_data), "slides_kept": kept, "slides_rendered": rendered}
+
+
+async def _apply_slides(db: AsyncSession, deck_id: int, slides_data: List[dict]) -> int:
+    """Point a deck's Slide rows at new slide data, keeping ids where possible.
+
+    New slides take the id of an old slide with the same fingerprint, or
+    else of the unmatched old slide at the same position. Old slides left
+    over are deleted with their mappings. Returns the number of ids kept.
+    """
+    # Park the old indexes out of the way of the (deck_id, slide_index) constraint
+    await db.execute(
+        update(Slide).where(Slide.deck_id == deck_id).values(slide_index=-1 - Slide.slide_index)
+    )
+    result = await db.execute(select(Slide).where(Slide.deck_id == deck_id).order_by(Slide.slide_index.desc()))
+    old_slides = result.scalars().all()
+
+    by_fingerprint: Dict[str, List[Slide]] = {}
+    by_index: Dict[int, Slide] = {}
+    for slide in old_slides:
+        by_index[-1 - slide.slide_index] = slide
+        if slide.fingerprint:
+            by_fingerprint.setdefault(slide.fingerprint, []).append(slide)
+
+    assigned: Dict[int, Slide] = {}
+    used = set()
+    for slide_data in slides_data:
+        for slide in by_fingerprint.get(slide_data.get("fingerprint"), []):
+            if slide.id not in used:
+                assigned[slide_data["slide_index"]] = slide
+                used.add(slide.id)
+                break
+    for slide_data in slides_data:
+        slide = by_index.get(slide_data["slide_index"])
+        if slide_data["slide_index"] not in assigned and slide is not None and slide.id not in used:
+            assigned[slide_data["slide_index"]] = slide
+            used.add(slide.id)
+
+    removed_ids = [slide.id for slide in old_slides if slide.id not in used]
+    if removed_ids:
+        await _detach_slides(db, removed_ids)
+        await db.execute(delete(Slide).where(Slide.id.in_(removed_ids)))
+
+    for slide_data in slides_data:
+        slide = assigned.get(slide_data["slide_index"])
+        if slide is None:
+            db.add(Slide(deck_id=deck_id, **_slide_fields(slide_data)))
+            continue
+        for field, value in _slide_fields(slide_data).items():
+            setattr(slide, field, value)
+    return len(assigned)
+
+
+async def _convert_content(
+    job: dict,
+    session_id: int,
+    content_id: int,
+    content_hash: str,
+    ppt_path: str,
+    save: Callable[[AsyncSession, List[dict]], Awaitable[Any]],
+    reuse: Optional[Dict[str, dict]] = None
+) -> Tuple[List[dict], Any]:
+    """Render a content hash once and publish the result to waiting duplicates.
+
+    save(db, slides_data) writes the converting deck's Slide rows in the
+    same transaction that marks the content ready, so an upload that finds
+    the content ready always finds slides to link. Returns (slides_data,
+    save's result).
+    """
+    future = _conversions[content_hash]
+    try:
+        async def on_progress(done: int, total: int):
+            # Rasterizing covers 20-90%; the PDF export before it reports no progress
+            await _report_conversion(
+                job, session_id, "rasterizing", 20 + 70 * done // total, pages_done=done, page_count=total
+            )
+
+        slides_data = await media_service.convert_in_worker(ppt_path, content_hash, on_progress, reuse)
+        sprites = await _build_sprites(content_hash, slides_data)
+
+        await _report_conversion(job, session_id, "saving", 90)
+        async with get_async_session_maker()() as db:
+            saved = await save(db, slides_data)
+            await db.execute(
+                update(DeckContent)
+                .where(DeckContent.id == content_id)
+                .values(status="ready", slide_count=len(slides_data), sprites=sprites)
+            )
+            await db.commit()
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(slides_data)
+    finally:
+        _conversions.pop(content_hash, None)
 
-        return deck
+    return slides_data, saved
 
+
+async def _build_sprites(content_hash: str, slides_data: List[dict]) -> Optional[dict]:
+    # Sprites only speed up deck browsing; a failure leaves per-slide thumbnails
+    try:
+        return await media_service.build_sprites(content_hash, slides_data)
     except Exception as e:
-        await db.rollback()
-        raise HTTPException(status_code=500, detail=f"Error processing PPT: {str(e)}")
+        print(f"Error building sprite sheets for {content_hash}: {e}")
+        return None
 
 
 @router.get("/sessions/{session_id}/decks", response_model=List[DeckResponse])
@@ -86,12 +578,12 @@ async def list_decks(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_admin)
 ):
-    """List all decks in session"""
+    """List all decks in session, with each deck's thumbnail sprite index"""
     # Use eager loading to avoid lazy loading issues in async context
     result = await db.execute(
         select(Deck)
         .where(Deck.session_id == session_id)
-        .options(selectinload(Deck.slides))
+        .options(selectinload(Deck.slides), selectinload(Deck.content))
     )
     decks = result.scalars().all()
 
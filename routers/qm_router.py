@@ -5,11 +5,16 @@ from typing import List
 
 from database import get_db
 from auth import get_current_quiz_master
-from models import User, Session, Deck, Slide, SlideMapping, TeamSession, Score, ScoreEvent
-from schemas import SessionResponse, TimerStart, ScoreAdjustment
+from models import User, Session, Deck, Slide, SlideMapping, Round
+from schemas import SessionResponse, TimerStart, ScoreAdjustment, ScoreBulkAdjustment
 import redis.asyncio as redis
 from config import settings
 from services.timer_service import timer_service
+from services.roster_cache import roster_cache
+from services.score_ledger import score_ledger
+from services.buzz_analytics import mark_slide_started, record_round
+from services.idempotency import idempotent
+from services.media_service import slide_image_url
 
 router = APIRouter()
 
@@ -30,6 +35,24 @@ async def broadcast_slide_change(session_id: int, slide_id: int, mode: str):
         slide = result.scalar_one_or_none()
 
         if slide:
+            # Reaction times are measured from when the slide went up
+            await mark_slide_started(session_id, slide.id)
+
+            # Prefetch hints: the mapped answer first, then the next slides of the deck
+            result = await session.execute(
+                select(Slide)
+                .join(SlideMapping, SlideMapping.answer_slide_id == Slide.id)
+                .where(SlideMapping.question_slide_id == slide.id)
+            )
+            upcoming = list(result.scalars().all())
+            result = await session.execute(
+                select(Slide)
+                .where(Slide.deck_id == slide.deck_id, Slide.slide_index > slide.slide_index)
+                .order_by(Slide.slide_index)
+                .limit(settings.slide_prefetch_count)
+            )
+            upcoming.extend(result.scalars().all())
+
             await manager.broadcast_to_session(
                 session_id,
                 {
@@ -37,8 +60,14 @@ async def broadcast_slide_change(session_id: int, slide_id: int, mode: str):
                     "slide": {
                         "id": slide.id,
                         "png_path": slide.png_path,
-                        "slide_index": slide.slide_index
+                        "slide_index": slide.slide_index,
+                        "image_hash": slide.image_hash,
+                        "url": slide_image_url(session_id, slide.id, slide.image_hash)
                     },
+                    "upcoming": [
+                        {"id": hint.id, "url": slide_image_url(session_id, hint.id, hint.image_hash)}
+                        for hint in upcoming
+                    ],
                     "mode": mode
                 }
             )
@@ -62,6 +91,7 @@ async def get_live_sessions(
 # ============ Slide Navigation ============
 
 @router.post("/sessions/{session_id}/slide/next")
+@idempotent
 async def next_slide(
     session_id: int,
     db: AsyncSession = Depends(get_db),
@@ -136,6 +166,7 @@ async def next_slide(
 
 
 @router.post("/sessions/{session_id}/slide/prev")
+@idempotent
 async def prev_slide(
     session_id: int,
     db: AsyncSession = Depends(get_db),
@@ -178,6 +209,7 @@ async def prev_slide(
 
 
 @router.post("/sessions/{session_id}/slide/reveal")
+@idempotent
 async def reveal_answer(
     session_id: int,
     db: AsyncSession = Depends(get_db),
@@ -213,6 +245,7 @@ async def reveal_answer(
 
 
 @router.post("/sessions/{session_id}/slide/jump")
+@idempotent
 async def jump_to_slide(
     session_id: int,
     slide_id: int,
@@ -245,6 +278,7 @@ async def jump_to_slide(
 # ============ Timer Control ============
 
 @router.post("/sessions/{session_id}/timer/start")
+@idempotent
 async def start_timer(
     session_id: int,
     timer_data: TimerStart,
@@ -266,6 +300,7 @@ async def start_timer(
 
 
 @router.post("/sessions/{session_id}/timer/pause")
+@idempotent
 async def pause_timer(
     session_id: int,
     current_user: User = Depends(get_current_quiz_master)
@@ -279,6 +314,7 @@ async def pause_timer(
 
 
 @router.post("/sessions/{session_id}/timer/reset")
+@idempotent
 async def reset_timer(
     session_id: int,
     current_user: User = Depends(get_current_quiz_master)
@@ -292,6 +328,7 @@ async def reset_timer(
 # ============ Buzzer Control ============
 
 @router.post("/sessions/{session_id}/buzzer/lock")
+@idempotent
 async def toggle_buzzer_lock(
     session_id: int,
     locked: bool,
@@ -306,14 +343,15 @@ async def toggle_buzzer_lock(
         await r.set(buzzer_key, "1", ex=1)
     else:
         await r.delete(buzzer_key)
-        # Also clear buzzer queue
-        await r.delete(f"buzzer:{session_id}")
-        await r.delete(f"buzzer:first:{session_id}")
+        # Archive the finished round for analytics; this also clears the queue
+        await record_round(session_id)
 
         # Broadcast buzzer cleared event to all clients
-        from routers.ws_router import broadcast_event
+        from routers.ws_router import broadcast_event, buzzer_version_key
         await broadcast_event(session_id, {
-            "event": "buzzer.cleared"
+            "event": "buzzer.cleared",
+            "queue": [],
+            "version": await r.incr(buzzer_version_key(session_id))
         })
 
     return {"message": f"Buzzers {'locked' if locked else 'unlocked'}"}
@@ -321,123 +359,203 @@ async def toggle_buzzer_lock(
 
 # ============ Score Management ============
 
+# Registered before /scores/{team_id} so "bulk" is not parsed as a team id
+@router.post("/sessions/{session_id}/scores/bulk")
+@idempotent
+async def adjust_scores_bulk(
+    session_id: int,
+    bulk: ScoreBulkAdjustment,
+    current_user: User = Depends(get_current_quiz_master)
+):
+    """Adjust several team scores at once (e.g. end of a written round)"""
+    # Validate every team against the roster before applying anything
+    roster = await roster_cache.get_roster(session_id)
+    missing = sorted({entry.team_id for entry in bulk.entries if entry.team_id not in roster})
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Teams not in this session: {missing}")
+
+    # One atomic ledger step; all ScoreEvent rows are written in one transaction
+    results = await score_ledger.apply_many(
+        session_id=session_id,
+        entries=[
+            {
+                "team_id": entry.team_id,
+                "team_session_id": roster[entry.team_id]["team_session_id"],
+                "delta": entry.delta,
+                "reason": entry.reason
+            }
+            for entry in bulk.entries
+        ],
+        round_id=bulk.round_id or 1,  # Default to round 1 if not specified
+        actor_user_id=current_user.id
+    )
+
+    # Last write per team wins if a team appears more than once
+    updates = {}
+    for entry, applied in zip(bulk.entries, results):
+        updates[entry.team_id] = applied
+
+    # One combined, self-contained broadcast instead of one per team
+    standings = await score_ledger.get_standings(session_id)
+    ranked = {entry["team_id"]: entry for entry in standings}
+    updates = [
+        {
+            "team_id": team_id,
+            "team_name": ranked.get(team_id, {}).get("team_name"),
+            "total": applied["total"],
+            "rank": ranked.get(team_id, {}).get("rank"),
+            "seq": applied["seq"]
+        }
+        for team_id, applied in updates.items()
+    ]
+
+    from routers.ws_router import broadcast_event
+    await broadcast_event(session_id, {
+        "event": "score.bulk_update",
+        "updates": updates,
+        "standings": standings,
+        "version": max(applied["seq"] for applied in results)
+    })
+
+    return {
+        "message": f"Applied {len(bulk.entries)} score adjustments",
+        "updates": updates
+    }
+
+
 @router.post("/sessions/{session_id}/scores/{team_id}")
+@idempotent
 async def adjust_score(
     session_id: int,
     team_id: int,
     score_adj: ScoreAdjustment,
-    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_quiz_master)
 ):
     """Adjust team score"""
-    # Get team session
-    result = await db.execute(
-        select(TeamSession)
-        .where(
-            TeamSession.session_id == session_id,
-            TeamSession.team_id == team_id
-        )
-    )
-    team_session = result.scalar_one_or_none()
-    if not team_session:
+    # Team session comes from the roster cache
+    team_entry = await roster_cache.get_team(session_id, team_id)
+    if not team_entry:
         raise HTTPException(status_code=404, detail="Team not in this session")
 
-    # Get current score
-    result = await db.execute(
-        select(Score).where(Score.team_session_id == team_session.id)
-    )
-    score = result.scalar_one_or_none()
-    if not score:
-        # Create score if doesn't exist
-        score = Score(team_session_id=team_session.id, total=0)
-        db.add(score)
-        await db.flush()
-
-    # Update score
-    score.total += score_adj.delta
-
-    # Log score event
-    score_event = ScoreEvent(
-        team_session_id=team_session.id,
+    # Atomic in Redis; the ScoreEvent/Score rows are written behind
+    applied = await score_ledger.apply(
+        session_id=session_id,
+        team_id=team_id,
+        team_session_id=team_entry["team_session_id"],
+        delta=score_adj.delta,
         round_id=score_adj.round_id or 1,  # Default to round 1 if not specified
         actor_user_id=current_user.id,
-        delta=score_adj.delta,
         reason=score_adj.reason
     )
-    db.add(score_event)
-
-    await db.commit()
 
     # Broadcast score update to all clients
     from routers.ws_router import broadcast_event
-    await broadcast_event(session_id, {
-        "event": "score.update",
-        "team_id": team_id,
-        "total": score.total
-    })
+    await broadcast_event(session_id, await _score_update_event(session_id, team_id, applied))
 
     return {
         "message": "Score updated",
         "team_id": team_id,
-        "new_total": score.total
+        "new_total": applied["total"],
+        "seq": applied["seq"]
+    }
+
+
+async def _score_update_event(session_id: int, team_id: int, applied: dict) -> dict:
+    """score.update carrying everything a client renders: the changed team's
+    name, total and rank, the full ranked standings and the score version"""
+    standings = await score_ledger.get_standings(session_id)
+    entry = next((entry for entry in standings if entry["team_id"] == team_id), {})
+    return {
+        "event": "score.update",
+        "team_id": team_id,
+        "team_name": entry.get("team_name"),
+        "total": applied["total"],
+        "rank": entry.get("rank"),
+        "seq": applied["seq"],
+        "version": applied["seq"],
+        "standings": standings
     }
 
 
 @router.post("/sessions/{session_id}/scores/{team_id}/undo")
+@idempotent
 async def undo_score(
     session_id: int,
     team_id: int,
-    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_quiz_master)
 ):
-    """Undo last score event for team"""
-    # Get team session
-    result = await db.execute(
-        select(TeamSession)
-        .where(
-            TeamSession.session_id == session_id,
-            TeamSession.team_id == team_id
-        )
-    )
-    team_session = result.scalar_one_or_none()
-    if not team_session:
+    """Undo the team's latest active score event (repeatable for multi-level undo)"""
+    return await _undo_redo_score(session_id, team_id, "undo", current_user)
+
+
+@router.post("/sessions/{session_id}/scores/{team_id}/redo")
+@idempotent
+async def redo_score(
+    session_id: int,
+    team_id: int,
+    current_user: User = Depends(get_current_quiz_master)
+):
+    """Re-apply the team's most recently undone score event"""
+    return await _undo_redo_score(session_id, team_id, "redo", current_user)
+
+
+async def _undo_redo_score(session_id: int, team_id: int, kind: str, current_user: User):
+    team_entry = await roster_cache.get_team(session_id, team_id)
+    if not team_entry:
         raise HTTPException(status_code=404, detail="Team not in this session")
 
-    # Get last score event
-    result = await db.execute(
-        select(ScoreEvent)
-        .where(ScoreEvent.team_session_id == team_session.id)
-        .order_by(ScoreEvent.created_at.desc())
-        .limit(1)
-    )
-    last_event = result.scalar_one_or_none()
-    if not last_event:
-        raise HTTPException(status_code=400, detail="No score events to undo")
+    # The target comes off the team's undo/redo stack by sequence number; the
+    # original event is kept and a compensating event is appended
+    if kind == "undo":
+        applied = await score_ledger.undo(session_id, team_id, actor_user_id=current_user.id)
+    else:
+        applied = await score_ledger.redo(session_id, team_id, actor_user_id=current_user.id)
+    if applied is None:
+        raise HTTPException(status_code=400, detail=f"No score events to {kind}")
 
-    # Get current score
+    # Broadcast score update to all clients
+    from routers.ws_router import broadcast_event
+    await broadcast_event(session_id, await _score_update_event(session_id, team_id, applied))
+
+    return {
+        "message": f"Score event {'undone' if kind == 'undo' else 'redone'}",
+        "team_id": team_id,
+        "new_total": applied["total"],
+        "seq": applied["seq"],
+        "target_seq": applied["target_seq"]
+    }
+
+
+# ============ Round Standings ============
+
+@router.post("/sessions/{session_id}/rounds/{round_id}/standings")
+async def show_round_standings(
+    session_id: int,
+    round_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_quiz_master)
+):
+    """Broadcast one round's standings to the display and team screens"""
     result = await db.execute(
-        select(Score).where(Score.team_session_id == team_session.id)
+        select(Round).where(Round.id == round_id, Round.session_id == session_id)
     )
-    score = result.scalar_one_or_none()
+    round_obj = result.scalar_one_or_none()
+    if not round_obj:
+        raise HTTPException(status_code=404, detail="Round not found")
 
-    # Revert score
-    if score:
-        score.total -= last_event.delta
-
-    # Delete score event
-    await db.delete(last_event)
-    await db.commit()
+    # Read straight from the precomputed per-round totals
+    standings = await score_ledger.get_round_standings(session_id, round_id)
 
-    # Broadcast score update to all clients
     from routers.ws_router import broadcast_event
     await broadcast_event(session_id, {
-        "event": "score.update",
-        "team_id": team_id,
-        "total": score.total if score else 0
+        "event": "round.standings",
+        "round_id": round_obj.id,
+        "round_name": round_obj.name,
+        "standings": standings
     })
 
     return {
-        "message": "Score event undone",
-        "team_id": team_id,
-        "new_total": score.total if score else 0
+        "message": "Round standings shown",
+        "round_id": round_obj.id,
+        "standings": standings
     }
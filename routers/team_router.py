@@ -5,9 +5,11 @@ from datetime import datetime
 
 from database import get_db
 from auth import get_current_team
-from models import Team, Session, TeamSession, Score, BuzzerEvent
+from models import Team, Session, TeamSession, BuzzerEvent
 import redis.asyncio as redis
 from config import settings
+from services.rate_limiter import buzz_rate_limiter
+from services.score_ledger import score_ledger
 
 router = APIRouter()
 
@@ -38,18 +40,17 @@ async def get_current_session(
 
     team_session, session = team_session_row
 
-    # Get team's score
-    result = await db.execute(
-        select(Score).where(Score.team_session_id == team_session.id)
-    )
-    score = result.scalar_one_or_none()
+    # Get team's score and rank from the score ledger (SQL is written behind)
+    score = await score_ledger.get_total(session.id, current_team.id)
+    rank = await score_ledger.get_rank(session.id, current_team.id)
 
     return {
         "session_id": session.id,
         "session_name": session.name,
         "team_id": current_team.id,
         "team_name": current_team.name,
-        "score": score.total if score else 0
+        "score": score,
+        "rank": rank
     }
 
 
@@ -61,6 +62,9 @@ async def buzz(
     current_team: Team = Depends(get_current_team)
 ):
     """Team buzzes in (fallback HTTP endpoint)"""
+    if not buzz_rate_limiter.allow(session_id, current_team.id, device_id):
+        raise HTTPException(status_code=429, detail="Too many buzzes")
+
     r = await get_redis()
 
     # Respect explicit QM lock (do not apply per-buzz cooldown)
@@ -98,6 +102,10 @@ async def buzz(
     db.add(buzzer_event)
     await db.commit()
 
+    # Same self-contained event as the WebSocket path
+    from routers.ws_router import broadcast_event, build_buzzer_update
+    await broadcast_event(session_id, await build_buzzer_update(r, session_id, current_team.id, member))
+
     return {
         "message": "Buzz registered",
         "placement": placement,
@@ -7,6 +7,12 @@ import redis.asyncio as redis
 from config import settings
 from services.display_registry import get_display, set_display_status, upsert_display
 from services.livekit_tokens import create_livekit_token
+from services.roster_cache import roster_cache
+from services.rate_limiter import buzz_rate_limiter
+from services.score_ledger import score_ledger
+from services.snapshot_cache import snapshot_cache
+from services.sse_hub import sse_hub
+from services.spectator_hub import spectator_hub
 
 router = APIRouter()
 
@@ -26,6 +32,8 @@ class ConnectionManager:
         self.buzzer_heartbeat_tasks: Dict[int, asyncio.Task] = {}
         # Track score heartbeat tasks
         self.score_heartbeat_tasks: Dict[int, asyncio.Task] = {}
+        # Open SSE streams and spectator feeds per session (they need the background tasks too)
+        self.stream_listeners: Dict[int, int] = {}
 
     async def connect(self, websocket: WebSocket, session_id: int, role: str):
         await websocket.accept()
@@ -35,6 +43,23 @@ class ConnectionManager:
             self.active_connections[session_id][role] = set()
         self.active_connections[session_id][role].add(websocket)
 
+        self._start_session_tasks(session_id)
+
+    def add_stream_listener(self, session_id: int):
+        """Register an SSE or spectator subscriber so ticks and heartbeats keep flowing"""
+        self.stream_listeners[session_id] = self.stream_listeners.get(session_id, 0) + 1
+        self._start_session_tasks(session_id)
+
+    def remove_stream_listener(self, session_id: int):
+        remaining = self.stream_listeners.get(session_id, 0) - 1
+        if remaining > 0:
+            self.stream_listeners[session_id] = remaining
+            return
+        self.stream_listeners.pop(session_id, None)
+        if session_id not in self.active_connections:
+            self._stop_session_tasks(session_id)
+
+    def _start_session_tasks(self, session_id: int):
         # Start timer subscription for this session if not already running
         if session_id not in self.timer_tasks:
             self.timer_tasks[session_id] = asyncio.create_task(
@@ -102,25 +127,37 @@ class ConnectionManager:
                     for connections in self.active_connections[session_id].values()
                 )
                 if not has_connections:
-                    # Stop timer subscription
-                    if session_id in self.timer_tasks:
-                        self.timer_tasks[session_id].cancel()
-                        del self.timer_tasks[session_id]
+                    if session_id not in self.stream_listeners:
+                        self._stop_session_tasks(session_id)
 
-                    # Stop buzzer heartbeat
-                    if session_id in self.buzzer_heartbeat_tasks:
-                        self.buzzer_heartbeat_tasks[session_id].cancel()
-                        del self.buzzer_heartbeat_tasks[session_id]
+                    del self.active_connections[session_id]
 
-                    # Stop score heartbeat
-                    if session_id in self.score_heartbeat_tasks:
-                        self.score_heartbeat_tasks[session_id].cancel()
-                        del self.score_heartbeat_tasks[session_id]
+    def _stop_session_tasks(self, session_id: int):
+        # Stop timer subscription
+        if session_id in self.timer_tasks:
+            self.timer_tasks[session_id].cancel()
+            del self.timer_tasks[session_id]
 
-                    del self.active_connections[session_id]
+        # Stop buzzer heartbeat
+        if session_id in self.buzzer_heartbeat_tasks:
+            self.buzzer_heartbeat_tasks[session_id].cancel()
+            del self.buzzer_heartbeat_tasks[session_id]
+
+        # Stop score heartbeat
+        if session_id in self.score_heartbeat_tasks:
+            self.score_heartbeat_tasks[session_id].cancel()
+            del self.score_heartbeat_tasks[session_id]
 
     async def broadcast_to_session(self, session_id: int, message: dict, role: str = None):
         """Broadcast to specific role or all roles in session"""
+        # Every state-changing event also retires the cached display snapshot
+        snapshot_cache.invalidate_for_event(session_id, message)
+        # SSE subscribers get what displays get (role-specific copies go out once)
+        if role is None or role == "display":
+            sse_hub.publish(session_id, message)
+        # Spectators only fold it into their next rate-limited frame
+        spectator_hub.note(session_id, message)
+
         if session_id not in self.active_connections:
             return
 
@@ -218,11 +255,12 @@ class ConnectionManager:
 
                     # Wrap Redis operations in timeout (1 second max)
                     try:
-                        is_locked, queue_members, first_buzzer_team_id = await asyncio.wait_for(
+                        is_locked, queue_members, first_buzzer_team_id, version = await asyncio.wait_for(
                             asyncio.gather(
                                 r.get(buzzer_lock_key),
                                 r.zrange(buzzer_queue_key, 0, -1, withscores=True),
-                                r.get(first_buzzer_key)
+                                r.get(first_buzzer_key),
+                                r.get(buzzer_version_key(session_id))
                             ),
                             timeout=1.0
                         )
@@ -230,54 +268,7 @@ class ConnectionManager:
                         print(f"Redis timeout in buzzer heartbeat for session {session_id}")
                         continue  # Skip this heartbeat cycle
 
-                    # Build buzzer queue data with team names
-                    buzzer_queue = []
-                    if queue_members:
-                        # Get database session to fetch team names
-                        from database import get_async_session_maker
-                        from models import Team, TeamSession
-                        from sqlalchemy import select
-
-                        # Extract all team_ids FIRST (avoid N+1 query)
-                        team_ids = []
-                        member_data = []
-                        for index, (member, score) in enumerate(queue_members):
-                            parts = member.split(':', 1)
-                            team_id = int(parts[0]) if len(parts) > 0 else None
-                            device_id = parts[1] if len(parts) > 1 else "default"
-                            if team_id:
-                                team_ids.append(team_id)
-                                member_data.append((team_id, device_id, score, index + 1))
-
-                        # Fetch ALL team names in ONE query with timeout
-                        async_session = get_async_session_maker()
-                        try:
-                            async with async_session() as db:
-                                result = await asyncio.wait_for(
-                                    db.execute(
-                                        select(Team.id, Team.name)
-                                        .join(TeamSession, TeamSession.team_id == Team.id)
-                                        .where(
-                                            TeamSession.session_id == session_id,
-                                            Team.id.in_(team_ids)
-                                        )
-                                    ),
-                                    timeout=1.0
-                                )
-                                team_names = {team_id: name for team_id, name in result.all()}
-                        except asyncio.TimeoutError:
-                            print(f"Database timeout in buzzer heartbeat for session {session_id}")
-                            team_names = {}  # Fallback to empty names
-
-                        # Build queue with fetched names
-                        for team_id, device_id, score, placement in member_data:
-                            buzzer_queue.append({
-                                "team_id": team_id,
-                                "team_name": team_names.get(team_id, f"Team {team_id}"),
-                                "device_id": device_id,
-                                "timestamp": score,
-                                "placement": placement
-                            })
+                    buzzer_queue = await build_buzzer_queue(session_id, queue_members)
 
                     # Broadcast buzzer state to all clients
                     buzzer_state = {
@@ -285,7 +276,8 @@ class ConnectionManager:
                         "locked": bool(is_locked),
                         "queue": buzzer_queue,
                         "first_buzzer_team_id": int(first_buzzer_team_id) if first_buzzer_team_id else None,
-                        "total_buzzers": len(buzzer_queue)
+                        "total_buzzers": len(buzzer_queue),
+                        "version": int(version or 0)
                     }
 
                     await self.broadcast_to_session(session_id, buzzer_state)
@@ -318,46 +310,19 @@ class ConnectionManager:
                     # Get online team IDs for this session
                     online_team_ids = self.get_online_team_ids(session_id)
 
-                    # Get database session to fetch scores
-                    from database import get_async_session_maker
-                    from models import Team, TeamSession, Score
-                    from sqlalchemy import select
-
-                    async_session = get_async_session_maker()
-                    try:
-                        async with async_session() as db:
-                            # Fetch only online teams' scores with timeout
-                            result = await asyncio.wait_for(
-                                db.execute(
-                                    select(
-                                        Team.id,
-                                        Team.name,
-                                        Score.total
-                                    )
-                                    .join(TeamSession, TeamSession.team_id == Team.id)
-                                    .outerjoin(Score, Score.team_session_id == TeamSession.id)
-                                    .where(
-                                        TeamSession.session_id == session_id,
-                                        Team.id.in_(online_team_ids) if online_team_ids else False
-                                    )
-                                    .order_by(Score.total.desc().nulls_last(), Team.name)
-                                ),
-                                timeout=1.0
-                            )
-
-                            teams = result.all()
-                    except asyncio.TimeoutError:
-                        print(f"Database timeout in score heartbeat for session {session_id}")
-                        teams = []  # Fallback to empty scores
+                    # Build scores from the leaderboard and roster cache (online teams only)
+                    team_names = await roster_cache.team_names(session_id)
+                    board = await score_ledger.get_leaderboard(session_id)
 
-                    # Build scores list
                     scores = []
-                    for index, (team_id, team_name, total) in enumerate(teams):
+                    for entry in board:
+                        if entry["team_id"] not in online_team_ids:
+                            continue
                         scores.append({
-                            "team_id": team_id,
-                            "team_name": team_name,
-                            "total": total or 0,
-                            "rank": index + 1
+                            "team_id": entry["team_id"],
+                            "team_name": team_names.get(entry["team_id"], f"Team {entry['team_id']}"),
+                            "total": entry["total"],
+                            "rank": entry["rank"]
                         })
 
                     # Broadcast score state to all clients
@@ -365,7 +330,8 @@ class ConnectionManager:
                         "event": "score.status",
                         "scores": scores,
                         "total_teams": len(scores),
-                        "online_teams": len(online_team_ids)
+                        "online_teams": len(online_team_ids),
+                        "version": await score_ledger.get_version(session_id)
                     }
 
                     await self.broadcast_to_session(session_id, score_state)
@@ -387,6 +353,60 @@ class ConnectionManager:
 manager = ConnectionManager()
 
 
+def buzzer_version_key(session_id: int) -> str:
+    return f"buzzer:version:{session_id}"
+
+
+async def build_buzzer_queue(session_id: int, members) -> list:
+    """Ordered buzzer queue entries from ZRANGE ... WITHSCORES members,
+    with team names from the roster cache"""
+    buzzer_queue = []
+    if not members:
+        return buzzer_queue
+
+    team_names = await roster_cache.team_names(session_id)
+    for index, (member, score) in enumerate(members):
+        parts = member.split(':', 1)
+        team_id = int(parts[0]) if parts[0] else None
+        device_id = parts[1] if len(parts) > 1 else "default"
+        if not team_id:
+            continue
+        buzzer_queue.append({
+            "team_id": team_id,
+            "team_name": team_names.get(team_id, f"Team {team_id}"),
+            "device_id": device_id,
+            "timestamp": score,
+            "placement": index + 1
+        })
+    return buzzer_queue
+
+
+async def build_buzzer_update(r, session_id: int, team_id: int, member: str) -> dict:
+    """Self-contained buzzer.update event: the full ordered queue plus a
+    version so clients never need to refetch the snapshot"""
+    # One round trip for the new queue and the next buzzer version
+    pipe = r.pipeline(transaction=False)
+    pipe.zrange(f"buzzer:{session_id}", 0, -1, withscores=True)
+    pipe.incr(buzzer_version_key(session_id))
+    members, version = await pipe.execute()
+
+    queue = await build_buzzer_queue(session_id, members)
+    placement = next(
+        (index + 1 for index, (queued, _) in enumerate(members) if queued == member),
+        len(members)
+    )
+    return {
+        "event": "buzzer.update",
+        "team_id": team_id,
+        "team_name": next((entry["team_name"] for entry in queue if entry["team_id"] == team_id), None),
+        "timestamp": datetime.utcnow().isoformat(),
+        "placement": placement,
+        "total_buzzers": len(members),
+        "queue": queue,
+        "version": version
+    }
+
+
 @router.websocket("/admin/{session_id}")
 async def websocket_admin(websocket: WebSocket, session_id: int, token: str = Query(...)):
     """WebSocket for admin dashboard"""
@@ -572,6 +592,29 @@ async def websocket_display(websocket: WebSocket, session_id: int):
         manager.disconnect(websocket, session_id, "display")
 
 
+@router.websocket("/spectator/{session_id}")
+async def websocket_spectator(websocket: WebSocket, session_id: int):
+    """Read-only audience feed: rate-limited spectator.state frames, nothing accepted back"""
+    await websocket.accept()
+    if not spectator_hub.has_capacity(session_id):
+        await websocket.close(code=1013)  # Try again later
+        return
+
+    spectator_hub.add(session_id, websocket)
+    manager.add_stream_listener(session_id)
+    pump = asyncio.create_task(spectator_hub.pump(session_id, websocket))
+    try:
+        while True:
+            # Anything a spectator sends is dropped unread
+            await websocket.receive_text()
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        pump.cancel()
+        spectator_hub.remove(session_id, websocket)
+        manager.remove_stream_listener(session_id)
+
+
 @router.websocket("/team/{session_id}")
 async def websocket_team(websocket: WebSocket, session_id: int, token: str = Query(...)):
     """WebSocket for team clients with buzzer support"""
@@ -604,6 +647,10 @@ async def websocket_team(websocket: WebSocket, session_id: int, token: str = Que
                 # Use team_id from JWT token (already validated above)
                 device_id = message.get("device_id", "default")
 
+                # Throttled frames are dropped before touching Redis
+                if not buzz_rate_limiter.allow(session_id, team_id, device_id):
+                    continue
+
                 # Connect to Redis
                 r = await redis.from_url(settings.redis_url, decode_responses=True)
 
@@ -647,27 +694,17 @@ async def websocket_team(websocket: WebSocket, session_id: int, token: str = Que
                         })
                         continue
 
-                    # Get placement (rank in the queue)
-                    placement = await r.zrank(buzzer_queue_key, member_key)
-                    placement = placement + 1 if placement is not None else 1
+                    # Full queue, placement and version in one round trip
+                    buzz_event = await build_buzzer_update(r, session_id, team_id, member_key)
+                    placement = buzz_event["placement"]
+                    queue_size = buzz_event["total_buzzers"]
+                    timestamp = buzz_event["timestamp"]
 
                     # Set as first buzzer if queue was empty
-                    first_buzzer_key = f"buzzer:first:{session_id}"
-                    queue_size = await r.zcard(buzzer_queue_key)
                     if queue_size == 1:
-                        await r.set(first_buzzer_key, str(team_id))
-
-                    timestamp = datetime.utcnow().isoformat()
-
-                    # Broadcast buzz to all clients
-                    buzz_event = {
-                        "event": "buzzer.update",
-                        "team_id": team_id,
-                        "timestamp": timestamp,
-                        "placement": placement,
-                        "total_buzzers": queue_size
-                    }
+                        await r.set(f"buzzer:first:{session_id}", str(team_id))
 
+                    # Broadcast the build_buzzer_update payload to all clients
                     await manager.broadcast_to_session(session_id, buzz_event, role="qm")
                     await manager.broadcast_to_session(session_id, buzz_event, role="display")
                     await manager.broadcast_to_session(session_id, buzz_event, role="team")
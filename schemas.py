@@ -118,6 +118,7 @@ class SlideResponse(BaseModel):
     slide_index: int
     png_path: str
     thumb_path: str
+    image_hash: Optional[str] = None
     default_timer_ms: Optional[int]
 
     class Config:
@@ -139,6 +140,7 @@ class DeckResponse(BaseModel):
     ppt_path: str
     native_required: bool
     slides: List[SlideResponse] = []
+    sprites: Optional[Dict[str, Any]] = None
 
     class Config:
         from_attributes = True
@@ -152,6 +154,17 @@ class ScoreAdjustment(BaseModel):
     round_id: Optional[int] = None
 
 
+class ScoreBulkEntry(BaseModel):
+    team_id: int
+    delta: int
+    reason: Optional[str] = None
+
+
+class ScoreBulkAdjustment(BaseModel):
+    entries: List[ScoreBulkEntry] = Field(min_length=1)
+    round_id: Optional[int] = None
+
+
 class ScoreResponse(BaseModel):
     team_id: int
     team_name: str
@@ -0,0 +1,258 @@
+import json
+import time
+from typing import Dict, List, Optional
+
+import redis.asyncio as redis
+
+from config import settings
+
+
+# Placements above this are folded into a single "4+" bucket
+MAX_TRACKED_PLACEMENT = 3
+
+# Read the round and clear the queue in one step, so a buzz landing between
+# the read and the delete is neither lost nor counted in the next round
+TAKE_ROUND_SCRIPT = """
+local members = redis.call('ZRANGE', KEYS[1], 0, -1, 'WITHSCORES')
+if #members == 0 then
+    return {}
+end
+redis.call('DEL', KEYS[1], KEYS[2])
+return {members, redis.call('HGETALL', KEYS[3]), redis.call('HGETALL', KEYS[4])}
+"""
+
+
+def _round_context_key(session_id: int) -> str:
+    return f"buzzer:round:{session_id}"
+
+
+def _rounds_stream_key(session_id: int) -> str:
+    return f"buzz:rounds:{session_id}"
+
+
+def _session_stats_key(session_id: int) -> str:
+    return f"buzz:stats:session:{session_id}"
+
+
+def _team_stats_key(session_id: int) -> str:
+    return f"buzz:stats:team:{session_id}"
+
+
+def _slide_stats_key(session_id: int) -> str:
+    return f"buzz:stats:slide:{session_id}"
+
+
+def _best_reaction_key(session_id: int) -> str:
+    return f"buzz:stats:best:{session_id}"
+
+
+async def _get_redis():
+    return await redis.from_url(settings.redis_url, decode_responses=True)
+
+
+def _pairs(flat: List) -> List:
+    return list(zip(flat[0::2], flat[1::2]))
+
+
+def _placement_field(placement: int) -> str:
+    if placement > MAX_TRACKED_PLACEMENT:
+        return f"p{MAX_TRACKED_PLACEMENT + 1}+"
+    return f"p{placement}"
+
+
+def _reaction_reference(round_context: Dict, timer_data: Dict) -> Optional[float]:
+    """Latest of slide change and timer start (epoch seconds), if known"""
+    references = []
+    if round_context.get("slide_started_at"):
+        references.append(float(round_context["slide_started_at"]))
+    if timer_data.get("start_epoch"):
+        references.append(int(timer_data["start_epoch"]) / 1000)
+    return max(references) if references else None
+
+
+def summarize_round(members: List, reference: Optional[float]) -> Dict:
+    """Reduce raw sorted-set members to one ordered entry per team.
+
+    A team buzzing from several devices only counts its earliest buzz.
+    """
+    buzzes = []
+    seen_teams = set()
+    for member, timestamp in members:
+        team_id_raw, _, device_id = member.partition(":")
+        team_id = int(team_id_raw)
+        if team_id in seen_teams:
+            continue
+        seen_teams.add(team_id)
+
+        reaction_ms = None
+        if reference is not None and timestamp >= reference:
+            reaction_ms = int((timestamp - reference) * 1000)
+
+        buzzes.append({
+            "team_id": team_id,
+            "device_id": device_id or "default",
+            "timestamp": timestamp,
+            "placement": len(buzzes) + 1,
+            "reaction_ms": reaction_ms
+        })
+
+    contested = (
+        len(buzzes) > 1
+        and (buzzes[1]["timestamp"] - buzzes[0]["timestamp"]) * 1000 <= settings.buzz_tie_window_ms
+    )
+    return {"buzzes": buzzes, "contested": contested}
+
+
+async def mark_slide_started(session_id: int, slide_id: int):
+    """Remember when the current question went up (reaction-time reference)"""
+    r = await _get_redis()
+    try:
+        await r.hset(_round_context_key(session_id), mapping={
+            "slide_id": str(slide_id),
+            "slide_started_at": str(time.time())
+        })
+    finally:
+        await r.close()
+
+
+async def record_round(session_id: int) -> Optional[Dict]:
+    """Take the current buzz round off the queue (clearing it and the first
+    buzzer marker), append it to the stream and fold it into the aggregates.
+
+    Every path that clears the buzzer queue goes through here. Returns the
+    round summary, or None if nobody buzzed.
+    """
+    r = await _get_redis()
+    try:
+        take_round = r.register_script(TAKE_ROUND_SCRIPT)
+        taken = await take_round(keys=[
+            f"buzzer:{session_id}",
+            f"buzzer:first:{session_id}",
+            _round_context_key(session_id),
+            f"timer:{session_id}"
+        ])
+        if not taken:
+            return None
+
+        members = [(member, float(score)) for member, score in _pairs(taken[0])]
+        round_context = dict(_pairs(taken[1]))
+        timer_data = dict(_pairs(taken[2]))
+        reference = _reaction_reference(round_context, timer_data)
+        summary = summarize_round(members, reference)
+        buzzes = summary["buzzes"]
+        slide_id = round_context.get("slide_id", "none")
+
+        pipe = r.pipeline(transaction=True)
+
+        # Raw, append-only round log (trimmed to keep it compact)
+        pipe.xadd(
+            _rounds_stream_key(session_id),
+            {
+                "slide_id": slide_id,
+                "slide_started_at": round_context.get("slide_started_at", ""),
+                "timer_started_at": timer_data.get("start_epoch", ""),
+                "contested": "1" if summary["contested"] else "0",
+                "buzzes": json.dumps([
+                    [b["team_id"], b["device_id"], b["timestamp"]] for b in buzzes
+                ])
+            },
+            maxlen=settings.buzz_analytics_max_rounds,
+            approximate=True
+        )
+
+        # Running aggregates
+        session_key = _session_stats_key(session_id)
+        pipe.hincrby(session_key, "rounds", 1)
+        pipe.hincrby(session_key, "buzzes", len(buzzes))
+        if summary["contested"]:
+            pipe.hincrby(session_key, "contested", 1)
+
+        slide_key = _slide_stats_key(session_id)
+        pipe.hincrby(slide_key, f"{slide_id}:rounds", 1)
+        pipe.hincrby(slide_key, f"{slide_id}:buzzes", len(buzzes))
+        if summary["contested"]:
+            pipe.hincrby(slide_key, f"{slide_id}:contested", 1)
+        if buzzes[0]["reaction_ms"] is not None:
+            pipe.hincrby(slide_key, f"{slide_id}:first_reaction_ms_sum", buzzes[0]["reaction_ms"])
+            pipe.hincrby(slide_key, f"{slide_id}:first_reaction_count", 1)
+
+        team_key = _team_stats_key(session_id)
+        for buzz in buzzes:
+            team_id = buzz["team_id"]
+            pipe.hincrby(team_key, f"{team_id}:buzzes", 1)
+            pipe.hincrby(team_key, f"{team_id}:{_placement_field(buzz['placement'])}", 1)
+            if buzz["reaction_ms"] is not None:
+                pipe.hincrby(team_key, f"{team_id}:reaction_ms_sum", buzz["reaction_ms"])
+                pipe.hincrby(team_key, f"{team_id}:reaction_count", 1)
+                # LT keeps the lowest score and still adds unseen teams
+                pipe.zadd(_best_reaction_key(session_id), {str(team_id): buzz["reaction_ms"]}, lt=True)
+
+        await pipe.execute()
+        return summary
+    finally:
+        await r.close()
+
+
+def _group_fields(raw: Dict[str, str]) -> Dict[str, Dict[str, int]]:
+    """{"12:buzzes": "3"} -> {"12": {"buzzes": 3}}"""
+    grouped: Dict[str, Dict[str, int]] = {}
+    for field, value in raw.items():
+        entity, _, stat = field.partition(":")
+        grouped.setdefault(entity, {})[stat] = int(value)
+    return grouped
+
+
+def _average(total: int, count: int) -> Optional[int]:
+    return int(total / count) if count else None
+
+
+async def get_session_analytics(session_id: int) -> Dict:
+    """Read precomputed buzz statistics for a session (no raw event scan)"""
+    r = await _get_redis()
+    try:
+        pipe = r.pipeline(transaction=False)
+        pipe.hgetall(_session_stats_key(session_id))
+        pipe.hgetall(_team_stats_key(session_id))
+        pipe.hgetall(_slide_stats_key(session_id))
+        pipe.zrange(_best_reaction_key(session_id), 0, -1, withscores=True)
+        session_raw, team_raw, slide_raw, best_raw = await pipe.execute()
+    finally:
+        await r.close()
+
+    best = {int(team_id): int(score) for team_id, score in best_raw}
+
+    teams = []
+    for team_id, stats in _group_fields(team_raw).items():
+        placements = {
+            key: value for key, value in stats.items() if key.startswith("p")
+        }
+        teams.append({
+            "team_id": int(team_id),
+            "buzzes": stats.get("buzzes", 0),
+            "placements": placements,
+            "avg_reaction_ms": _average(stats.get("reaction_ms_sum", 0), stats.get("reaction_count", 0)),
+            "best_reaction_ms": best.get(int(team_id))
+        })
+    teams.sort(key=lambda t: (-t["placements"].get("p1", 0), t["team_id"]))
+
+    questions = []
+    for slide_id, stats in _group_fields(slide_raw).items():
+        questions.append({
+            "slide_id": int(slide_id) if slide_id.isdigit() else None,
+            "rounds": stats.get("rounds", 0),
+            "buzzes": stats.get("buzzes", 0),
+            "contested": stats.get("contested", 0),
+            "avg_first_reaction_ms": _average(
+                stats.get("first_reaction_ms_sum", 0), stats.get("first_reaction_count", 0)
+            )
+        })
+    questions.sort(key=lambda q: (q["slide_id"] is None, q["slide_id"] or 0))
+
+    return {
+        "session_id": session_id,
+        "rounds": int(session_raw.get("rounds", 0)),
+        "buzzes": int(session_raw.get("buzzes", 0)),
+        "contested": int(session_raw.get("contested", 0)),
+        "teams": teams,
+        "questions": questions
+    }
@@ -2,6 +2,7 @@ import time
 from typing import List, Dict, Optional
 import redis.asyncio as redis
 from config import settings
+from services.buzz_analytics import record_round
 
 
 class BuzzerService:
@@ -96,13 +97,8 @@ class BuzzerService:
         lock_key = f"buzzer:lock:{session_id}"
         await r.delete(lock_key)
 
-        # Clear queue
-        buzzer_key = f"buzzer:{session_id}"
-        await r.delete(buzzer_key)
-
-        # Clear first marker
-        first_key = f"buzzer:first:{session_id}"
-        await r.delete(first_key)
+        # Archive the round for analytics; this clears the queue and first marker
+        await record_round(session_id)
 
     async def is_locked(self, session_id: int) -> bool:
         """Check if buzzers are locked"""
@@ -112,12 +108,7 @@ class BuzzerService:
 
     async def clear_queue(self, session_id: int):
         """Clear buzz queue without unlocking"""
-        r = await self.get_redis()
-        buzzer_key = f"buzzer:{session_id}"
-        first_key = f"buzzer:first:{session_id}"
-
-        await r.delete(buzzer_key)
-        await r.delete(first_key)
+        await record_round(session_id)
 
 
 # Global instance
@@ -0,0 +1,109 @@
+import functools
+import hashlib
+import inspect
+import json
+from typing import Optional
+
+import redis.asyncio as redis
+from fastapi import Header, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+
+from config import settings
+
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+# How long the in-progress record of the first request with a key lives
+PENDING_TTL_SECONDS = 30
+
+
+def _key(user_id, method: str, path: str, idempotency_key: str) -> str:
+    return f"idem:{user_id}:{method}:{path}:{idempotency_key}"
+
+
+async def _get_redis():
+    return await redis.from_url(settings.redis_url, decode_responses=True)
+
+
+async def _fingerprint(request: Request) -> str:
+    """Hash of what the key stands for: query string and body"""
+    digest = hashlib.sha256(request.url.query.encode())
+    digest.update(b"\0")
+    digest.update(await request.body())
+    return digest.hexdigest()
+
+
+def idempotent(endpoint):
+    """Accept an Idempotency-Key header on a mutation endpoint.
+
+    The first request with a key runs normally and its response is stored
+    for settings.idempotency_ttl_seconds; repeats (retries, double taps)
+    get the stored response back without touching the DB or broadcasting.
+    A repeat that arrives while the first is still running gets 409; reusing
+    a key with a different query or body gets 422 instead of the stored
+    response. Requests without the header are not affected.
+    """
+    signature = inspect.signature(endpoint)
+    parameters = list(signature.parameters.values()) + [
+        inspect.Parameter(
+            "idempotency_key",
+            inspect.Parameter.KEYWORD_ONLY,
+            default=Header(None, alias=IDEMPOTENCY_HEADER),
+            annotation=Optional[str]
+        ),
+        inspect.Parameter(
+            "idempotency_request",
+            inspect.Parameter.KEYWORD_ONLY,
+            annotation=Request
+        )
+    ]
+
+    @functools.wraps(endpoint)
+    async def wrapper(*args, idempotency_key: Optional[str] = None, idempotency_request: Request = None, **kwargs):
+        if not idempotency_key:
+            return await endpoint(*args, **kwargs)
+
+        user = kwargs.get("current_user")
+        key = _key(
+            getattr(user, "id", None),
+            idempotency_request.method,
+            idempotency_request.url.path,
+            idempotency_key
+        )
+
+        fingerprint = await _fingerprint(idempotency_request)
+        pending = json.dumps({"fingerprint": fingerprint, "pending": True})
+
+        r = await _get_redis()
+        if not await r.set(key, pending, nx=True, ex=PENDING_TTL_SECONDS):
+            stored = await r.get(key)
+            if stored is not None:
+                record = json.loads(stored)
+                if record.get("fingerprint") != fingerprint:
+                    raise HTTPException(
+                        status_code=422,
+                        detail="Idempotency-Key was already used with a different request body"
+                    )
+                if record.get("pending"):
+                    raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is in progress")
+                return JSONResponse(record["response"], headers={"Idempotent-Replayed": "true"})
+            # Expired between SET and GET: treat as a fresh request
+            await r.set(key, pending, ex=PENDING_TTL_SECONDS)
+
+        try:
+            result = await endpoint(*args, **kwargs)
+        except Exception:
+            # Failed requests may be retried with the same key
+            await r.delete(key)
+            raise
+
+        if isinstance(result, Response):
+            await r.delete(key)
+        else:
+            record = {"fingerprint": fingerprint, "response": jsonable_encoder(result)}
+            await r.set(key, json.dumps(record), ex=settings.idempotency_ttl_seconds)
+        return result
+
+    wrapper.__signature__ = signature.replace(parameters=parameters)
+    return wrapper
@@ -0,0 +1,84 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional
+
+
+class JobRegistry:
+    """In-memory registry of admin background jobs.
+
+    Jobs run as asyncio tasks in this process; their status and result stay
+    queryable by id until the registry trims the oldest finished jobs.
+    """
+
+    MAX_JOBS = 200
+
+    def __init__(self):
+        self._jobs: "OrderedDict[str, Dict]" = OrderedDict()
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def create(self, kind: str, params: Optional[Dict] = None) -> Dict:
+        job = {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "params": params or {},
+            "status": "pending",
+            "progress": 0,
+            "result": None,
+            "error": None,
+            "created_at": time.time(),
+            "finished_at": None
+        }
+        self._jobs[job["id"]] = job
+        self._trim()
+        return job
+
+    def start(self, job: Dict, run: Callable[[Dict], Awaitable[Optional[Dict]]]) -> Dict:
+        """Run `run(job)` in the background; its return value becomes job["result"]"""
+        self._tasks[job["id"]] = asyncio.create_task(self._run(job, run))
+        return job
+
+    async def _run(self, job: Dict, run: Callable[[Dict], Awaitable[Optional[Dict]]]):
+        job["status"] = "running"
+        try:
+            job["result"] = await run(job)
+            job["status"] = "completed"
+            job["progress"] = 100
+        except asyncio.CancelledError:
+            job["status"] = "cancelled"
+            raise
+        except Exception as e:
+            print(f"Job {job['kind']} {job['id']} failed: {e}")
+            job["status"] = "failed"
+            job["error"] = str(e)
+        finally:
+            job["finished_at"] = time.time()
+            self._tasks.pop(job["id"], None)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        return self._jobs.get(job_id)
+
+    def list(self, kind: Optional[str] = None) -> list:
+        return [job for job in reversed(self._jobs.values()) if kind is None or job["kind"] == kind]
+
+    def _trim(self):
+        """Drop the oldest finished jobs once over MAX_JOBS"""
+        for job_id in list(self._jobs):
+            if len(self._jobs) <= self.MAX_JOBS:
+                break
+            if self._jobs[job_id]["status"] not in ("pending", "running"):
+                del self._jobs[job_id]
+
+    async def shutdown(self):
+        for task in list(self._tasks.values()):
+            task.cancel()
+        for task in list(self._tasks.values()):
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+
+# Global instance
+job_registry = JobRegistry()
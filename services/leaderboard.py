@@ -0,0 +1,39 @@
+from typing import Dict, List, Optional
+
+
+# Sorted-set score = total * TIEBREAK_SCALE + (TIEBREAK_SCALE - 1 - seat_position).
+# Higher totals rank first; equal totals fall back to seat order, so ZREVRANGE
+# and ZREVRANK are deterministic without a secondary sort.
+TIEBREAK_SCALE = 1 << 16
+
+
+def leaderboard_key(session_id: int) -> str:
+    return f"score:board:{session_id}"
+
+
+def encode(total: int, seat_position: int) -> int:
+    return total * TIEBREAK_SCALE + (TIEBREAK_SCALE - 1 - seat_position)
+
+
+def decode_total(score: float) -> int:
+    return int(score) // TIEBREAK_SCALE
+
+
+async def get_top(r, session_id: int, limit: Optional[int] = None) -> List[Dict]:
+    """Ranked entries (highest first); limit=None returns the whole board"""
+    stop = -1 if limit is None else limit - 1
+    members = await r.zrevrange(leaderboard_key(session_id), 0, stop, withscores=True)
+    return [
+        {"team_id": int(team_id), "total": decode_total(score), "rank": index + 1}
+        for index, (team_id, score) in enumerate(members)
+    ]
+
+
+async def get_rank(r, session_id: int, team_id: int) -> Optional[int]:
+    rank = await r.zrevrank(leaderboard_key(session_id), str(team_id))
+    return rank + 1 if rank is not None else None
+
+
+async def get_ranks(r, session_id: int) -> Dict[int, int]:
+    """team_id -> 1-based rank for the whole session"""
+    return {entry["team_id"]: entry["rank"] for entry in await get_top(r, session_id)}
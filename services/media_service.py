@@ -1,12 +1,31 @@
+import asyncio
+import hashlib
+import io
+import math
+import multiprocessing
 import os
+import shutil
 import subprocess
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Optional
-from fastapi import UploadFile
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from fastapi import HTTPException, UploadFile
 from PIL import Image
 from pptx import Presentation
 import uuid
 from config import settings
+from services.office_pool import office_pool
+
+
+# Upload copy size: large enough for throughput, small enough to keep memory flat
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Rendition target when a display hasn't reported its size
+DEFAULT_DISPLAY_HEIGHT = 1080
+
+# Thumbnail bounding box; also the cell size in sprite sheets
+THUMB_SIZE = (200, 150)
+SPRITE_COLUMNS = 10
 
 
 class MediaService:
@@ -20,46 +39,336 @@ class MediaService:
         self.slides_dir.mkdir(parents=True, exist_ok=True)
         self.thumbs_dir.mkdir(parents=True, exist_ok=True)
 
-    async def save_ppt(self, file: UploadFile) -> str:
-        """Save uploaded PPT file"""
+        # Conversion worker processes, started on first use
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    async def save_ppt(self, file: UploadFile) -> Tuple[str, str]:
+        """Stream an uploaded PPT file to disk; returns (path, sha256 hex).
+
+        The upload is copied in fixed-size chunks with the blocking reads and
+        writes off the event loop, hashed as it streams, and rejected with 413
+        once it exceeds MAX_UPLOAD_MB.
+        """
         # Generate unique filename
         file_ext = Path(file.filename).suffix
         unique_filename = f"{uuid.uuid4()}{file_ext}"
         file_path = self.upload_dir / unique_filename
 
-        # Save file
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
+        max_bytes = settings.max_upload_mb * 1024 * 1024
+        digest = hashlib.sha256()
+        size = 0
 
-        return str(file_path)
+        f = await asyncio.to_thread(open, file_path, "wb")
+        try:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"Deck exceeds the {settings.max_upload_mb} MB upload limit"
+                    )
+                digest.update(chunk)
+                await asyncio.to_thread(f.write, chunk)
+        except BaseException:
+            await asyncio.to_thread(f.close)
+            file_path.unlink(missing_ok=True)
+            raise
+        await asyncio.to_thread(f.close)
+
+        return str(file_path), digest.hexdigest()
+
+    async def store_upload(self, upload_path: str, sha256: str) -> str:
+        """Move a saved upload to its content-addressed name (<sha256><ext>)"""
+        stored_path = self.upload_dir / f"{sha256}{Path(upload_path).suffix}"
+        await asyncio.to_thread(os.replace, upload_path, stored_path)
+        return str(stored_path)
+
+    async def discard_upload(self, upload_path: str):
+        await asyncio.to_thread(Path(upload_path).unlink, True)
+
+    async def remove_deck_files(self, deck_key: str, ppt_path: Optional[str] = None):
+        """Delete a deck's slide images, thumbnails, sprite sheets and (optionally) its source file"""
+        def remove():
+            shutil.rmtree(self.slides_dir / f"deck_{deck_key}", ignore_errors=True)
+            for thumb_path in self.thumbs_dir.glob(f"deck_{deck_key}_*"):
+                thumb_path.unlink(missing_ok=True)
+            if ppt_path:
+                Path(ppt_path).unlink(missing_ok=True)
+
+        await asyncio.to_thread(remove)
+
+    @property
+    def worker_count(self) -> int:
+        return settings.conversion_workers or os.cpu_count() or 1
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: forking a process that runs an event loop and DB/Redis clients is unsafe
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.worker_count,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    async def convert_in_worker(
+        self,
+        ppt_path: str,
+        deck_key: str,
+        on_progress: Optional[Callable[[int, int], Awaitable[None]]] = None,
+        reuse: Optional[Dict[str, dict]] = None
+    ) -> List[dict]:
+        """Convert a deck in worker processes without blocking the event loop.
+
+        LibreOffice exports the PDF (on a warm instance when the office pool
+        is running, otherwise in one worker), then page ranges are
+        rasterized in parallel across the pool. on_progress(done, total) is
+        awaited as each range finishes.
+
+        Every slide gets a fingerprint. reuse maps fingerprints to slides of
+        an earlier version of the deck: those pages are not rasterized, their
+        files are linked into this deck's directory instead.
+        """
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        fingerprinting = loop.run_in_executor(pool, _slide_fingerprints, ppt_path)
+
+        if not self._has_libreoffice():
+            slides = await loop.run_in_executor(pool, _convert_with_pptx, ppt_path, deck_key)
+            return self._attach_fingerprints(slides, await fingerprinting)
 
-    def convert_ppt_to_images(self, ppt_path: str, deck_id: int) -> List[dict]:
+        try:
+            pdf_path, page_count = await self._export_pdf(ppt_path, deck_key)
+            try:
+                fingerprints = await fingerprinting
+                slides = await self._rasterize_changed(
+                    pdf_path, deck_key, page_count, fingerprints, reuse, on_progress
+                )
+            finally:
+                Path(pdf_path).unlink(missing_ok=True)
+        except Exception as e:
+            print(f"LibreOffice conversion failed: {e}")
+            slides = await loop.run_in_executor(pool, _convert_with_pptx, ppt_path, deck_key)
+            fingerprints = await fingerprinting
+        return self._attach_fingerprints(slides, fingerprints)
+
+    async def _rasterize_changed(
+        self,
+        pdf_path: str,
+        deck_key: str,
+        page_count: int,
+        fingerprints: List[str],
+        reuse: Optional[Dict[str, dict]],
+        on_progress: Optional[Callable[[int, int], Awaitable[None]]]
+    ) -> List[dict]:
+        """Rasterize the pages whose fingerprint isn't in reuse and link the rest"""
+        keep = {}
+        # Hidden slides are left out of the PDF; pages only line up with slides when counts match
+        if reuse and len(fingerprints) == page_count:
+            keep = {
+                index: reuse[fingerprint]
+                for index, fingerprint in enumerate(fingerprints)
+                if fingerprint in reuse and os.path.exists(reuse[fingerprint]["png_path"])
+            }
+        pages = [page for page in range(1, page_count + 1) if page - 1 not in keep]
+
+        slides = await self.rasterize_parallel(pdf_path, deck_key, page_count, on_progress, pages)
+        slides.extend(await asyncio.to_thread(
+            lambda: [self.reuse_slide(previous, deck_key, index) for index, previous in keep.items()]
+        ))
+        return sorted(slides, key=lambda slide: slide["slide_index"])
+
+    @staticmethod
+    def _attach_fingerprints(slides: List[dict], fingerprints: List[str]) -> List[dict]:
+        aligned = len(fingerprints) == len(slides)
+        for slide in slides:
+            slide["fingerprint"] = fingerprints[slide["slide_index"]] if aligned else None
+        return slides
+
+    async def _export_pdf(self, ppt_path: str, deck_key: str) -> Tuple[str, int]:
+        """PDF export on a warm LibreOffice worker, or a cold soffice in the pool"""
+        if office_pool.enabled:
+            try:
+                pdf_path = await office_pool.export_pdf(ppt_path, self._deck_dir(deck_key))
+                return pdf_path, await asyncio.to_thread(pdf_page_count, pdf_path)
+            except Exception as e:
+                print(f"Warm LibreOffice export failed, starting soffice: {e}")
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_pool(), _export_pdf, ppt_path, deck_key)
+
+    async def rasterize_parallel(
+        self,
+        pdf_path: str,
+        deck_key: str,
+        page_count: int,
+        on_progress: Optional[Callable[[int, int], Awaitable[None]]] = None,
+        pages: Optional[List[int]] = None
+    ) -> List[dict]:
+        """Rasterize every page of a PDF (or just `pages`), one page range per pool task"""
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        if pages is None:
+            ranges = self.page_ranges(page_count, self.worker_count)
+            total = page_count
+        else:
+            ranges = self.page_runs(pages, self.worker_count)
+            total = len(pages)
+        pending = [
+            loop.run_in_executor(pool, _rasterize_pages, pdf_path, deck_key, first_page, last_page)
+            for first_page, last_page in ranges
+        ]
+
+        slides = []
+        try:
+            for chunk in asyncio.as_completed(pending):
+                slides.extend(await chunk)
+                if on_progress:
+                    await on_progress(len(slides), total)
+        finally:
+            for future in pending:
+                future.cancel()
+
+        # Ranges finish in any order; file names are already fixed by slide index
+        return sorted(slides, key=lambda slide: slide["slide_index"])
+
+    @staticmethod
+    def page_runs(pages: List[int], workers: int) -> List[Tuple[int, int]]:
+        """Like page_ranges, for an arbitrary set of pages: runs of consecutive
+        pages, split so there are about two per worker"""
+        size = max(1, math.ceil(len(pages) / (workers * 2)))
+        runs = []
+        for page in sorted(pages):
+            if runs and page == runs[-1][1] + 1 and runs[-1][1] - runs[-1][0] + 1 < size:
+                runs[-1] = (runs[-1][0], page)
+            else:
+                runs.append((page, page))
+        return runs
+
+    def reuse_slide(self, previous: dict, deck_key: str, index: int) -> dict:
+        """Link an unchanged slide's image, renditions and thumbnail into a
+        deck's directory at its (possibly new) index"""
+        slide_path = self._deck_dir(deck_key) / f"slide_{index:03d}.png"
+        thumb_path = self.thumbs_dir / f"deck_{deck_key}_thumb_{index:03d}.png"
+        _link_file(previous["png_path"], slide_path)
+        _link_file(previous["thumb_path"], thumb_path)
+
+        renditions = {}
+        for height, rendition_path in (previous.get("renditions") or {}).items():
+            target = slide_path.with_name(f"{slide_path.stem}_{height}p.webp")
+            _link_file(rendition_path, target)
+            renditions[height] = str(target)
+
+        return {
+            "slide_index": index,
+            "png_path": str(slide_path),
+            "thumb_path": str(thumb_path),
+            "renditions": renditions or None,
+            "image_hash": previous.get("image_hash"),
+            "reused": True
+        }
+
+    async def build_sprites(self, deck_key: str, slides: List[dict]) -> Optional[dict]:
+        """Pack a converted deck's thumbnails into sprite sheets in a worker process"""
+        if not slides:
+            return None
+        thumbs = [(slide["slide_index"], slide["thumb_path"]) for slide in slides]
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_pool(), _build_sprite_sheets, deck_key, thumbs)
+
+    def build_sprite_sheets(self, deck_key: str, thumbs: List[Tuple[int, str]]) -> dict:
+        """Paste (slide_index, thumb_path) thumbnails into WebP sheets of
+        SPRITE_SLIDES_PER_SHEET cells; returns the sheets and each slide's
+        position, so a deck browser needs one image request per sheet"""
+        per_sheet = max(1, settings.sprite_slides_per_sheet)
+        columns = min(SPRITE_COLUMNS, per_sheet)
+        cell_width, cell_height = THUMB_SIZE
+        sheets = []
+        positions = []
+
+        for first in range(0, len(thumbs), per_sheet):
+            page = thumbs[first:first + per_sheet]
+            rows = math.ceil(len(page) / columns)
+            sheet = Image.new("RGB", (cell_width * min(columns, len(page)), cell_height * rows), "white")
+            for cell, (slide_index, thumb_path) in enumerate(page):
+                x = (cell % columns) * cell_width
+                y = (cell // columns) * cell_height
+                with Image.open(thumb_path) as thumb:
+                    sheet.paste(thumb, (x, y))
+                    width, height = thumb.size
+                positions.append({
+                    "slide_index": slide_index,
+                    "sheet": len(sheets),
+                    "x": x,
+                    "y": y,
+                    "width": width,
+                    "height": height
+                })
+
+            sheet_path = self.thumbs_dir / f"deck_{deck_key}_sprite_{len(sheets):02d}.webp"
+            sheet.save(sheet_path, "WEBP", quality=settings.slide_webp_quality, method=4)
+            sheets.append({"path": str(sheet_path), "width": sheet.width, "height": sheet.height})
+            sheet.close()
+
+        return {
+            "cell_width": cell_width,
+            "cell_height": cell_height,
+            "sheets": sheets,
+            "slides": positions
+        }
+
+    @staticmethod
+    def page_ranges(page_count: int, workers: int) -> List[Tuple[int, int]]:
+        """1-based inclusive page ranges, about two per worker so one slow
+        range doesn't leave the other cores idle at the end"""
+        if page_count <= 0:
+            return []
+        size = max(1, math.ceil(page_count / (workers * 2)))
+        return [
+            (first_page, min(first_page + size - 1, page_count))
+            for first_page in range(1, page_count + 1, size)
+        ]
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def convert_ppt_to_images(self, ppt_path: str, deck_key: str) -> List[dict]:
         """Convert PPT to PNG images"""
         slides = []
 
         try:
             # Try LibreOffice conversion first (if available)
-            if settings.libreoffice_path and os.path.exists(settings.libreoffice_path):
-                slides = self._convert_with_libreoffice(ppt_path, deck_id)
+            if self._has_libreoffice():
+                slides = self._convert_with_libreoffice(ppt_path, deck_key)
             else:
                 # Fallback to python-pptx (limited rendering)
-                slides = self._convert_with_pptx(ppt_path, deck_id)
+                slides = self._convert_with_pptx(ppt_path, deck_key)
 
         except Exception as e:
             print(f"Error converting PPT: {e}")
             # Fallback method
-            slides = self._convert_with_pptx(ppt_path, deck_id)
+            slides = self._convert_with_pptx(ppt_path, deck_key)
 
         return slides
 
-    def _convert_with_libreoffice(self, ppt_path: str, deck_id: int) -> List[dict]:
+    def _has_libreoffice(self) -> bool:
+        return bool(settings.libreoffice_path and os.path.exists(settings.libreoffice_path))
+
+    def _convert_with_libreoffice(self, ppt_path: str, deck_key: str) -> List[dict]:
         """Convert using LibreOffice (better quality)"""
-        output_dir = self.slides_dir / f"deck_{deck_id}"
-        output_dir.mkdir(parents=True, exist_ok=True)
+        pdf_path, page_count = self.export_pdf(ppt_path, deck_key)
+        try:
+            return self.rasterize_pages(pdf_path, deck_key, 1, page_count) if page_count else []
+        finally:
+            Path(pdf_path).unlink(missing_ok=True)
 
-        # Convert PPT to PDF first
-        pdf_output = output_dir / "temp.pdf"
+    def export_pdf(self, ppt_path: str, deck_key: str) -> Tuple[str, int]:
+        """Export the deck to PDF with LibreOffice; returns (pdf_path, page_count)"""
+        output_dir = self._deck_dir(deck_key)
 
         # Run LibreOffice conversion
         cmd = [
@@ -69,83 +378,129 @@ class MediaService:
             '--outdir', str(output_dir),
             ppt_path
         ]
+        subprocess.run(cmd, check=True, timeout=60)
 
-        try:
-            subprocess.run(cmd, check=True, timeout=60)
-
-            # Convert PDF to images using PIL (requires pdf2image)
-            from pdf2image import convert_from_path
+        # LibreOffice names the PDF after the input file
+        pdf_output = output_dir / f"{Path(ppt_path).stem}.pdf"
+        return str(pdf_output), pdf_page_count(str(pdf_output))
 
-            images = convert_from_path(str(pdf_output))
-            slides = []
+    def rasterize_pages(self, pdf_path: str, deck_key: str, first_page: int, last_page: int) -> List[dict]:
+        """Render pages first_page..last_page (1-based, inclusive) and save slide + thumbnail.
 
-            for i, image in enumerate(images):
-                slide_filename = f"slide_{i:03d}.png"
-                thumb_filename = f"thumb_{i:03d}.png"
+        Pages are rendered a small window at a time and each image is released
+        once written, so peak memory depends on the window, not the deck length.
+        """
+        # Convert PDF to images using PIL (requires pdf2image)
+        from pdf2image import convert_from_path
 
-                slide_path = output_dir / slide_filename
-                thumb_path = self.thumbs_dir / f"deck_{deck_id}_{thumb_filename}"
-
-                # Save full size
-                image.save(slide_path, "PNG")
-
-                # Create thumbnail
-                image.thumbnail((200, 150))
-                image.save(thumb_path, "PNG")
-
-                slides.append({
-                    "slide_index": i,
-                    "png_path": str(slide_path),
-                    "thumb_path": str(thumb_path)
-                })
-
-            # Clean up PDF
-            pdf_output.unlink(missing_ok=True)
+        self._deck_dir(deck_key)
+        window = max(1, settings.conversion_window_pages)
+        slides = []
 
-            return slides
+        for window_first in range(first_page, last_page + 1, window):
+            window_last = min(window_first + window - 1, last_page)
+            images = convert_from_path(pdf_path, first_page=window_first, last_page=window_last)
+            for offset, image in enumerate(images):
+                slides.append(self._save_slide(image, deck_key, window_first - 1 + offset))
+                image.close()
+            del images
 
-        except Exception as e:
-            print(f"LibreOffice conversion failed: {e}")
-            raise
+        return slides
 
-    def _convert_with_pptx(self, ppt_path: str, deck_id: int) -> List[dict]:
-        """Convert using python-pptx (basic rendering)"""
-        output_dir = self.slides_dir / f"deck_{deck_id}"
+    def _deck_dir(self, deck_key: str) -> Path:
+        # deck_key is the content hash for uploads (the deck id for older decks)
+        output_dir = self.slides_dir / f"deck_{deck_key}"
         output_dir.mkdir(parents=True, exist_ok=True)
+        return output_dir
+
+    def _save_slide(self, image: Image.Image, deck_key: str, index: int) -> dict:
+        slide_path = self.slides_dir / f"deck_{deck_key}" / f"slide_{index:03d}.png"
+        thumb_path = self.thumbs_dir / f"deck_{deck_key}_thumb_{index:03d}.png"
+
+        # Save full size (hashed on the way out; the hash versions the slide's URL)
+        buffer = io.BytesIO()
+        image.save(buffer, "PNG")
+        png_bytes = buffer.getvalue()
+        slide_path.write_bytes(png_bytes)
+        image_hash = hashlib.sha256(png_bytes).hexdigest()[:16]
+        del buffer, png_bytes
+
+        renditions = self._save_renditions(image, slide_path)
+
+        # Create thumbnail
+        image.thumbnail(THUMB_SIZE)
+        image.save(thumb_path, "PNG")
+
+        return {
+            "slide_index": index,
+            "png_path": str(slide_path),
+            "thumb_path": str(thumb_path),
+            "renditions": renditions,
+            "image_hash": image_hash
+        }
+
+    def _save_renditions(self, image: Image.Image, slide_path: Path) -> Dict[str, str]:
+        """Write WebP copies at each configured height below the source, plus
+        one at full size; returns {height: path}"""
+        renditions = {}
+        heights = sorted({h for h in rendition_heights() if h < image.height} | {image.height})
+        for height in heights:
+            if height == image.height:
+                rendition = image
+            else:
+                width = round(image.width * height / image.height)
+                rendition = image.resize((width, height), Image.LANCZOS)
+            rendition_path = slide_path.with_name(f"{slide_path.stem}_{height}p.webp")
+            rendition.save(rendition_path, "WEBP", quality=settings.slide_webp_quality, method=4)
+            if rendition is not image:
+                rendition.close()
+            renditions[str(height)] = str(rendition_path)
+        return renditions
+
+    def _convert_with_pptx(self, ppt_path: str, deck_key: str) -> List[dict]:
+        """Convert using python-pptx (basic rendering)"""
+        self._deck_dir(deck_key)
 
         # Load presentation
         prs = Presentation(ppt_path)
         slides = []
 
         for i, slide in enumerate(prs.slides):
-            slide_filename = f"slide_{i:03d}.png"
-            thumb_filename = f"thumb_{i:03d}.png"
-
-            slide_path = output_dir / slide_filename
-            thumb_path = self.thumbs_dir / f"deck_{deck_id}_{thumb_filename}"
-
             # Create blank image (since python-pptx doesn't render)
             # In production, you'd need proper rendering
             width = int(prs.slide_width.inches * 96)
             height = int(prs.slide_height.inches * 96)
 
             image = Image.new('RGB', (width, height), color='white')
-
-            # Save full size
-            image.save(slide_path, "PNG")
-
-            # Create thumbnail
-            image.thumbnail((200, 150))
-            image.save(thumb_path, "PNG")
-
-            slides.append({
-                "slide_index": i,
-                "png_path": str(slide_path),
-                "thumb_path": str(thumb_path)
-            })
+            slides.append(self._save_slide(image, deck_key, i))
 
         return slides
 
+    def slide_fingerprints(self, ppt_path: str) -> List[str]:
+        """One hash per slide over what it renders from: the slide XML, its
+        images and media, and its layout, master and theme. Speaker notes are
+        left out. Empty if the file can't be read (e.g. legacy .ppt)."""
+        try:
+            prs = Presentation(ppt_path)
+        except Exception as e:
+            print(f"Error fingerprinting PPT: {e}")
+            return []
+
+        slide_size = f"{prs.slide_width}x{prs.slide_height}".encode()
+        part_hashes: Dict[str, str] = {}
+        fingerprints = []
+        for index, slide in enumerate(prs.slides):
+            digest = hashlib.sha256(slide_size)
+            slide_blob = slide.part.blob
+            digest.update(slide_blob)
+            # A slide-number field renders differently once the slide moves
+            if b'type="slidenum"' in slide_blob:
+                digest.update(f"#{index}".encode())
+            for part_hash in sorted(_related_part_hashes(slide.part, part_hashes)):
+                digest.update(part_hash.encode())
+            fingerprints.append(digest.hexdigest()[:32])
+        return fingerprints
+
     def get_slide_count(self, ppt_path: str) -> int:
         """Get number of slides in presentation"""
         try:
@@ -156,5 +511,94 @@ class MediaService:
             return 0
 
 
+def _related_part_hashes(slide_part, part_hashes: Dict[str, str]) -> List[str]:
+    """Content hashes of every package part a slide depends on (transitively,
+    excluding notes and other slides it links to); part_hashes caches them by
+    part name across slides"""
+    hashes = []
+    seen = {slide_part.partname}
+    stack = [slide_part]
+    while stack:
+        part = stack.pop()
+        for rel in part.rels.values():
+            if rel.is_external:
+                hashes.append(rel.target_ref)
+                continue
+            if rel.reltype.endswith(("/notesSlide", "/slide")):
+                continue
+            target = rel.target_part
+            if target.partname in seen:
+                continue
+            seen.add(target.partname)
+            if target.partname not in part_hashes:
+                part_hashes[target.partname] = hashlib.sha256(target.blob).hexdigest()
+            hashes.append(part_hashes[target.partname])
+            stack.append(target)
+    return hashes
+
+
+def _link_file(source: str, target: Path):
+    """Hard-link source to target (copy across file systems), replacing target"""
+    target.unlink(missing_ok=True)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+def pdf_page_count(pdf_path: str) -> int:
+    from pdf2image import pdfinfo_from_path
+    return int(pdfinfo_from_path(pdf_path)["Pages"])
+
+
+def rendition_heights() -> List[int]:
+    return [int(h) for h in settings.slide_rendition_heights.split(",") if h.strip()]
+
+
+def slide_image_url(session_id: int, slide_id: int, image_hash: Optional[str]) -> str:
+    """Display URL for a slide; the image hash makes it safe to cache forever"""
+    return f"/api/display/sessions/{session_id}/slides/{slide_id}/image?v={image_hash or ''}"
+
+
+def pick_rendition(
+    png_path: str,
+    renditions: Optional[Dict[str, str]],
+    target_height: Optional[int],
+    accepts_webp: bool
+) -> Tuple[str, str]:
+    """Choose (path, media_type) for a display: the smallest WebP rendition
+    at least as tall as the display (the largest if none is), or the
+    original PNG for browsers without WebP or slides without renditions"""
+    if not renditions or not accepts_webp:
+        return png_path, "image/png"
+
+    heights = sorted(int(h) for h in renditions)
+    target = target_height or DEFAULT_DISPLAY_HEIGHT
+    chosen = next((h for h in heights if h >= target), heights[-1])
+    return renditions[str(chosen)], "image/webp"
+
+
+# Worker process entry points (module-level so they pickle)
+
+def _export_pdf(ppt_path: str, deck_key: str) -> Tuple[str, int]:
+    return media_service.export_pdf(ppt_path, deck_key)
+
+
+def _rasterize_pages(pdf_path: str, deck_key: str, first_page: int, last_page: int) -> List[dict]:
+    return media_service.rasterize_pages(pdf_path, deck_key, first_page, last_page)
+
+
+def _convert_with_pptx(ppt_path: str, deck_key: str) -> List[dict]:
+    return media_service._convert_with_pptx(ppt_path, deck_key)
+
+
+def _slide_fingerprints(ppt_path: str) -> List[str]:
+    return media_service.slide_fingerprints(ppt_path)
+
+
+def _build_sprite_sheets(deck_key: str, thumbs: List[Tuple[int, str]]) -> dict:
+    return media_service.build_sprite_sheets(deck_key, thumbs)
+
+
 # Global instance
 media_service = MediaService()
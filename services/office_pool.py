@@ -0,0 +1,200 @@
+import asyncio
+import os
+import shutil
+import signal
+import subprocess
+import tempfile
+import xmlrpc.client
+from pathlib import Path
+from typing import List, Optional
+
+from config import settings
+
+
+class _OfficeWorker:
+    __slots__ = ("index", "port", "uno_port", "process", "restarts")
+
+    def __init__(self, index: int, port: int, uno_port: int):
+        self.index = index
+        self.port = port
+        self.uno_port = uno_port
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.restarts = 0
+
+    @property
+    def running(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+
+class OfficePool:
+    """Warm LibreOffice instances for PPT -> PDF export.
+
+    Each worker is an unoserver process that keeps one soffice loaded and
+    accepts conversions over XML-RPC on a local port, so an export costs
+    rendering time only instead of a cold soffice start. Requests wait for
+    an idle worker (at most `size` exports run at once); a worker that has
+    exited, hung or failed a conversion is restarted before its next use.
+    """
+
+    def __init__(self, size: int, base_port: int, convert_timeout: float, startup_timeout: float):
+        self.size = size
+        self.base_port = base_port
+        self.convert_timeout = convert_timeout
+        self.startup_timeout = startup_timeout
+        self._workers: List[_OfficeWorker] = []
+        self._idle: Optional[asyncio.Queue] = None
+        self._warm_up_task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return (
+            self.size > 0
+            and bool(settings.libreoffice_path and os.path.exists(settings.libreoffice_path))
+            and shutil.which(settings.unoserver_path) is not None
+        )
+
+    def start(self):
+        """Create the workers and start them in the background (no-op when disabled)"""
+        if self._idle is not None or not self.enabled:
+            return
+        self._idle = asyncio.Queue()
+        for index in range(self.size):
+            # XML-RPC on base + 2i, the soffice UNO socket on base + 2i + 1
+            worker = _OfficeWorker(index, self.base_port + 2 * index, self.base_port + 2 * index + 1)
+            self._workers.append(worker)
+            self._idle.put_nowait(worker)
+        self._warm_up_task = asyncio.create_task(self._warm_up())
+        print(f"Starting {self.size} warm LibreOffice worker(s)")
+
+    async def _warm_up(self):
+        async def warm_one():
+            worker = await self._idle.get()
+            try:
+                await self._ensure_running(worker)
+            except Exception as e:
+                print(f"LibreOffice worker {worker.index} failed to start: {e}")
+            finally:
+                self._idle.put_nowait(worker)
+
+        await asyncio.gather(*(warm_one() for _ in range(self.size)))
+
+    async def export_pdf(self, ppt_path: str, output_dir: Path) -> str:
+        """Export a deck to <output_dir>/<stem>.pdf on an idle warm worker"""
+        self.start()
+        if self._idle is None:
+            raise RuntimeError("Warm LibreOffice workers are not available")
+
+        pdf_path = output_dir / f"{Path(ppt_path).stem}.pdf"
+        worker = await self._idle.get()
+        try:
+            await self._ensure_running(worker)
+            try:
+                await asyncio.wait_for(
+                    asyncio.to_thread(self._convert, worker, ppt_path, str(pdf_path)),
+                    timeout=self.convert_timeout
+                )
+            except BaseException:
+                # Hung or broken instance: don't hand it to the next request as is
+                await self._stop(worker)
+                raise
+            if not pdf_path.exists():
+                raise RuntimeError(f"LibreOffice worker {worker.index} produced no PDF")
+            return str(pdf_path)
+        finally:
+            self._idle.put_nowait(worker)
+
+    @staticmethod
+    def _convert(worker: _OfficeWorker, ppt_path: str, pdf_path: str):
+        proxy = xmlrpc.client.ServerProxy(f"http://127.0.0.1:{worker.port}", allow_none=True)
+        # unoserver convert(inpath, indata, outpath, convert_to); paths are on this host
+        proxy.convert(os.path.abspath(ppt_path), None, os.path.abspath(pdf_path), "pdf")
+
+    async def _ensure_running(self, worker: _OfficeWorker):
+        if worker.running:
+            return
+        if worker.process is not None:
+            worker.restarts += 1
+            print(f"LibreOffice worker {worker.index} exited ({worker.process.returncode}); restarting")
+
+        # Each soffice needs its own profile; a shared one makes instances hand off to each other
+        profile = Path(tempfile.gettempdir()) / f"quiz-office-{worker.index}"
+        worker.process = await asyncio.create_subprocess_exec(
+            settings.unoserver_path,
+            "--interface", "127.0.0.1",
+            "--port", str(worker.port),
+            "--uno-port", str(worker.uno_port),
+            "--executable", settings.libreoffice_path,
+            "--user-installation", profile.as_uri(),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            # Own process group so soffice is stopped along with unoserver
+            start_new_session=os.name != "nt"
+        )
+        try:
+            await self._wait_ready(worker)
+        except BaseException:
+            await self._stop(worker)
+            raise
+
+    async def _wait_ready(self, worker: _OfficeWorker):
+        """Wait until the worker accepts connections on its XML-RPC port"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.startup_timeout
+        while True:
+            if not worker.running:
+                raise RuntimeError(f"LibreOffice worker {worker.index} exited during startup")
+            try:
+                _, writer = await asyncio.open_connection("127.0.0.1", worker.port)
+                writer.close()
+                await writer.wait_closed()
+                return
+            except OSError:
+                if loop.time() > deadline:
+                    raise TimeoutError(f"LibreOffice worker {worker.index} did not start")
+                await asyncio.sleep(0.25)
+
+    async def _stop(self, worker: _OfficeWorker):
+        process = worker.process
+        if process is None or process.returncode is not None:
+            return
+        self._signal(process, signal.SIGTERM)
+        try:
+            await asyncio.wait_for(process.wait(), timeout=5)
+        except asyncio.TimeoutError:
+            self._signal(process, signal.SIGKILL if os.name != "nt" else signal.SIGTERM)
+            await process.wait()
+
+    @staticmethod
+    def _signal(process: asyncio.subprocess.Process, sig: int):
+        try:
+            if os.name != "nt":
+                os.killpg(process.pid, sig)
+            else:
+                process.send_signal(sig)
+        except ProcessLookupError:
+            pass
+
+    def get_status(self) -> List[dict]:
+        return [
+            {
+                "index": worker.index,
+                "port": worker.port,
+                "running": worker.running,
+                "restarts": worker.restarts
+            }
+            for worker in self._workers
+        ]
+
+    async def shutdown(self):
+        if self._warm_up_task is not None:
+            self._warm_up_task.cancel()
+        await asyncio.gather(*(self._stop(worker) for worker in self._workers), return_exceptions=True)
+
+
+# Global instance
+office_pool = OfficePool(
+    size=settings.office_workers,
+    base_port=settings.office_base_port,
+    convert_timeout=settings.office_convert_timeout_seconds,
+    startup_timeout=settings.office_startup_timeout_seconds
+)
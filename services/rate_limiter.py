@@ -0,0 +1,124 @@
+import time
+from typing import Dict, Tuple
+
+from config import settings
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated_at")
+
+    def __init__(self, capacity: float, now: float):
+        self.tokens = capacity
+        self.updated_at = now
+
+    def refill(self, capacity: float, refill_per_second: float, now: float):
+        """Add the tokens earned since the last refill, up to capacity"""
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(capacity, self.tokens + elapsed * refill_per_second)
+            self.updated_at = now
+
+
+class BuzzRateLimiter:
+    """In-memory token buckets per device and per team for buzz frames.
+
+    Checked before any Redis work so a flooding client costs one dict lookup
+    per rejected frame.
+    """
+
+    # Full buckets are dropped once the table grows past this size,
+    # at most once per interval so a large table isn't scanned per frame
+    PRUNE_THRESHOLD = 5000
+    PRUNE_INTERVAL_SECONDS = 30.0
+
+    def __init__(
+        self,
+        device_burst: float,
+        device_refill_per_second: float,
+        team_burst: float,
+        team_refill_per_second: float
+    ):
+        self.device_burst = device_burst
+        self.device_refill = device_refill_per_second
+        self.team_burst = team_burst
+        self.team_refill = team_refill_per_second
+        self.device_buckets: Dict[Tuple[int, int, str], TokenBucket] = {}
+        self.team_buckets: Dict[Tuple[int, int], TokenBucket] = {}
+        self.allowed_count = 0
+        self.throttled_count = 0
+        self.throttled_by_session: Dict[int, int] = {}
+        self._next_prune = 0.0
+
+    def allow(self, session_id: int, team_id: int, device_id: str) -> bool:
+        now = time.monotonic()
+
+        device_key = (session_id, team_id, device_id)
+        device_bucket = self.device_buckets.get(device_key)
+        if device_bucket is None:
+            device_bucket = self.device_buckets[device_key] = TokenBucket(self.device_burst, now)
+
+        team_key = (session_id, team_id)
+        team_bucket = self.team_buckets.get(team_key)
+        if team_bucket is None:
+            team_bucket = self.team_buckets[team_key] = TokenBucket(self.team_burst, now)
+
+        # Check both buckets before debiting either: a frame the team bucket
+        # rejects must not cost the device a token
+        device_bucket.refill(self.device_burst, self.device_refill, now)
+        team_bucket.refill(self.team_burst, self.team_refill, now)
+        allowed = device_bucket.tokens >= 1 and team_bucket.tokens >= 1
+
+        if allowed:
+            device_bucket.tokens -= 1
+            team_bucket.tokens -= 1
+            self.allowed_count += 1
+        else:
+            self.throttled_count += 1
+            self.throttled_by_session[session_id] = self.throttled_by_session.get(session_id, 0) + 1
+
+        if len(self.device_buckets) > self.PRUNE_THRESHOLD and now >= self._next_prune:
+            self._next_prune = now + self.PRUNE_INTERVAL_SECONDS
+            self._prune(now)
+
+        return allowed
+
+    def _prune(self, now: float):
+        """Drop buckets that have refilled completely.
+
+        A full bucket is indistinguishable from a new one, so dropping it
+        forgets nothing. With a zero refill rate a spent bucket never fills
+        again and is kept, rather than handing its device a fresh burst.
+        """
+        self.device_buckets = self._drop_full(self.device_buckets, self.device_burst, self.device_refill, now)
+        self.team_buckets = self._drop_full(self.team_buckets, self.team_burst, self.team_refill, now)
+
+    @staticmethod
+    def _drop_full(buckets: Dict, capacity: float, refill_per_second: float, now: float) -> Dict:
+        kept = {}
+        for key, bucket in buckets.items():
+            bucket.refill(capacity, refill_per_second, now)
+            if bucket.tokens < capacity:
+                kept[key] = bucket
+        return kept
+
+    def get_metrics(self) -> Dict:
+        return {
+            "allowed": self.allowed_count,
+            "throttled": self.throttled_count,
+            "throttled_by_session": dict(self.throttled_by_session),
+            "tracked_devices": len(self.device_buckets),
+            "tracked_teams": len(self.team_buckets)
+        }
+
+
+def _create_buzz_limiter() -> BuzzRateLimiter:
+    return BuzzRateLimiter(
+        device_burst=settings.buzz_device_burst,
+        device_refill_per_second=settings.buzz_device_refill_per_second,
+        team_burst=settings.buzz_team_burst,
+        team_refill_per_second=settings.buzz_team_refill_per_second
+    )
+
+
+# Global instance
+buzz_rate_limiter = _create_buzz_limiter()
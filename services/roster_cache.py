@@ -0,0 +1,102 @@
+import asyncio
+from typing import Dict, List, Optional
+
+from sqlalchemy import select
+
+from database import get_async_session_maker
+from models import Team, TeamSession
+
+
+class RosterCache:
+    """In-memory roster per session: team_id -> name, seat order, active flag.
+
+    Loaded once per session with a single query and kept until an admin change
+    (team update or session assignment) invalidates it.
+    """
+
+    def __init__(self):
+        # {session_id: {team_id: entry}}
+        self._rosters: Dict[int, Dict[int, Dict]] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+        # Bumped on invalidation so an in-flight load never stores a stale roster
+        self._generation = 0
+
+    async def get_roster(self, session_id: int) -> Dict[int, Dict]:
+        """Get the roster for a session, loading it on first use"""
+        roster = self._rosters.get(session_id)
+        if roster is not None:
+            return roster
+
+        lock = self._locks.setdefault(session_id, asyncio.Lock())
+        async with lock:
+            roster = self._rosters.get(session_id)
+            if roster is not None:
+                return roster
+
+            generation = self._generation
+            roster = await self._load(session_id)
+            if generation == self._generation:
+                self._rosters[session_id] = roster
+            return roster
+
+    async def _load(self, session_id: int) -> Dict[int, Dict]:
+        async_session = get_async_session_maker()
+        async with async_session() as db:
+            result = await db.execute(
+                select(
+                    Team.id,
+                    Team.name,
+                    Team.seat_order,
+                    Team.is_active,
+                    TeamSession.id
+                )
+                .join(TeamSession, TeamSession.team_id == Team.id)
+                .where(TeamSession.session_id == session_id)
+            )
+            rows = result.all()
+
+        return {
+            team_id: {
+                "team_id": team_id,
+                "team_name": name,
+                "seat_order": seat_order,
+                "is_active": bool(is_active) if is_active is not None else True,
+                "team_session_id": team_session_id
+            }
+            for team_id, name, seat_order, is_active, team_session_id in rows
+        }
+
+    async def get_team(self, session_id: int, team_id: int) -> Optional[Dict]:
+        """Get a single roster entry, or None if the team is not in the session"""
+        roster = await self.get_roster(session_id)
+        return roster.get(team_id)
+
+    async def team_names(self, session_id: int) -> Dict[int, str]:
+        roster = await self.get_roster(session_id)
+        return {team_id: entry["team_name"] for team_id, entry in roster.items()}
+
+    async def ordered(self, session_id: int) -> List[Dict]:
+        """Roster entries in seat order (teams without a seat go last, then by name)"""
+        roster = await self.get_roster(session_id)
+        return sorted(
+            roster.values(),
+            key=lambda e: (e["seat_order"] is None, e["seat_order"] or 0, e["team_name"], e["team_id"])
+        )
+
+    def invalidate(self, session_id: Optional[int] = None):
+        """Drop one session's roster, or all rosters when session_id is None"""
+        self._generation += 1
+        if session_id is None:
+            self._rosters.clear()
+        else:
+            self._rosters.pop(session_id, None)
+
+    def invalidate_team(self, team_id: int):
+        """Drop every cached roster that contains the given team"""
+        self._generation += 1
+        for session_id in [sid for sid, roster in self._rosters.items() if team_id in roster]:
+            del self._rosters[session_id]
+
+
+# Global instance
+roster_cache = RosterCache()
@@ -0,0 +1,95 @@
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, func, insert, select, update
+
+from database import get_async_session_maker
+from models import TeamSession, Score, ScoreEvent, ScoreSnapshot
+from services.score_ledger import score_ledger
+from services.snapshot_cache import snapshot_cache
+
+
+async def verify_scores(session_id: Optional[int] = None, fix: bool = False) -> Dict:
+    """Compare scores.total with starting_score + SUM(score_events.delta).
+
+    One grouped aggregate query covers the session (or every session when
+    session_id is None). A missing Score row counts as the starting score.
+    With fix=True, mismatched totals are rewritten in bulk (rows are only
+    inserted for teams that have events) and the affected sessions' live
+    totals are re-seeded from SQL.
+    """
+    # Queued ledger events are not in SQL yet and would show up as drift
+    await score_ledger.flush()
+
+    event_sums = (
+        select(ScoreEvent.team_session_id, func.sum(ScoreEvent.delta).label("delta"))
+        .group_by(ScoreEvent.team_session_id)
+        .subquery()
+    )
+    query = (
+        select(
+            TeamSession.id,
+            TeamSession.session_id,
+            TeamSession.team_id,
+            TeamSession.starting_score,
+            Score.id,
+            Score.total,
+            event_sums.c.delta
+        )
+        .outerjoin(Score, Score.team_session_id == TeamSession.id)
+        .outerjoin(event_sums, event_sums.c.team_session_id == TeamSession.id)
+    )
+    if session_id is not None:
+        query = query.where(TeamSession.session_id == session_id)
+
+    async_session = get_async_session_maker()
+    async with async_session() as db:
+        result = await db.execute(query)
+        rows = result.all()
+
+        mismatches: List[Dict] = []
+        for team_session_id, sid, team_id, starting_score, score_id, stored, delta in rows:
+            expected = (starting_score or 0) + (delta or 0)
+            # A team without a Score row reads as its starting score (see the
+            # ledger's projections), so that is only drift once events exist
+            effective = stored if score_id is not None else (starting_score or 0)
+            if effective != expected:
+                mismatches.append({
+                    "team_session_id": team_session_id,
+                    "session_id": sid,
+                    "team_id": team_id,
+                    "score_id": score_id,
+                    "stored_total": stored,
+                    "expected_total": expected
+                })
+
+        fixed_sessions = sorted({m["session_id"] for m in mismatches})
+        if fix and mismatches:
+            to_update = [
+                {"id": m["score_id"], "total": m["expected_total"]}
+                for m in mismatches if m["score_id"] is not None
+            ]
+            to_insert = [
+                {"team_session_id": m["team_session_id"], "total": m["expected_total"]}
+                for m in mismatches if m["score_id"] is None
+            ]
+            if to_update:
+                # Bulk UPDATE by primary key (executemany)
+                await db.execute(update(Score), to_update)
+            if to_insert:
+                await db.execute(insert(Score), to_insert)
+            # Snapshots taken from the drifted projection are no longer trustworthy
+            await db.execute(delete(ScoreSnapshot).where(ScoreSnapshot.session_id.in_(fixed_sessions)))
+            await db.commit()
+
+    if fix:
+        for sid in fixed_sessions:
+            await score_ledger.reset_session(sid)
+            snapshot_cache.invalidate(sid)
+
+    return {
+        "session_id": session_id,
+        "checked": len(rows),
+        "mismatch_count": len(mismatches),
+        "mismatches": mismatches,
+        "fixed": fix and bool(mismatches)
+    }
@@ -0,0 +1,967 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set
+
+import redis.asyncio as redis
+from sqlalchemy import delete, func, select, update
+from redis.exceptions import ResponseError
+from sqlalchemy.exc import InterfaceError, OperationalError
+
+from config import settings
+from database import get_async_session_maker
+from models import TeamSession, Score, ScoreEvent, ScoreSnapshot, RoundScore
+from services import leaderboard
+from services.roster_cache import roster_cache
+
+
+# Both scripts refuse to run while the session is being rebuilt (SCORELOCKED),
+# and when the seq counter is missing (NOSEQ) rather than letting INCR restart
+# at 1 and collide with persisted seqs; the caller seeds it from SQL and retries.
+SCRIPT_GUARDS = """
+if redis.call('EXISTS', ARGV[%(lock)d]) == 1 then
+    return redis.error_reply('SCORELOCKED session scores are being rebuilt')
+end
+if redis.call('EXISTS', KEYS[4]) == 0 then
+    return redis.error_reply('NOSEQ score sequence counter missing')
+end
+"""
+
+# Applies one or more adjustments atomically: stamps each with the next
+# per-session sequence number, updates the totals hash and leaderboard,
+# bumps the per-round totals, indexes the event for undo/redo and queues all
+# events as one pending item. Undo history is capped at ARGV[5] per team;
+# index entries of seqs that leave both stacks are dropped.
+# KEYS[1] totals hash, KEYS[2] leaderboard zset, KEYS[3] pending list,
+# KEYS[4] seq counter, KEYS[5] event index hash,
+# KEYS[4 + 2i] / KEYS[5 + 2i] undo / redo stack of the i-th event's team
+# ARGV[1] tiebreak scale, ARGV[2] events json array, ARGV[3] round totals key prefix,
+# ARGV[4] session lock key, ARGV[5] undo depth
+# Returns {total_1, seq_1, total_2, seq_2, ...}
+APPLY_SCRIPT = SCRIPT_GUARDS % {"lock": 4} + """
+local scale = tonumber(ARGV[1])
+local events = cjson.decode(ARGV[2])
+local depth = tonumber(ARGV[5])
+local result = {}
+for i, ev in ipairs(events) do
+    local seq = redis.call('INCR', KEYS[4])
+    local team = tostring(ev.team_id)
+    ev.seq = seq
+    ev.kind = 'adjust'
+    result[#result + 1] = redis.call('HINCRBY', KEYS[1], team, ev.delta)
+    result[#result + 1] = seq
+    redis.call('ZINCRBY', KEYS[2], ev.delta * scale, team)
+    redis.call('HINCRBY', ARGV[3] .. ev.round_id, team, ev.delta)
+    redis.call('HSET', KEYS[5], seq, cjson.encode({
+        team_id = ev.team_id, team_session_id = ev.team_session_id,
+        delta = ev.delta, round_id = ev.round_id
+    }))
+    redis.call('LPUSH', KEYS[4 + 2 * i], seq)
+    for _, old in ipairs(redis.call('LRANGE', KEYS[4 + 2 * i], depth, -1)) do
+        redis.call('HDEL', KEYS[5], old)
+    end
+    redis.call('LTRIM', KEYS[4 + 2 * i], 0, depth - 1)
+    -- A new adjustment discards the team's redo history
+    for _, old in ipairs(redis.call('LRANGE', KEYS[5 + 2 * i], 0, -1)) do
+        redis.call('HDEL', KEYS[5], old)
+    end
+    redis.call('DEL', KEYS[5 + 2 * i])
+end
+redis.call('RPUSH', KEYS[3], cjson.encode(events))
+return result
+"""
+
+# Undo or redo: pops the target seq from one stack, pushes it on the other and
+# queues a compensating event with its own seq. Events are never deleted.
+# KEYS[1..5] as APPLY_SCRIPT, KEYS[6] stack to pop, KEYS[7] stack to push
+# ARGV[1] tiebreak scale, ARGV[2] 'undo' | 'redo', ARGV[3] event json (id, actor, ...),
+# ARGV[4] round totals key prefix, ARGV[5] session lock key
+# Returns {total, seq, target_seq}, or nil when the stack is empty
+UNDO_REDO_SCRIPT = SCRIPT_GUARDS % {"lock": 5} + """
+local target = redis.call('LPOP', KEYS[6])
+if not target then
+    return nil
+end
+local indexed = redis.call('HGET', KEYS[5], target)
+if not indexed then
+    return nil
+end
+local original = cjson.decode(indexed)
+local delta = original.delta
+if ARGV[2] == 'undo' then
+    delta = -delta
+end
+local seq = redis.call('INCR', KEYS[4])
+local team = tostring(original.team_id)
+local total = redis.call('HINCRBY', KEYS[1], team, delta)
+redis.call('ZINCRBY', KEYS[2], delta * tonumber(ARGV[1]), team)
+redis.call('HINCRBY', ARGV[4] .. original.round_id, team, delta)
+redis.call('LPUSH', KEYS[7], target)
+
+local ev = cjson.decode(ARGV[3])
+ev.seq = seq
+ev.kind = ARGV[2]
+ev.target_seq = tonumber(target)
+ev.delta = delta
+ev.team_id = original.team_id
+ev.team_session_id = original.team_session_id
+ev.round_id = original.round_id
+redis.call('RPUSH', KEYS[3], cjson.encode({ev}))
+return {total, seq, tonumber(target)}
+"""
+
+# Seeds missing totals and rewrites the leaderboard from the totals hash.
+# KEYS[1] totals hash, KEYS[2] leaderboard zset
+# ARGV[1] tiebreak scale, then (team_id, seat_position, seed_total) triples
+REBUILD_SCRIPT = """
+local scale = tonumber(ARGV[1])
+redis.call('DEL', KEYS[2])
+for i = 2, #ARGV, 3 do
+    redis.call('HSETNX', KEYS[1], ARGV[i], ARGV[i + 2])
+    local total = tonumber(redis.call('HGET', KEYS[1], ARGV[i]))
+    redis.call('ZADD', KEYS[2], total * scale + (scale - 1 - tonumber(ARGV[i + 1])), ARGV[i])
+end
+return (#ARGV - 1) / 3
+"""
+
+# Deletes / extends a lock only while it still holds our token.
+# KEYS[1] lock key, ARGV[1] token, ARGV[2] ttl ms (extend only)
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+EXTEND_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+PENDING_KEY = "score:pending"
+# Events that can never be persisted (bad data, constraint violations), with the error
+DEAD_LETTER_KEY = "score:dead"
+WRITER_LOCK_KEY = "score:writer:lock"
+WRITER_LOCK_TTL_MS = 30000
+# Held while a session's projection is rebuilt; ledger scripts wait it out
+SESSION_LOCK_TTL_MS = 30000
+SESSION_LOCK_WAIT_SECONDS = 10
+
+# Errors that say the database is unavailable rather than that an event is bad:
+# the flush stops and the queue is left as it is
+TRANSIENT_ERRORS = (OperationalError, InterfaceError, OSError, asyncio.TimeoutError)
+
+
+def _totals_key(session_id: int) -> str:
+    return f"score:totals:{session_id}"
+
+
+def _seq_key(session_id: int) -> str:
+    return f"score:seq:{session_id}"
+
+
+def _event_index_key(session_id: int) -> str:
+    return f"score:events:{session_id}"
+
+
+def _session_lock_key(session_id: int) -> str:
+    return f"score:lock:{session_id}"
+
+
+def _round_key_prefix(session_id: int) -> str:
+    return f"score:rounds:{session_id}:"
+
+
+def _round_key(session_id: int, round_id: int) -> str:
+    return f"{_round_key_prefix(session_id)}{round_id}"
+
+
+def _undo_key(session_id: int, team_id: int) -> str:
+    return f"score:undo:{session_id}:{team_id}"
+
+
+def _redo_key(session_id: int, team_id: int) -> str:
+    return f"score:redo:{session_id}:{team_id}"
+
+
+class ScoreLedger:
+    """Redis-first, event-sourced score ledger.
+
+    Every change (adjust, undo, redo) is a ScoreEvent with a per-session
+    sequence number, and Score.total is a projection of those events. Changes
+    are applied atomically in Redis (totals, leaderboard, undo/redo stacks and
+    the queued event in one script) so a score click never waits on SQL. A
+    background writer drains the queue into SQL in batches and stores a
+    ScoreSnapshot every score_snapshot_interval events; reconcile() realigns
+    Redis with SQL at startup.
+    """
+
+    def __init__(self):
+        self.redis_url = settings.redis_url
+        self._redis = None
+        self._apply_script = None
+        self._undo_redo_script = None
+        self._rebuild_script = None
+        self._release_lock_script = None
+        self._extend_lock_script = None
+        self._loaded_sessions: Set[int] = set()
+        self._flush_lock = asyncio.Lock()
+        # Sessions whose Redis state still counts dead-lettered events
+        self._dead_sessions: Set[int] = set()
+        self._rebuilding_dead = False
+        # Sessions whose score lock this process holds (rebuild or reconcile)
+        self._held_sessions: Set[int] = set()
+        # Identifies this process's hold on the Redis locks
+        self._lock_token = f"{os.getpid()}:{uuid.uuid4().hex}"
+
+    async def get_redis(self):
+        # Score clicks are latency sensitive, so keep one pooled client
+        if self._redis is None:
+            self._redis = await redis.from_url(self.redis_url, decode_responses=True)
+            self._apply_script = self._redis.register_script(APPLY_SCRIPT)
+            self._undo_redo_script = self._redis.register_script(UNDO_REDO_SCRIPT)
+            self._rebuild_script = self._redis.register_script(REBUILD_SCRIPT)
+            self._release_lock_script = self._redis.register_script(RELEASE_LOCK_SCRIPT)
+            self._extend_lock_script = self._redis.register_script(EXTEND_LOCK_SCRIPT)
+        return self._redis
+
+    async def close(self):
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+    # ============ Live totals ============
+
+    async def ensure_loaded(self, session_id: int):
+        """Seed Redis totals for a session from SQL (never overwrites live values)
+        and rebuild its leaderboard with the current seat order"""
+        if session_id in self._loaded_sessions:
+            return
+
+        async_session = get_async_session_maker()
+        async with async_session() as db:
+            result = await db.execute(
+                select(TeamSession.team_id, TeamSession.starting_score, Score.total)
+                .outerjoin(Score, Score.team_session_id == TeamSession.id)
+                .where(TeamSession.session_id == session_id)
+            )
+            seeds = {
+                team_id: total if total is not None else (starting_score or 0)
+                for team_id, starting_score, total in result.all()
+            }
+
+        args = [leaderboard.TIEBREAK_SCALE]
+        for seat_position, entry in enumerate(await roster_cache.ordered(session_id)):
+            args.extend([entry["team_id"], seat_position, seeds.get(entry["team_id"], 0)])
+
+        await self.get_redis()
+        await self._rebuild_script(
+            keys=[_totals_key(session_id), leaderboard.leaderboard_key(session_id)],
+            args=args
+        )
+
+        self._loaded_sessions.add(session_id)
+
+    def invalidate(self, session_id: Optional[int] = None):
+        """Re-seed on next use (teams assigned, or seat order changed when session_id is None)"""
+        if session_id is None:
+            self._loaded_sessions.clear()
+        else:
+            self._loaded_sessions.discard(session_id)
+
+    async def get_totals(self, session_id: int) -> Dict[int, int]:
+        await self.ensure_loaded(session_id)
+        r = await self.get_redis()
+        raw = await r.hgetall(_totals_key(session_id))
+        return {int(team_id): int(total) for team_id, total in raw.items()}
+
+    async def get_total(self, session_id: int, team_id: int) -> int:
+        await self.ensure_loaded(session_id)
+        r = await self.get_redis()
+        total = await r.hget(_totals_key(session_id), str(team_id))
+        return int(total) if total is not None else 0
+
+    async def get_version(self, session_id: int) -> int:
+        """Sequence number of the latest score event in the session"""
+        r = await self.get_redis()
+        seq = await r.get(_seq_key(session_id))
+        return int(seq) if seq else 0
+
+    # ============ Events ============
+
+    @staticmethod
+    def _session_keys(session_id: int) -> List[str]:
+        return [
+            _totals_key(session_id),
+            leaderboard.leaderboard_key(session_id),
+            PENDING_KEY,
+            _seq_key(session_id),
+            _event_index_key(session_id)
+        ]
+
+    async def apply(
+        self,
+        session_id: int,
+        team_id: int,
+        team_session_id: int,
+        delta: int,
+        round_id: int,
+        actor_user_id: Optional[int] = None,
+        reason: Optional[str] = None
+    ) -> Dict:
+        """Apply a score delta and queue its ScoreEvent. Returns {total, seq}."""
+        results = await self.apply_many(
+            session_id,
+            [{"team_id": team_id, "team_session_id": team_session_id, "delta": delta, "reason": reason}],
+            round_id,
+            actor_user_id
+        )
+        return results[0]
+
+    async def apply_many(
+        self,
+        session_id: int,
+        entries: List[Dict],
+        round_id: int,
+        actor_user_id: Optional[int] = None
+    ) -> List[Dict]:
+        """Apply several deltas in one atomic step.
+
+        entries: [{team_id, team_session_id, delta, reason}]. Returns
+        [{total, seq}] in the same order.
+        """
+        await self.ensure_loaded(session_id)
+        await self.get_redis()
+
+        keys = self._session_keys(session_id)
+        events = []
+        for entry in entries:
+            events.append(self._build_event(
+                session_id,
+                entry["team_id"],
+                entry["team_session_id"],
+                entry["delta"],
+                round_id,
+                actor_user_id,
+                entry.get("reason")
+            ))
+            keys.extend([_undo_key(session_id, entry["team_id"]), _redo_key(session_id, entry["team_id"])])
+
+        flat = await self._run_script(session_id, self._apply_script, keys, [
+            leaderboard.TIEBREAK_SCALE,
+            json.dumps(events),
+            _round_key_prefix(session_id),
+            _session_lock_key(session_id),
+            settings.score_undo_depth
+        ])
+        return [{"total": int(flat[i]), "seq": int(flat[i + 1])} for i in range(0, len(flat), 2)]
+
+    async def undo(self, session_id: int, team_id: int, actor_user_id: Optional[int] = None) -> Optional[Dict]:
+        """Revert the team's latest active adjustment. Returns {total, seq, target_seq} or None."""
+        return await self._undo_redo(session_id, team_id, "undo", actor_user_id)
+
+    async def redo(self, session_id: int, team_id: int, actor_user_id: Optional[int] = None) -> Optional[Dict]:
+        """Re-apply the team's most recently undone adjustment"""
+        return await self._undo_redo(session_id, team_id, "redo", actor_user_id)
+
+    async def _undo_redo(
+        self,
+        session_id: int,
+        team_id: int,
+        kind: str,
+        actor_user_id: Optional[int]
+    ) -> Optional[Dict]:
+        await self.ensure_loaded(session_id)
+        await self.get_redis()
+
+        undo_key, redo_key = _undo_key(session_id, team_id), _redo_key(session_id, team_id)
+        stacks = [undo_key, redo_key] if kind == "undo" else [redo_key, undo_key]
+        meta = {
+            "id": uuid.uuid4().hex,
+            "session_id": session_id,
+            "actor_user_id": actor_user_id,
+            "reason": kind,
+            "created_at": time.time()
+        }
+
+        result = await self._run_script(session_id, self._undo_redo_script, self._session_keys(session_id) + stacks, [
+            leaderboard.TIEBREAK_SCALE,
+            kind,
+            json.dumps(meta),
+            _round_key_prefix(session_id),
+            _session_lock_key(session_id)
+        ])
+        if result is None:
+            return None
+        total, seq, target_seq = result
+        return {"total": int(total), "seq": int(seq), "target_seq": int(target_seq)}
+
+    async def _run_script(self, session_id: int, script, keys: List[str], args: List):
+        """Run a ledger script, seeding a lost seq counter and waiting out a rebuild"""
+        deadline = time.monotonic() + SESSION_LOCK_WAIT_SECONDS
+        while True:
+            try:
+                return await script(keys=keys, args=args)
+            except ResponseError as e:
+                if "NOSEQ" in str(e):
+                    await self._seed_seq(session_id)
+                elif "SCORELOCKED" in str(e) and time.monotonic() < deadline:
+                    await asyncio.sleep(0.05)
+                else:
+                    raise
+
+    async def _seed_seq(self, session_id: int):
+        """Restore a missing seq counter (Redis restart or eviction) from the
+        highest seq persisted or still queued, so new events never reuse one"""
+        async_session = get_async_session_maker()
+        async with async_session() as db:
+            max_seq = await db.scalar(
+                select(func.max(ScoreEvent.seq)).where(ScoreEvent.session_id == session_id)
+            ) or 0
+
+        r = await self.get_redis()
+        for item in await r.lrange(PENDING_KEY, 0, -1):
+            for event in _decode_item(item):
+                if event.get("session_id") == session_id and event.get("seq"):
+                    max_seq = max(max_seq, event["seq"])
+
+        # NX: another process may have seeded it (and applied events) meanwhile
+        await r.set(_seq_key(session_id), max_seq, nx=True)
+        print(f"Score seq counter for session {session_id} seeded at {max_seq}")
+
+    @staticmethod
+    def _build_event(
+        session_id: int,
+        team_id: int,
+        team_session_id: int,
+        delta: int,
+        round_id: int,
+        actor_user_id: Optional[int],
+        reason: Optional[str]
+    ) -> Dict:
+        return {
+            "id": uuid.uuid4().hex,
+            "session_id": session_id,
+            "team_id": team_id,
+            "team_session_id": team_session_id,
+            "round_id": round_id,
+            "actor_user_id": actor_user_id,
+            "delta": delta,
+            "reason": reason,
+            "created_at": time.time()
+        }
+
+    # ============ Leaderboard ============
+
+    async def get_leaderboard(self, session_id: int, limit: Optional[int] = None) -> List[Dict]:
+        """Ranked [{team_id, total, rank}], highest first, ties by seat order"""
+        await self.ensure_loaded(session_id)
+        r = await self.get_redis()
+        return await leaderboard.get_top(r, session_id, limit)
+
+    async def get_standings(self, session_id: int) -> List[Dict]:
+        """Leaderboard with team names: [{team_id, team_name, total, rank}]"""
+        board = await self.get_leaderboard(session_id)
+        team_names = await roster_cache.team_names(session_id)
+        for entry in board:
+            entry["team_name"] = team_names.get(entry["team_id"], f"Team {entry['team_id']}")
+        return board
+
+    async def get_rank(self, session_id: int, team_id: int) -> Optional[int]:
+        await self.ensure_loaded(session_id)
+        r = await self.get_redis()
+        return await leaderboard.get_rank(r, session_id, team_id)
+
+    async def get_round_standings(self, session_id: int, round_id: int) -> List[Dict]:
+        """Ranked [{team_id, team_name, total, rank}] for one round from the
+        precomputed per-round totals; ties fall back to seat order"""
+        r = await self.get_redis()
+        raw = await r.hgetall(_round_key(session_id, round_id))
+        standings = [
+            {
+                "team_id": entry["team_id"],
+                "team_name": entry["team_name"],
+                "total": int(raw.get(str(entry["team_id"]), 0))
+            }
+            for entry in await roster_cache.ordered(session_id)
+        ]
+        # sorted() is stable, so equal totals keep seat order
+        standings.sort(key=lambda entry: -entry["total"])
+        for index, entry in enumerate(standings):
+            entry["rank"] = index + 1
+        return standings
+
+    # ============ Write-behind ============
+
+    async def flush(self, wait: bool = True) -> int:
+        """Persist all queued events to SQL. Returns the number of events written.
+
+        Runs under the cross-process writer lock so two flushes never trim
+        each other's batches. With wait=False (the background writer) it
+        returns 0 right away when another process holds the lock. Sessions
+        that had events dead-lettered are rebuilt from SQL afterwards.
+        """
+        written = await self._flush(wait)
+        await self._rebuild_dead_sessions()
+        return written
+
+    async def _flush(self, wait: bool) -> int:
+        written = 0
+        async with self._flush_lock:
+            r = await self.get_redis()
+            if not await r.llen(PENDING_KEY):
+                return 0
+            if not await self._acquire_writer_lock(r, wait):
+                return 0
+            try:
+                while True:
+                    batch = await r.lrange(PENDING_KEY, 0, settings.score_flush_batch_size - 1)
+                    if not batch:
+                        break
+                    written += await self._flush_batch(r, batch)
+                    renewed = await self._extend_lock_script(
+                        keys=[WRITER_LOCK_KEY], args=[self._lock_token, WRITER_LOCK_TTL_MS]
+                    )
+                    if not renewed:
+                        raise RuntimeError("Lost the score writer lock")
+            finally:
+                await self._release_lock_script(keys=[WRITER_LOCK_KEY], args=[self._lock_token])
+        return written
+
+    async def _acquire_writer_lock(self, r, wait: bool) -> bool:
+        deadline = time.monotonic() + WRITER_LOCK_TTL_MS / 1000
+        while True:
+            if await r.set(WRITER_LOCK_KEY, self._lock_token, nx=True, px=WRITER_LOCK_TTL_MS):
+                return True
+            if not wait:
+                return False
+            if time.monotonic() > deadline:
+                raise RuntimeError("Timed out waiting for the score writer lock")
+            await asyncio.sleep(0.05)
+
+    async def _flush_batch(self, r, batch: List[str]) -> int:
+        """Persist one batch of pending items, then trim it from the queue.
+
+        If the batch fails for a reason other than the database being down,
+        its events are retried one at a time and those that still fail go to
+        the dead-letter list, so one bad event can't stall the queue.
+        """
+        try:
+            written = await self._persist([event for item in batch for event in _decode_item(item)])
+        except TRANSIENT_ERRORS:
+            raise
+        except Exception as e:
+            print(f"Score batch failed ({e}); persisting its events one at a time")
+            written = await self._persist_each(r, batch)
+
+        # Only drop events once they are committed or dead-lettered (at-least-once; replays are deduped)
+        await r.ltrim(PENDING_KEY, len(batch), -1)
+        return written
+
+    async def _persist_each(self, r, batch: List[str]) -> int:
+        written = 0
+        for item in batch:
+            try:
+                events = _decode_item(item)
+            except ValueError as e:
+                await self._dead_letter(r, item, e)
+                continue
+            for event in events:
+                try:
+                    written += await self._persist([event])
+                except TRANSIENT_ERRORS:
+                    raise
+                except Exception as e:
+                    await self._dead_letter(r, event, e)
+        return written
+
+    async def _dead_letter(self, r, event, error: Exception):
+        print(f"Score event moved to {DEAD_LETTER_KEY}: {error}")
+        await r.rpush(DEAD_LETTER_KEY, json.dumps({
+            "event": event,
+            "error": str(error),
+            "failed_at": time.time()
+        }))
+        if not isinstance(event, dict) or event.get("session_id") is None:
+            return
+
+        # The event is in the Redis totals but will never be in SQL: nothing
+        # may undo or redo it, and the session is rebuilt once the flush ends
+        session_id = event["session_id"]
+        if event.get("seq") is not None and event.get("team_id") is not None:
+            pipe = r.pipeline(transaction=True)
+            pipe.hdel(_event_index_key(session_id), event["seq"])
+            pipe.lrem(_undo_key(session_id, event["team_id"]), 0, event["seq"])
+            pipe.lrem(_redo_key(session_id, event["team_id"]), 0, event["seq"])
+            await pipe.execute()
+        self._dead_sessions.add(session_id)
+
+    async def _rebuild_dead_sessions(self):
+        """Realign Redis with SQL for sessions that lost events to the dead-letter list"""
+        if self._rebuilding_dead:
+            # A rebuild's own flush: the outer loop picks up anything it adds
+            return
+        self._rebuilding_dead = True
+        try:
+            while self._dead_sessions:
+                session_id = self._dead_sessions.pop()
+                if session_id in self._held_sessions:
+                    # Its rebuild or reconcile under way reloads Redis from SQL anyway
+                    continue
+                try:
+                    await self.rebuild_projection(session_id)
+                except Exception as e:
+                    print(f"Error rebuilding scores of session {session_id} after a dead-lettered event: {e}")
+        finally:
+            self._rebuilding_dead = False
+
+    async def get_dead_letters(self, limit: int = 100) -> List[Dict]:
+        r = await self.get_redis()
+        return [json.loads(item) for item in await r.lrange(DEAD_LETTER_KEY, 0, limit - 1)]
+
+    async def _persist(self, events: List[Dict]) -> int:
+        async_session = get_async_session_maker()
+        async with async_session() as db:
+            result = await db.execute(
+                select(ScoreEvent.ledger_id).where(
+                    ScoreEvent.ledger_id.in_([event["id"] for event in events])
+                )
+            )
+            already_written = set(result.scalars().all())
+            fresh = [event for event in events if event["id"] not in already_written]
+
+            deltas: Dict[int, int] = defaultdict(int)
+            round_deltas: Dict[tuple, int] = defaultdict(int)
+            last_seq: Dict[int, int] = {}
+            for event in fresh:
+                deltas[event["team_session_id"]] += event["delta"]
+                round_deltas[(event["team_session_id"], event["round_id"])] += event["delta"]
+                if event.get("seq") is not None:
+                    last_seq[event["session_id"]] = max(last_seq.get(event["session_id"], 0), event["seq"])
+                db.add(ScoreEvent(
+                    ledger_id=event["id"],
+                    session_id=event["session_id"],
+                    seq=event.get("seq"),
+                    kind=event.get("kind", "adjust"),
+                    target_seq=event.get("target_seq"),
+                    team_session_id=event["team_session_id"],
+                    round_id=event["round_id"],
+                    actor_user_id=event["actor_user_id"],
+                    delta=event["delta"],
+                    reason=event["reason"],
+                    created_at=datetime.fromtimestamp(event["created_at"], tz=timezone.utc)
+                ))
+
+            # Score is a projection: apply the net effect of the batch
+            for team_session_id, delta in deltas.items():
+                result = await db.execute(
+                    update(Score)
+                    .where(Score.team_session_id == team_session_id)
+                    .values(total=Score.total + delta)
+                )
+                if result.rowcount == 0:
+                    # No projection row yet: start it from the team's starting score
+                    starting_score = await db.scalar(
+                        select(TeamSession.starting_score).where(TeamSession.id == team_session_id)
+                    )
+                    db.add(Score(team_session_id=team_session_id, total=(starting_score or 0) + delta))
+
+            # Per-round running totals
+            for (team_session_id, round_id), delta in round_deltas.items():
+                result = await db.execute(
+                    update(RoundScore)
+                    .where(RoundScore.team_session_id == team_session_id, RoundScore.round_id == round_id)
+                    .values(total=RoundScore.total + delta)
+                )
+                if result.rowcount == 0:
+                    db.add(RoundScore(team_session_id=team_session_id, round_id=round_id, total=delta))
+
+            await db.flush()
+            for session_id, seq in last_seq.items():
+                await self._maybe_snapshot(db, session_id, seq)
+
+            await db.commit()
+        return len(fresh)
+
+    async def _maybe_snapshot(self, db, session_id: int, seq: int):
+        """Store the projection once score_snapshot_interval events have passed"""
+        last_snapshot_seq = await db.scalar(
+            select(func.max(ScoreSnapshot.seq)).where(ScoreSnapshot.session_id == session_id)
+        ) or 0
+        if seq - last_snapshot_seq < settings.score_snapshot_interval:
+            return
+
+        result = await db.execute(
+            select(Score.team_session_id, Score.total)
+            .join(TeamSession, TeamSession.id == Score.team_session_id)
+            .where(TeamSession.session_id == session_id)
+        )
+        db.add(ScoreSnapshot(
+            session_id=session_id,
+            seq=seq,
+            totals={str(team_session_id): total for team_session_id, total in result.all()}
+        ))
+
+    async def rebuild_projection(self, session_id: int) -> Dict[int, int]:
+        """Recompute Score totals from the latest snapshot plus the events after it.
+
+        Returns {team_session_id: total} as written; live totals are re-seeded
+        from SQL on next use. Score changes to the session wait until the
+        rebuild is done, so none land between the flush and the re-seed.
+        """
+        async with self._session_lock(session_id, wait=False):
+            return await self._rebuild_projection(session_id)
+
+    @asynccontextmanager
+    async def _session_lock(self, session_id: int, wait: bool):
+        """Hold the session's score lock; the ledger scripts refuse to run meanwhile"""
+        r = await self.get_redis()
+        lock_key = _session_lock_key(session_id)
+        deadline = time.monotonic() + SESSION_LOCK_TTL_MS / 1000
+        while not await r.set(lock_key, self._lock_token, nx=True, px=SESSION_LOCK_TTL_MS):
+            if not wait:
+                raise RuntimeError(f"Scores of session {session_id} are already being rebuilt")
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Timed out waiting for the score lock of session {session_id}")
+            await asyncio.sleep(0.05)
+        self._held_sessions.add(session_id)
+        try:
+            yield
+        finally:
+            self._held_sessions.discard(session_id)
+            await self._release_lock_script(keys=[lock_key], args=[self._lock_token])
+
+    async def _rebuild_projection(self, session_id: int) -> Dict[int, int]:
+        await self.flush()
+
+        async_session = get_async_session_maker()
+        async with async_session() as db:
+            result = await db.execute(
+                select(ScoreSnapshot)
+                .where(ScoreSnapshot.session_id == session_id)
+                .order_by(ScoreSnapshot.seq.desc())
+                .limit(1)
+            )
+            snapshot = result.scalar_one_or_none()
+            base_seq = snapshot.seq if snapshot else 0
+            base_totals = {int(k): v for k, v in snapshot.totals.items()} if snapshot else {}
+
+            result = await db.execute(
+                select(TeamSession.id, TeamSession.starting_score)
+                .where(TeamSession.session_id == session_id)
+            )
+            totals = {
+                team_session_id: base_totals.get(team_session_id, starting_score or 0)
+                for team_session_id, starting_score in result.all()
+            }
+
+            # Range scan on (session_id, seq)
+            result = await db.execute(
+                select(ScoreEvent.team_session_id, func.sum(ScoreEvent.delta))
+                .where(ScoreEvent.session_id == session_id, ScoreEvent.seq > base_seq)
+                .group_by(ScoreEvent.team_session_id)
+            )
+            for team_session_id, delta in result.all():
+                totals[team_session_id] = totals.get(team_session_id, 0) + (delta or 0)
+
+            for team_session_id, total in totals.items():
+                result = await db.execute(
+                    update(Score).where(Score.team_session_id == team_session_id).values(total=total)
+                )
+                if result.rowcount == 0:
+                    db.add(Score(team_session_id=team_session_id, total=total))
+
+            # Round totals have no snapshot; regroup them from the log
+            result = await db.execute(
+                select(ScoreEvent.team_session_id, TeamSession.team_id, ScoreEvent.round_id, func.sum(ScoreEvent.delta))
+                .join(TeamSession, TeamSession.id == ScoreEvent.team_session_id)
+                .where(ScoreEvent.session_id == session_id)
+                .group_by(ScoreEvent.team_session_id, TeamSession.team_id, ScoreEvent.round_id)
+            )
+            round_totals = result.all()
+            await db.execute(delete(RoundScore).where(RoundScore.team_session_id.in_(list(totals))))
+            for team_session_id, _, round_id, total in round_totals:
+                db.add(RoundScore(team_session_id=team_session_id, round_id=round_id, total=total or 0))
+            await db.commit()
+
+        await self.reset_session(session_id)
+
+        r = await self.get_redis()
+        stale_rounds = [key async for key in r.scan_iter(match=f"{_round_key_prefix(session_id)}*")]
+        pipe = r.pipeline(transaction=True)
+        if stale_rounds:
+            pipe.delete(*stale_rounds)
+        for _, team_id, round_id, total in round_totals:
+            pipe.hset(_round_key(session_id, round_id), str(team_id), total or 0)
+        await pipe.execute()
+        return totals
+
+    async def reset_session(self, session_id: int):
+        """Drop live totals so they are re-seeded from SQL on next use"""
+        r = await self.get_redis()
+        await r.delete(_totals_key(session_id), leaderboard.leaderboard_key(session_id))
+        self.invalidate(session_id)
+
+    async def reconcile(self):
+        """Startup: drain leftover events to SQL, then rebuild Redis state from SQL.
+
+        Each session is rebuilt under its score lock, so an adjustment made
+        meanwhile waits for the rebuild instead of being overwritten by it.
+        """
+        written = await self.flush()
+
+        async_session = get_async_session_maker()
+        async with async_session() as db:
+            result = await db.execute(select(TeamSession.session_id).distinct())
+            session_ids = set(result.scalars().all())
+            result = await db.execute(select(ScoreEvent.session_id).distinct())
+            session_ids.update(result.scalars().all())
+
+        for session_id in sorted(session_ids):
+            async with self._session_lock(session_id, wait=True):
+                await self._reconcile_session(session_id)
+
+        # Stacks and round totals of sessions that no longer exist
+        r = await self.get_redis()
+        orphans = []
+        for pattern in ("score:undo:*", "score:redo:*", "score:rounds:*"):
+            async for key in r.scan_iter(match=pattern):
+                if int(key.split(":")[2]) not in session_ids:
+                    orphans.append(key)
+        if orphans:
+            await r.delete(*orphans)
+
+        # Leaderboards are rebuilt (with seat order) on first use
+        self._loaded_sessions.clear()
+        print(f"Score ledger reconciled: {written} pending events flushed, {len(session_ids)} sessions loaded")
+
+    async def _reconcile_session(self, session_id: int):
+        # Events applied before the lock was taken
+        await self.flush()
+
+        async_session = get_async_session_maker()
+        async with async_session() as db:
+            result = await db.execute(
+                select(TeamSession.team_id, TeamSession.starting_score, Score.total)
+                .outerjoin(Score, Score.team_session_id == TeamSession.id)
+                .where(TeamSession.session_id == session_id)
+            )
+            totals = {
+                str(team_id): total if total is not None else (starting_score or 0)
+                for team_id, starting_score, total in result.all()
+            }
+
+            result = await db.execute(
+                select(
+                    ScoreEvent.seq,
+                    ScoreEvent.kind,
+                    ScoreEvent.delta,
+                    ScoreEvent.round_id,
+                    TeamSession.id,
+                    TeamSession.team_id
+                )
+                .join(TeamSession, TeamSession.id == ScoreEvent.team_session_id)
+                .where(ScoreEvent.session_id == session_id, ScoreEvent.seq.isnot(None))
+                .order_by(ScoreEvent.seq)
+            )
+            events = result.all()
+
+            result = await db.execute(
+                select(TeamSession.team_id, RoundScore.round_id, RoundScore.total)
+                .join(TeamSession, TeamSession.id == RoundScore.team_session_id)
+                .where(TeamSession.session_id == session_id)
+            )
+            round_rows = result.all()
+
+        round_totals: Dict[str, Dict[str, int]] = defaultdict(dict)
+        for team_id, round_id, total in round_rows:
+            round_totals[_round_key(session_id, round_id)][str(team_id)] = total
+
+        # Replay the log to restore the seq counter, the event index and undo/redo
+        # stacks, step for step as the scripts did: an adjustment caps the undo
+        # history at the depth and discards the redo history, and the index
+        # forgets the seqs dropped either way
+        depth = settings.score_undo_depth
+        max_seq = 0
+        index: Dict[int, str] = {}
+        stacks: Dict[str, List[int]] = defaultdict(list)
+        for seq, kind, delta, round_id, team_session_id, team_id in events:
+            max_seq = seq
+            undo_stack = stacks[_undo_key(session_id, team_id)]
+            redo_stack = stacks[_redo_key(session_id, team_id)]
+            if kind == "adjust":
+                index[seq] = json.dumps({
+                    "team_id": team_id,
+                    "team_session_id": team_session_id,
+                    "delta": delta,
+                    "round_id": round_id
+                })
+                undo_stack.append(seq)
+                for old in undo_stack[:-depth]:
+                    index.pop(old, None)
+                del undo_stack[:-depth]
+                for old in redo_stack:
+                    index.pop(old, None)
+                redo_stack.clear()
+            elif kind == "undo" and undo_stack:
+                redo_stack.append(undo_stack.pop())
+            elif kind == "redo" and redo_stack:
+                undo_stack.append(redo_stack.pop())
+
+        r = await self.get_redis()
+        stale = [key async for key in r.scan_iter(match=f"score:undo:{session_id}:*")]
+        stale += [key async for key in r.scan_iter(match=f"score:redo:{session_id}:*")]
+        stale += [key async for key in r.scan_iter(match=f"{_round_key_prefix(session_id)}*")]
+
+        pipe = r.pipeline(transaction=True)
+        pipe.delete(
+            _totals_key(session_id),
+            leaderboard.leaderboard_key(session_id),
+            _event_index_key(session_id),
+            *stale
+        )
+        if totals:
+            pipe.hset(_totals_key(session_id), mapping=totals)
+        pipe.set(_seq_key(session_id), max_seq)
+        if index:
+            pipe.hset(_event_index_key(session_id), mapping=index)
+        for key, mapping in round_totals.items():
+            pipe.hset(key, mapping=mapping)
+        for key, stack in stacks.items():
+            if stack:
+                # Stacks are LPUSHed, so the most recent seq goes at the head
+                pipe.rpush(key, *reversed(stack))
+        await pipe.execute()
+        self.invalidate(session_id)
+
+
+def _decode_item(item: str) -> List[Dict]:
+    # A pending item is the list of events from one ledger call
+    decoded = json.loads(item)
+    return decoded if isinstance(decoded, list) else [decoded]
+
+
+# Global instance
+score_ledger = ScoreLedger()
+
+
+async def run_score_writer():
+    """Background write-behind loop for the score ledger"""
+    interval = max(0.05, settings.score_flush_interval_ms / 1000)
+
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            # Only one process drains the queue at a time; skip the tick if another is
+            await score_ledger.flush(wait=False)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Score writer error: {e}")
@@ -0,0 +1,85 @@
+import asyncio
+import uuid
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+
+# Events that do not change what the display snapshot contains
+NEUTRAL_EVENTS = {
+    "timer.tick",
+    "buzzer.status",
+    "score.status",
+    "presenter.started",
+    "presenter.heartbeat",
+    "presenter.stopped",
+    "presenter.disconnected",
+    "display.approved",
+    "display.error"
+}
+
+
+class SnapshotCache:
+    """Assembled display snapshot per session, tagged with a version.
+
+    Every state change bumps the session's version (invalidate); the next
+    request rebuilds once and concurrent misses share that single build.
+    The version doubles as a weak ETag so unchanged displays get 304s.
+    """
+
+    def __init__(self):
+        # Keeps ETags from one process run from matching the next
+        self._boot = uuid.uuid4().hex[:8]
+        self._versions: Dict[int, int] = {}
+        # {session_id: (version, snapshot)}
+        self._snapshots: Dict[int, Tuple[int, Dict]] = {}
+        self._inflight: Dict[int, Tuple[int, asyncio.Task]] = {}
+
+    def version(self, session_id: int) -> int:
+        return self._versions.get(session_id, 0)
+
+    def etag(self, session_id: int, version: Optional[int] = None) -> str:
+        if version is None:
+            version = self.version(session_id)
+        return f'W/"{self._boot}-{session_id}-{version}"'
+
+    def invalidate(self, session_id: Optional[int] = None):
+        """Bump one session's version, or every session's when session_id is None"""
+        session_ids = list(self._versions.keys() | self._snapshots.keys()) if session_id is None else [session_id]
+        for sid in session_ids:
+            self._versions[sid] = self._versions.get(sid, 0) + 1
+            self._snapshots.pop(sid, None)
+
+    def invalidate_for_event(self, session_id: int, event: Dict):
+        if event.get("event") not in NEUTRAL_EVENTS:
+            self.invalidate(session_id)
+
+    async def get(self, session_id: int, build: Callable[[int], Awaitable[Dict]]) -> Tuple[str, Dict]:
+        """Return (etag, snapshot), building it at most once per version"""
+        version = self.version(session_id)
+        cached = self._snapshots.get(session_id)
+        if cached and cached[0] == version:
+            return self.etag(session_id, version), cached[1]
+
+        # Single flight: concurrent misses for the same version share one build
+        inflight = self._inflight.get(session_id)
+        if inflight is None or inflight[0] != version:
+            task = asyncio.create_task(self._build(session_id, version, build))
+            inflight = self._inflight[session_id] = (version, task)
+
+        # shield: a disconnecting client must not cancel the build for the others
+        snapshot = await asyncio.shield(inflight[1])
+        return self.etag(session_id, inflight[0]), snapshot
+
+    async def _build(self, session_id: int, version: int, build: Callable[[int], Awaitable[Dict]]) -> Dict:
+        try:
+            snapshot = await build(session_id)
+            # Only keep it if nothing changed while building
+            if self.version(session_id) == version:
+                self._snapshots[session_id] = (version, snapshot)
+            return snapshot
+        finally:
+            if self._inflight.get(session_id, (None,))[0] == version:
+                del self._inflight[session_id]
+
+
+# Global instance
+snapshot_cache = SnapshotCache()
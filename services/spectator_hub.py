@@ -0,0 +1,196 @@
+import asyncio
+import json
+from typing import Dict, List, Optional, Set
+
+import redis.asyncio as redis
+from sqlalchemy import select
+
+from config import settings
+from database import get_async_session_maker
+from models import Session, Slide
+from services.roster_cache import roster_cache
+from services.media_service import slide_image_url
+from services.score_ledger import score_ledger
+
+
+class _SpectatorSession:
+    __slots__ = ("sockets", "frame", "changed", "slide", "timer", "top", "scores_dirty", "dirty", "seq", "task")
+
+    def __init__(self):
+        self.sockets: Set = set()
+        self.frame: Optional[str] = None
+        # Replaced on every publish; waiters hold the old one and wake once
+        self.changed = asyncio.Event()
+        self.slide: Optional[str] = None
+        self.timer: Optional[Dict] = None
+        self.top: List[Dict] = []
+        self.scores_dirty = True
+        self.dirty = True
+        self.seq = 0
+        self.task: Optional[asyncio.Task] = None
+
+
+class SpectatorHub:
+    """Reduced, rate-limited state feed for audience phones.
+
+    Spectators get one `spectator.state` frame (scoreboard top-K, timer,
+    current slide URL) at most once per interval, built and encoded once per
+    session. Each connection only ever sends the latest frame, so a slow
+    phone skips intermediate states instead of queueing them.
+    """
+
+    def __init__(self, interval_ms: int, top_k: int, max_per_session: int, send_timeout: float):
+        self.interval = interval_ms / 1000
+        self.top_k = top_k
+        self.max_per_session = max_per_session
+        self.send_timeout = send_timeout
+        self._sessions: Dict[int, _SpectatorSession] = {}
+        self._redis = None
+
+    async def _get_redis(self):
+        if self._redis is None:
+            self._redis = await redis.from_url(settings.redis_url, decode_responses=True)
+        return self._redis
+
+    def has_capacity(self, session_id: int) -> bool:
+        return self.subscriber_count(session_id) < self.max_per_session
+
+    def subscriber_count(self, session_id: Optional[int] = None) -> int:
+        if session_id is not None:
+            state = self._sessions.get(session_id)
+            return len(state.sockets) if state else 0
+        return sum(len(state.sockets) for state in self._sessions.values())
+
+    def note(self, session_id: int, message: Dict):
+        """Fold a session broadcast into the next frame (no I/O, no per-spectator work)"""
+        state = self._sessions.get(session_id)
+        if state is None:
+            return
+
+        event = message.get("event", "")
+        if event == "slide.update":
+            slide = message.get("slide") or {}
+            state.slide = slide.get("url") or (
+                slide_image_url(session_id, slide["id"], slide.get("image_hash")) if "id" in slide else None
+            )
+            state.dirty = True
+        elif event.startswith("score."):
+            # Heartbeats only repeat the board; real changes carry a new version
+            if event != "score.status":
+                state.scores_dirty = True
+
+    def add(self, session_id: int, websocket):
+        state = self._sessions.get(session_id)
+        if state is None:
+            state = self._sessions[session_id] = _SpectatorSession()
+            state.task = asyncio.create_task(self._run(session_id, state))
+        state.sockets.add(websocket)
+
+    def remove(self, session_id: int, websocket):
+        state = self._sessions.get(session_id)
+        if state is None:
+            return
+        state.sockets.discard(websocket)
+        if not state.sockets:
+            state.task.cancel()
+            del self._sessions[session_id]
+
+    async def pump(self, session_id: int, websocket):
+        """Send the latest frame to one spectator whenever it changes"""
+        state = self._sessions.get(session_id)
+        if state is None:
+            return
+        sent_seq = 0
+        while True:
+            changed = state.changed
+            if state.frame is not None and state.seq != sent_seq:
+                sent_seq = state.seq
+                try:
+                    await asyncio.wait_for(websocket.send_text(state.frame), timeout=self.send_timeout)
+                except Exception:
+                    # Dead or stalled phone: close it so its receive loop ends too
+                    try:
+                        await websocket.close()
+                    except Exception:
+                        pass
+                    return
+                # A newer frame may have been published while this one was sending
+                continue
+            await changed.wait()
+
+    async def _run(self, session_id: int, state: _SpectatorSession):
+        """Per-session loop: rebuild and publish at most one frame per interval"""
+        try:
+            state.slide = await self._load_slide(session_id)
+            while True:
+                try:
+                    await self._refresh(session_id, state)
+                except Exception as e:
+                    print(f"Error in spectator feed for session {session_id}: {e}")
+                await asyncio.sleep(self.interval)
+        except asyncio.CancelledError:
+            pass
+
+    async def _refresh(self, session_id: int, state: _SpectatorSession):
+        # Ticks, pause and reset all land in the timer hash; read it once per interval
+        r = await self._get_redis()
+        timer_data = await r.hgetall(f"timer:{session_id}")
+        timer = {
+            "state": timer_data.get("state"),
+            "remaining_ms": int(timer_data.get("remaining_ms", 0))
+        } if timer_data else None
+        if timer != state.timer:
+            state.timer = timer
+            state.dirty = True
+
+        if state.scores_dirty:
+            state.scores_dirty = False
+            board = await score_ledger.get_leaderboard(session_id, self.top_k)
+            team_names = await roster_cache.team_names(session_id)
+            top = [
+                {
+                    "team_id": entry["team_id"],
+                    "team_name": team_names.get(entry["team_id"], f"Team {entry['team_id']}"),
+                    "total": entry["total"],
+                    "rank": entry["rank"]
+                }
+                for entry in board
+            ]
+            if top != state.top:
+                state.top = top
+                state.dirty = True
+
+        if not state.dirty:
+            return
+        state.dirty = False
+        state.seq += 1
+        state.frame = json.dumps({
+            "event": "spectator.state",
+            "seq": state.seq,
+            "top": state.top,
+            "timer": state.timer,
+            "slide": state.slide
+        }, separators=(",", ":"))
+
+        changed, state.changed = state.changed, asyncio.Event()
+        changed.set()
+
+    async def _load_slide(self, session_id: int) -> Optional[str]:
+        async_session = get_async_session_maker()
+        async with async_session() as db:
+            result = await db.execute(
+                select(Slide.id, Slide.image_hash)
+                .join(Session, Session.current_slide_id == Slide.id)
+                .where(Session.id == session_id)
+            )
+            row = result.first()
+            return slide_image_url(session_id, row.id, row.image_hash) if row else None
+
+
+# Global instance
+spectator_hub = SpectatorHub(
+    interval_ms=settings.spectator_interval_ms,
+    top_k=settings.spectator_top_k,
+    max_per_session=settings.spectator_max_per_session,
+    send_timeout=settings.spectator_send_timeout_seconds
+)
@@ -0,0 +1,150 @@
+import asyncio
+import json
+import time
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, Optional, Set, Tuple
+
+from config import settings
+
+
+# Event families forwarded to SSE subscribers (signalling and telemetry stay on WebSockets)
+STREAMED_PREFIXES = ("slide.", "timer.", "buzzer.", "score.", "round.")
+
+# Too frequent to be worth replaying; the next tick supersedes it anyway
+UNBUFFERED_EVENTS = {"timer.tick"}
+
+KEEPALIVE_FRAME = b": keepalive\n\n"
+RESYNC_FRAME = b'data: {"event": "stream.resync"}\n\n'
+
+# A stream with no subscribers keeps its buffer this long for reconnects
+IDLE_STREAM_SECONDS = 60.0
+
+
+class _SessionStream:
+    __slots__ = ("epoch", "next_id", "buffer", "subscribers", "idle_since")
+
+    def __init__(self, buffer_size: int):
+        # Event ids are "<epoch>-<n>": an id from before a restart, or from a
+        # stream that was dropped and recreated, never matches this one
+        self.epoch = str(time.time_ns())
+        self.next_id = 1
+        self.buffer: Deque[Tuple[int, bytes]] = deque(maxlen=buffer_size)
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.idle_since: Optional[float] = None
+
+
+class SSEHub:
+    """Server-Sent Events fan-out per session.
+
+    Each broadcast is encoded once and the same bytes are queued for every
+    subscriber. Recent frames are kept in a ring buffer so a reconnecting
+    client resumes from Last-Event-ID; a subscriber that falls too far
+    behind is dropped and resumes the same way. Streams nobody has
+    subscribed to for IDLE_STREAM_SECONDS are dropped.
+    """
+
+    def __init__(self, buffer_size: int, queue_size: int, keepalive_seconds: float):
+        self.buffer_size = buffer_size
+        self.queue_size = queue_size
+        self.keepalive_seconds = keepalive_seconds
+        self._streams: Dict[int, _SessionStream] = {}
+
+    def publish(self, session_id: int, message: Dict):
+        stream = self._streams.get(session_id)
+        event = message.get("event", "")
+        if stream is None or not event.startswith(STREAMED_PREFIXES):
+            return
+
+        data = json.dumps(message, separators=(",", ":"))
+        if event in UNBUFFERED_EVENTS:
+            frame = f"data: {data}\n\n".encode()
+        else:
+            event_id = stream.next_id
+            stream.next_id += 1
+            frame = f"id: {stream.epoch}-{event_id}\ndata: {data}\n\n".encode()
+            stream.buffer.append((event_id, frame))
+
+        for queue in list(stream.subscribers):
+            try:
+                queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                # Slow consumer: end its stream; it resumes via Last-Event-ID
+                stream.subscribers.discard(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    def subscriber_count(self, session_id: Optional[int] = None) -> int:
+        if session_id is not None:
+            stream = self._streams.get(session_id)
+            return len(stream.subscribers) if stream else 0
+        return sum(len(stream.subscribers) for stream in self._streams.values())
+
+    async def subscribe(self, session_id: int, last_event_id: Optional[str] = None) -> AsyncIterator[bytes]:
+        """Yield encoded frames for a session until the client goes away"""
+        self._drop_idle_streams()
+        stream = self._streams.get(session_id)
+        if stream is None:
+            stream = self._streams[session_id] = _SessionStream(self.buffer_size)
+        stream.idle_since = None
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        # Replay and registration happen without an await in between, so no frame is missed
+        backlog = self._replay(stream, last_event_id)
+        stream.subscribers.add(queue)
+        try:
+            for frame in backlog:
+                yield frame
+            while True:
+                try:
+                    frame = await asyncio.wait_for(queue.get(), timeout=self.keepalive_seconds)
+                except asyncio.TimeoutError:
+                    yield KEEPALIVE_FRAME
+                    continue
+                if frame is None:
+                    return
+                yield frame
+        finally:
+            stream.subscribers.discard(queue)
+            if not stream.subscribers:
+                stream.idle_since = time.monotonic()
+            self._drop_idle_streams()
+
+    def _drop_idle_streams(self):
+        now = time.monotonic()
+        idle = [
+            session_id for session_id, stream in self._streams.items()
+            if not stream.subscribers
+            and stream.idle_since is not None
+            and now - stream.idle_since > IDLE_STREAM_SECONDS
+        ]
+        for session_id in idle:
+            del self._streams[session_id]
+
+    @staticmethod
+    def _replay(stream: _SessionStream, last_event_id: Optional[str]) -> list:
+        if not last_event_id:
+            return []
+        epoch, _, last_id_raw = last_event_id.partition("-")
+        try:
+            last_id = int(last_id_raw)
+        except ValueError:
+            return [RESYNC_FRAME]
+        if epoch != stream.epoch:
+            # Id from before a restart or from a dropped stream: the client's
+            # state can't be patched up from this buffer, so it refetches
+            return [RESYNC_FRAME]
+
+        oldest_id = stream.buffer[0][0] if stream.buffer else stream.next_id
+        if last_id + 1 < oldest_id or last_id >= stream.next_id:
+            # Missed frames are gone
+            return [RESYNC_FRAME]
+        return [frame for event_id, frame in stream.buffer if event_id > last_id]
+
+
+# Global instance
+sse_hub = SSEHub(
+    buffer_size=settings.sse_buffer_size,
+    queue_size=settings.sse_queue_size,
+    keepalive_seconds=settings.sse_keepalive_seconds
+)
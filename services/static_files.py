@@ -0,0 +1,313 @@
+import asyncio
+import hashlib
+import mimetypes
+import os
+import re
+import stat
+from collections import OrderedDict
+from email.utils import formatdate
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs
+
+import anyio
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response, StreamingResponse
+from starlette.types import Scope
+
+from config import settings
+
+
+# Precompressed variants written by precompress_static.py, best first
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+# A path segment that is a content hash (deck_<sha256> slide directories, <sha256>.pptx uploads)
+HASHED_PATH = re.compile(r"(^|[/_])[0-9a-f]{32,}([/._]|$)")
+
+# Files larger than this get an mtime/size ETag instead of being hashed
+HASH_LIMIT_BYTES = 64 * 1024 * 1024
+
+RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+RANGE_CHUNK_SIZE = 64 * 1024
+
+
+class _FileEntry:
+    __slots__ = ("key", "etag", "size", "last_modified", "variants", "body")
+
+    def __init__(self, key, etag: str, size: int, last_modified: str, variants: Dict[str, str]):
+        self.key = key
+        self.etag = etag
+        self.size = size
+        self.last_modified = last_modified
+        self.variants = variants
+        self.body: Optional[bytes] = None
+
+
+class FileCache:
+    """Content-hash ETags, precompressed variants and an LRU of small hot files.
+
+    Entries are keyed by (path, mtime, size), so a rewritten file is picked
+    up on its next request. Bodies of files up to max_file_bytes are kept in
+    memory within a total budget; larger files are streamed from disk.
+    """
+
+    def __init__(self, max_bytes: int, max_file_bytes: int):
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self._entries: Dict[str, _FileEntry] = {}
+        self._bodies: "OrderedDict[str, _FileEntry]" = OrderedDict()
+        self._body_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    async def entry(self, full_path: str, stat_result: os.stat_result) -> _FileEntry:
+        key = (stat_result.st_mtime, stat_result.st_size)
+        entry = self._entries.get(full_path)
+        if entry is not None and entry.key == key:
+            self.hits += 1
+            if entry.body is not None:
+                self._bodies.move_to_end(full_path)
+            return entry
+
+        self.misses += 1
+        entry, body = await asyncio.to_thread(self._load, full_path, stat_result)
+        self._drop_body(full_path)
+        self._entries[full_path] = entry
+        if body is not None:
+            self._store_body(full_path, entry, body)
+        return entry
+
+    def _load(self, full_path: str, stat_result: os.stat_result) -> Tuple[_FileEntry, Optional[bytes]]:
+        body = None
+        if stat_result.st_size <= self.max_file_bytes:
+            with open(full_path, "rb") as f:
+                body = f.read()
+            etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        elif stat_result.st_size <= HASH_LIMIT_BYTES:
+            digest = hashlib.sha256()
+            with open(full_path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(chunk)
+            etag = f'"{digest.hexdigest()[:32]}"'
+        else:
+            etag = f'"{int(stat_result.st_mtime)}-{stat_result.st_size}"'
+
+        variants = {}
+        for encoding, suffix in ENCODINGS:
+            try:
+                variant_stat = os.stat(full_path + suffix)
+            except OSError:
+                continue
+            # A variant older than its source is stale; serve the source
+            if variant_stat.st_mtime >= stat_result.st_mtime:
+                variants[encoding] = full_path + suffix
+
+        entry = _FileEntry(
+            (stat_result.st_mtime, stat_result.st_size),
+            etag,
+            stat_result.st_size,
+            formatdate(stat_result.st_mtime, usegmt=True),
+            variants
+        )
+        return entry, body
+
+    def _store_body(self, full_path: str, entry: _FileEntry, body: bytes):
+        entry.body = body
+        self._bodies[full_path] = entry
+        self._body_bytes += len(body)
+        while self._body_bytes > self.max_bytes and self._bodies:
+            _, evicted = self._bodies.popitem(last=False)
+            self._body_bytes -= len(evicted.body)
+            evicted.body = None
+
+    def _drop_body(self, full_path: str):
+        old = self._bodies.pop(full_path, None)
+        if old is not None:
+            self._body_bytes -= len(old.body)
+            old.body = None
+
+    def get_metrics(self) -> Dict:
+        return {
+            "files": len(self._entries),
+            "cached_bodies": len(self._bodies),
+            "cached_bytes": self._body_bytes,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+async def serve_file(
+    full_path: str,
+    request_headers: Headers,
+    stat_result: Optional[os.stat_result] = None,
+    media_type: Optional[str] = None,
+    cache_control: str = REVALIDATE,
+    vary: Optional[str] = None,
+    head: bool = False
+) -> Response:
+    """Serve a file with a content-hash ETag (304 on If-None-Match), a
+    precompressed variant when the client accepts one, single byte ranges,
+    and the body from memory when it is hot"""
+    if stat_result is None:
+        stat_result = await anyio.to_thread.run_sync(os.stat, full_path)
+    entry = await file_cache.entry(full_path, stat_result)
+    media_type = media_type or mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+
+    encoding = None
+    range_header = request_headers.get("range")
+    if range_header and not RANGE.match(range_header.strip()):
+        # Multiple or malformed ranges: ignore the header and send the whole file
+        range_header = None
+    if entry.variants and not range_header:
+        accepted = request_headers.get("accept-encoding", "")
+        encoding = next((e for e, _ in ENCODINGS if e in entry.variants and e in accepted), None)
+
+    etag = entry.etag if encoding is None else f'{entry.etag[:-1]}-{encoding}"'
+    headers = {
+        "etag": etag,
+        "last-modified": entry.last_modified,
+        "cache-control": cache_control,
+        "accept-ranges": "bytes"
+    }
+    vary_values = [v for v in (vary, "Accept-Encoding" if entry.variants else None) if v]
+    if vary_values:
+        headers["vary"] = ", ".join(vary_values)
+
+    if_none_match = request_headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    if encoding is not None:
+        headers["content-encoding"] = encoding
+        return FileResponse(entry.variants[encoding], media_type=media_type, headers=headers)
+
+    byte_range = _parse_range(range_header, entry.size) if range_header else None
+    if range_header and byte_range is None:
+        return Response(status_code=416, headers={"content-range": f"bytes */{entry.size}"})
+
+    if byte_range is not None:
+        start, end = byte_range
+        headers["content-range"] = f"bytes {start}-{end}/{entry.size}"
+        headers["content-length"] = str(end - start + 1)
+        if head:
+            return Response(b"", status_code=206, media_type=media_type, headers=headers)
+        if entry.body is not None:
+            return Response(entry.body[start:end + 1], status_code=206, media_type=media_type, headers=headers)
+        return StreamingResponse(
+            _iter_range(full_path, start, end), status_code=206, media_type=media_type, headers=headers
+        )
+
+    if entry.body is not None:
+        return Response(entry.body if not head else b"", media_type=media_type, headers={
+            **headers, "content-length": str(entry.size)
+        })
+    return FileResponse(full_path, stat_result=stat_result, media_type=media_type, headers=headers)
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Inclusive (start, end) for a single "bytes=" range; None if unsatisfiable"""
+    match = RANGE.match(header.strip())
+    if not match or size == 0:
+        return None
+    first, last = match.groups()
+    if first == "":
+        if last == "":
+            return None
+        # Suffix range: the last N bytes
+        start = max(0, size - int(last))
+        end = size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        return None
+    return start, end
+
+
+async def _iter_range(full_path: str, start: int, end: int):
+    """Yield bytes start..end (inclusive) in chunks, reading off the event loop"""
+    f = await asyncio.to_thread(open, full_path, "rb")
+    try:
+        await asyncio.to_thread(f.seek, start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await asyncio.to_thread(f.read, min(RANGE_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        await asyncio.to_thread(f.close)
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles served through the file cache.
+
+    Hashed assets (content-addressed paths, or a ?v= matching the file's
+    current content hash) are cacheable forever; everything else, including
+    a stale or made-up ?v=, revalidates against its ETag.
+    """
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if scope["method"] in ("GET", "HEAD"):
+            try:
+                full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path)
+            except OSError:
+                full_path, stat_result = None, None
+            if stat_result and stat.S_ISREG(stat_result.st_mode):
+                return await serve_file(
+                    full_path,
+                    Headers(scope=scope),
+                    stat_result=stat_result,
+                    cache_control=await _cache_control(path, scope, full_path, stat_result),
+                    head=scope["method"] == "HEAD"
+                )
+        return await super().get_response(path, scope)
+
+
+async def _cache_control(path: str, scope: Scope, full_path: str, stat_result: os.stat_result) -> str:
+    if HASHED_PATH.search(path.replace(os.sep, "/")):
+        return IMMUTABLE
+    versions = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("v")
+    if versions:
+        # Only the version static_url would hand out for the file as it is now
+        current = await anyio.to_thread.run_sync(_asset_version, full_path, stat_result.st_mtime)
+        if versions[0] == current:
+            return IMMUTABLE
+    return REVALIDATE
+
+
+_asset_versions: Dict[str, Tuple[float, str]] = {}
+
+
+def _asset_version(full_path: str, mtime: float) -> str:
+    """Content-hash version of a file, recomputed only when the file changes"""
+    cached = _asset_versions.get(full_path)
+    if cached is None or cached[0] != mtime:
+        with open(full_path, "rb") as f:
+            cached = (mtime, hashlib.sha256(f.read()).hexdigest()[:12])
+        _asset_versions[full_path] = cached
+    return cached[1]
+
+
+def static_url(path: str) -> str:
+    """/static URL with a content-hash version, so the asset is cached as immutable.
+
+    Used from templates; the hash is recomputed only when the file changes.
+    """
+    full_path = os.path.join("static", path)
+    try:
+        mtime = os.stat(full_path).st_mtime
+    except OSError:
+        return f"/static/{path}"
+    return f"/static/{path}?v={_asset_version(full_path, mtime)}"
+
+
+# Global instance
+file_cache = FileCache(
+    max_bytes=settings.static_cache_mb * 1024 * 1024,
+    max_file_bytes=settings.static_cache_max_file_kb * 1024
+)
@@ -92,6 +92,46 @@ async function apiRequest(endpoint, options = {}) {
     }
 }
 
+// Identical mutations sent within this window (double taps) share one Idempotency-Key
+const IDEMPOTENCY_REUSE_MS = 800;
+const IDEMPOTENCY_RETRIES = 2;
+const recentIdempotencyKeys = new Map();
+
+function newIdempotencyKey() {
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+}
+
+// Mutation request with an Idempotency-Key: retried on network errors (and
+// while the first attempt is still in progress) without being applied twice
+async function idempotentRequest(endpoint, options = {}) {
+    const signature = `${options.method || 'GET'} ${endpoint} ${options.body || ''}`;
+    const now = Date.now();
+    const recent = recentIdempotencyKeys.get(signature);
+    const key = recent && now - recent.at < IDEMPOTENCY_REUSE_MS ? recent.key : newIdempotencyKey();
+    recentIdempotencyKeys.set(signature, { key, at: now });
+
+    for (let attempt = 0; ; attempt++) {
+        try {
+            return await apiRequest(endpoint, {
+                ...options,
+                headers: { ...options.headers, 'Idempotency-Key': key }
+            });
+        } catch (error) {
+            // fetch() rejects with TypeError on network failure; 409 means the
+            // original request is still running
+            const retryable = error instanceof TypeError || /in progress/.test(error.message);
+            if (!retryable || attempt >= IDEMPOTENCY_RETRIES) {
+                throw error;
+            }
+            debugWarn('idempotentRequest: retrying', endpoint, 'key', key);
+            await new Promise(resolve => setTimeout(resolve, 300 * (attempt + 1)));
+        }
+    }
+}
+
 // Show alert message
 function showAlert(message, type = 'info') {
     debug('showAlert:', type, message);
@@ -216,6 +256,7 @@ class WSConnection {
 
 // Export for use in other files
 window.apiRequest = apiRequest;
+window.idempotentRequest = idempotentRequest;
 window.showAlert = showAlert;
 window.getAuthToken = getAuthToken;
 window.setAuthToken = setAuthToken;
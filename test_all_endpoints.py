@@ -101,6 +101,7 @@ class QuizTester:
         self.session_id = None
         self.team_id = None
         self.slide_id = None
+        self.round_id = None
 
     def print_section(self, title: str):
         print(f"\n{Style.BRIGHT}{Fore.CYAN}{'='*80}")
@@ -108,10 +109,11 @@ class QuizTester:
         print(f"{'='*80}{Style.RESET_ALL}\n")
 
     def make_request(self, method: str, endpoint: str, token: Optional[str] = None,
-                     data: Optional[Dict] = None, expected_status: int = 200) -> tuple:
+                     data: Optional[Dict] = None, expected_status: int = 200,
+                     headers: Optional[Dict] = None) -> tuple:
         """Make HTTP request and return (success, response)"""
         url = f"{API_URL}{endpoint}"
-        headers = {}
+        headers = dict(headers or {})
 
         if token:
             headers["Authorization"] = f"Bearer {token}"
@@ -585,6 +587,66 @@ class QuizTester:
         self.results.add_result("Adjust Score", success, msg)
         return success
 
+    def test_bulk_adjust_score(self):
+        """Test adjusting several team scores in one request"""
+        if not self.admin_token or not self.session_id or not self.team_id:
+            self.results.add_result("Bulk Adjust Score", False, "No token, session ID, or team ID", skipped=True)
+            return False
+
+        success, response = self.make_request(
+            "POST",
+            f"/qm/sessions/{self.session_id}/scores/bulk",
+            token=self.admin_token,
+            data={"round_id": 1, "entries": [{"team_id": self.team_id, "delta": 5, "reason": "Written round"}]}
+        )
+
+        if success and response:
+            try:
+                data = response.json()
+                msg = f"Updates: {data.get('updates', 'Unknown')}"
+            except:
+                msg = "Scores adjusted"
+        else:
+            msg = f"Error: {response if isinstance(response, str) else response.text}"
+
+        self.results.add_result("Bulk Adjust Score", success, msg)
+        return success
+
+    def test_idempotent_adjust_score(self):
+        """Test that a repeated Idempotency-Key does not score twice"""
+        if not self.admin_token or not self.session_id or not self.team_id:
+            self.results.add_result("Idempotent Adjust Score", False, "No token, session ID, or team ID", skipped=True)
+            return False
+
+        endpoint = f"/qm/sessions/{self.session_id}/scores/{self.team_id}"
+        headers = {"Idempotency-Key": f"test-{time.time()}"}
+        data = {"delta": 1, "round_id": 1, "reason": "Idempotency check"}
+
+        success, response = self.make_request("POST", endpoint, token=self.admin_token, data=data, headers=headers)
+        if success:
+            first_total = response.json().get("new_total")
+            success, response = self.make_request("POST", endpoint, token=self.admin_token, data=data, headers=headers)
+
+        if success:
+            replayed_total = response.json().get("new_total")
+            success = replayed_total == first_total and response.headers.get("Idempotent-Replayed") == "true"
+            msg = f"Replayed total {replayed_total} (first {first_total})"
+        else:
+            msg = f"Error: {response if isinstance(response, str) else response.text}"
+
+        if success:
+            # The same key with a different body must be rejected, not replayed
+            changed = dict(data, delta=2)
+            success, response = self.make_request(
+                "POST", endpoint, token=self.admin_token, data=changed, headers=headers, expected_status=422
+            )
+            msg += ", reused key with a different body: " + (
+                str(response.status_code) if not isinstance(response, str) else response
+            )
+
+        self.results.add_result("Idempotent Adjust Score", success, msg)
+        return success
+
     # ========== Display Tests ==========
 
     def test_display_snapshot(self):
@@ -610,6 +672,75 @@ class QuizTester:
         self.results.add_result("Display Snapshot", success, msg)
         return success
 
+    def test_display_snapshot_not_modified(self):
+        """Test that an unchanged snapshot revalidates with 304"""
+        if not self.session_id:
+            self.results.add_result("Display Snapshot 304", False, "No session ID", skipped=True)
+            return False
+
+        success, response = self.make_request("GET", f"/display/sessions/{self.session_id}/snapshot")
+        etag = response.headers.get("ETag") if success else None
+        if not etag:
+            self.results.add_result("Display Snapshot 304", False, "No ETag on snapshot response")
+            return False
+
+        success, response = self.make_request(
+            "GET",
+            f"/display/sessions/{self.session_id}/snapshot",
+            expected_status=304,
+            headers={"If-None-Match": etag}
+        )
+
+        msg = f"Revalidated {etag}" if success else f"Expected 304, got {getattr(response, 'status_code', response)}"
+        self.results.add_result("Display Snapshot 304", success, msg)
+        return success
+
+    def test_media_manifest(self):
+        """Test the display media manifest and its revalidation"""
+        if not self.session_id:
+            self.results.add_result("Media Manifest", False, "No session ID", skipped=True)
+            return False
+
+        success, response = self.make_request("GET", f"/display/sessions/{self.session_id}/manifest")
+        etag = response.headers.get("ETag") if success else None
+        if not etag or "slides" not in response.json():
+            self.results.add_result("Media Manifest", False, "No ETag or slides in manifest")
+            return False
+
+        success, response = self.make_request(
+            "GET",
+            f"/display/sessions/{self.session_id}/manifest",
+            expected_status=304,
+            headers={"If-None-Match": etag}
+        )
+
+        msg = f"Revalidated {etag}" if success else f"Expected 304, got {getattr(response, 'status_code', response)}"
+        self.results.add_result("Media Manifest", success, msg)
+        return success
+
+    def test_list_decks(self):
+        """Test listing decks with their thumbnail sprite index"""
+        if not self.admin_token or not self.session_id:
+            self.results.add_result("List Decks", False, "No admin token or session ID", skipped=True)
+            return False
+
+        success, response = self.make_request(
+            "GET",
+            f"/admin/sessions/{self.session_id}/decks",
+            token=self.admin_token
+        )
+
+        if success and response:
+            decks = response.json()
+            success = all("sprites" in deck for deck in decks)
+            sheets = sum(len(deck["sprites"]["sheets"]) for deck in decks if deck.get("sprites"))
+            msg = f"Found {len(decks)} deck(s), {sheets} sprite sheet(s)" if success else "Missing sprites field"
+        else:
+            msg = f"Error: {response if isinstance(response, str) else response.text}"
+
+        self.results.add_result("List Decks", success, msg)
+        return success
+
     # ========== Database Migration Test ==========
 
     def test_admin_settings_table_exists(self):
@@ -664,6 +795,8 @@ class QuizTester:
             }
         )
 
+        if success:
+            self.round_id = response.json().get("id")
         msg = "Round created" if success else f"Error: {response.text if hasattr(response, 'text') else response}"
         self.results.add_result("Create Round", success, msg)
         return success
@@ -692,6 +825,29 @@ class QuizTester:
         self.results.add_result("List Rounds", success, msg)
         return success
 
+    def test_round_standings(self):
+        """Test getting precomputed standings for a round"""
+        if not self.session_id or not self.round_id:
+            self.results.add_result("Round Standings", False, "Missing prerequisites", skipped=True)
+            return False
+
+        success, response = self.make_request(
+            "GET",
+            f"/display/sessions/{self.session_id}/rounds/{self.round_id}/standings"
+        )
+
+        if success and response:
+            try:
+                data = response.json()
+                msg = f"{data.get('round_name')}: {len(data.get('standings', []))} team(s)"
+            except:
+                msg = "Invalid JSON response"
+        else:
+            msg = f"Error: {response if isinstance(response, str) else response.text}"
+
+        self.results.add_result("Round Standings", success, msg)
+        return success
+
     # ========== Settings Edge Cases ==========
 
     def test_update_fps_setting(self):
@@ -982,6 +1138,63 @@ class QuizTester:
         self.results.add_result("Undo Score", success, msg)
         return success
 
+    def test_redo_score(self):
+        """Test redoing an undone score adjustment"""
+        if not self.admin_token or not self.session_id or not self.team_id:
+            self.results.add_result("Redo Score", False, "Missing prerequisites", skipped=True)
+            return False
+
+        success, response = self.make_request(
+            "POST",
+            f"/qm/sessions/{self.session_id}/scores/{self.team_id}/redo",
+            token=self.admin_token
+        )
+
+        if success and response:
+            try:
+                data = response.json()
+                msg = f"Redo successful, new total: {data.get('new_total', 'Unknown')} (seq {data.get('seq')})"
+            except:
+                msg = "Score redone"
+        else:
+            msg = f"Error: {response if isinstance(response, str) else response.text}"
+
+        self.results.add_result("Redo Score", success, msg)
+        return success
+
+    def test_verify_scores(self):
+        """Test the background score integrity check"""
+        if not self.admin_token or not self.session_id:
+            self.results.add_result("Verify Scores", False, "Missing prerequisites", skipped=True)
+            return False
+
+        success, response = self.make_request(
+            "POST",
+            f"/admin/scores/verify?session_id={self.session_id}",
+            token=self.admin_token
+        )
+        if not success:
+            msg = f"Error: {response if isinstance(response, str) else response.text}"
+            self.results.add_result("Verify Scores", False, msg)
+            return False
+
+        job_id = response.json().get("job_id")
+        time.sleep(0.5)
+        success, response = self.make_request("GET", f"/admin/jobs/{job_id}", token=self.admin_token)
+
+        if success and response:
+            try:
+                data = response.json()
+                result = data.get("result") or {}
+                msg = f"Job {data.get('status')}, mismatches: {result.get('mismatch_count', 'Unknown')}"
+            except:
+                msg = "Verification job queried"
+        else:
+            msg = f"Error: {response if isinstance(response, str) else response.text}"
+
+        self.results.add_result("Verify Scores", success, msg)
+        return success
+
     # ========== Slide Jump Test ==========
 
     def test_jump_to_slide(self):
@@ -1070,10 +1283,15 @@ class QuizTester:
         # 11. Quiz Master - Score Tests
         self.print_section("11. SCORE TESTS")
         self.test_adjust_score()
+        self.test_bulk_adjust_score()
+        self.test_idempotent_adjust_score()
 
         # 12. Display Tests
         self.print_section("12. DISPLAY TESTS")
         self.test_display_snapshot()
+        self.test_display_snapshot_not_modified()
+        self.test_media_manifest()
+        self.test_list_decks()
 
         # 13. Team Session Assignment
         self.print_section("13. TEAM SESSION ASSIGNMENT TESTS")
@@ -1083,6 +1301,7 @@ class QuizTester:
         self.print_section("14. ROUND MANAGEMENT TESTS")
         self.test_create_round()
         self.test_list_rounds()
+        self.test_round_standings()
 
         # 15. Advanced Settings Tests
         self.print_section("15. ADVANCED SETTINGS TESTS")
@@ -1121,6 +1340,8 @@ class QuizTester:
         # 21. Advanced Operations
         self.print_section("21. ADVANCED OPERATIONS")
         self.test_undo_score()
+        self.test_redo_score()
+        self.test_verify_scores()
         self.test_jump_to_slide()
 
         # Print Summary